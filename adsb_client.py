@@ -1,124 +1,359 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import socket
 import time
-import math
+import numpy as np
 import config
 import threading
+import tracing
+from geodesy import GeoOrigin, AngularIndex
+from adsb_stream import SBSDecoder, BeastDecoder
+from aircraft_store import AircraftStore, extract_info
+from aircraft_db import open_aircraft_db
+from session_log import open_session_log, icao_to_int, ADSB_SCHEMA
+
+# Optional fast JSON decoder (pip install orjson)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
 
 class ADSBClient:
+    # In-view queries share one dead-reckoned snapshot + angular index for this long
+    VIEW_SNAPSHOT_MAX_AGE = 0.1
+
     def __init__(self):
-        self.aircraft_data = []
+        self.store = AircraftStore(history=config.ADSB_HISTORY_LENGTH)
         self.lock = threading.Lock()
         self.last_update = 0
+        # Bumped on every ingest that changed the store, see wait_for_change()
+        self.version = 0
+        self.changed = threading.Condition(self.lock)
         self.running = False
         self.thread = None
+        self.mode = config.ADSB_MODE
+        # Optional offline registration/type/operator lookup (aircraft_db.py)
+        self.aircraft_db = open_aircraft_db(config.AIRCRAFT_DB_PATH, config.AIRCRAFT_DB_CACHE_SIZE)
+        self.session_log = None
+        # Camera terms precomputed once for the per-poll geodesy pass
+        self.origin = GeoOrigin(config.CAMERA_LAT, config.CAMERA_LNG, config.CAMERA_HEIGHT_FT)
+
+        # Persistent keep-alive session and conditional request validators
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        self.etag = None
+        self.last_modified = None
+
+        # Cached (time, aircraft list, AngularIndex) for FOV queries
+        self.view_lock = threading.Lock()
+        self.view_snapshot = None
+
+        # Fetch Metrics
+        self.metrics = {
+            'fetches': 0,
+            'not_modified': 0,
+            'errors': 0,
+            'last_fetch_ms': 0.0,
+            'last_parse_ms': 0.0,
+            'last_wire_bytes': 0,
+            'last_body_bytes': 0,
+            'total_wire_bytes': 0,
+            'json_decoder': 'orjson' if orjson else 'json',
+            'stream_messages': 0,
+            'stream_bytes': 0,
+            'stream_reconnects': 0,
+        }
 
     def start(self):
         if self.running: return
         self.running = True
-        self.thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self.session_log = open_session_log('adsb', ADSB_SCHEMA)
+        target = self._stream_loop if self.mode in ('sbs', 'beast') else self._poll_loop
+        self.thread = threading.Thread(target=target, name="ADSB", daemon=True)
         self.thread.start()
-        print("ADS-B Client Started.")
+        print(f"ADS-B Client Started ({self.mode}).")
 
     def stop(self):
         self.running = False
         if self.thread:
             self.thread.join(timeout=1.0)
+        if self.session_log is not None:
+            self.session_log.stop()
+        self.session.close()
         print("ADS-B Client Stopped.")
 
-    def get_aircraft(self):
+    def get_aircraft(self, now=None):
+        """Aircraft in range with positions dead-reckoned to `now`."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.store.evict(now, config.ADSB_STALE_SECONDS)
+            slots, lat, lon, alt = self.store.predict(now, config.ADSB_MAX_EXTRAPOLATION)
+            track = self.store.track[slots]
+            gs = self.store.gs[slots]
+            vrate = self.store.vrate[slots]
+            seen = now - self.store.t_seen[slots]
+            seen_pos = now - self.store.t_pos[slots]
+            hexes = [self.store.hexes[i] for i in slots.tolist()]
+            info = [self.store.info[i] for i in slots.tolist()]
+        return self._build_list(hexes, info, lat, lon, alt, track, gs, vrate, seen, seen_pos)
+
+    def get_in_view(self, cam_az, cam_el, hfov, vfov):
+        """
+        Aircraft inside a camera's field of view, nearest the boresight first.
+        Each entry gains `view_x` / `view_y` (deg right / up of centre) and
+        `off_axis` (deg).
+        """
+        aircraft, index = self._get_view_snapshot()
+        indices, x, y = index.query(cam_az, cam_el, hfov, vfov)
+        off_axis = np.hypot(x, y)
+        result = []
+        for k in np.argsort(off_axis).tolist():
+            entry = dict(aircraft[indices[k]])
+            entry['view_x'] = float(x[k])
+            entry['view_y'] = float(y[k])
+            entry['off_axis'] = float(off_axis[k])
+            result.append(entry)
+        return result
+
+    def _get_view_snapshot(self):
+        now = time.time()
+        with self.view_lock:
+            snap = self.view_snapshot
+            if snap is None or now - snap[0] > self.VIEW_SNAPSHOT_MAX_AGE:
+                aircraft = self.get_aircraft(now)
+                n = len(aircraft)
+                bearing = np.fromiter((ac['bearing'] for ac in aircraft), dtype=np.float64, count=n)
+                elevation = np.fromiter((ac['elevation'] for ac in aircraft), dtype=np.float64, count=n)
+                snap = (now, aircraft, AngularIndex(bearing, elevation))
+                self.view_snapshot = snap
+        return snap[1], snap[2]
+
+    def get_target_state(self, hex_id):
+        """Last fix plus track/speed of one aircraft, for cueing a camera."""
+        with self.lock:
+            return self.store.state(hex_id)
+
+    def get_history(self, hex_id):
         with self.lock:
-            # Return a copy to avoid threading issues
-            return list(self.aircraft_data)
+            return self.store.history(hex_id)
+
+    def wait_for_change(self, version, timeout=None):
+        """Blocks until new data has been ingested since `version`; returns the current version."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def get_metrics(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+        if self.aircraft_db is not None:
+            metrics['aircraft_db'] = self.aircraft_db.stats()
+        return metrics
 
     def _poll_loop(self):
         while self.running:
             try:
-                self._fetch_data()
+                with tracing.span('adsb.fetch', 'adsb'):
+                    self._fetch_data()
             except Exception as e:
                 print(f"Error fetching ADS-B data: {e}")
             
             time.sleep(1.0) # Poll at 1Hz
 
+    def _stream_loop(self):
+        address = (config.ADSB_STREAM_HOST, config.ADSB_STREAM_PORT)
+        while self.running:
+            if self.mode == 'beast':
+                decoder = BeastDecoder(config.CAMERA_LAT, config.CAMERA_LNG)
+            else:
+                decoder = SBSDecoder()
+            try:
+                with socket.create_connection(address, timeout=5.0) as sock:
+                    sock.settimeout(1.0)
+                    print(f"ADS-B Stream connected to {address[0]}:{address[1]} ({self.mode})")
+                    while self.running:
+                        try:
+                            data = sock.recv(65536)
+                        except socket.timeout:
+                            continue
+                        if not data:
+                            break
+                        with tracing.span('adsb.ingest', 'adsb'):
+                            self._ingest(list(decoder.feed(data)), len(data))
+            except OSError as e:
+                print(f"ADS-B Stream error: {e}")
+
+            if self.running:
+                with self.lock:
+                    self.metrics['stream_reconnects'] += 1
+                time.sleep(2.0)
+
+    def _ingest(self, updates, nbytes):
+        now = time.time()
+        with self.lock:
+            for hex_id, fields in updates:
+                self.store.update(hex_id, fields, now)
+            self.last_update = now
+            if updates:
+                self.version += 1
+                self.changed.notify_all()
+                if self.session_log is not None:
+                    self._log_states(list(dict.fromkeys(h for h, _ in updates)), now)
+            self.metrics['stream_messages'] += len(updates)
+            self.metrics['stream_bytes'] += nbytes
+
     def _fetch_data(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        t_start = time.perf_counter()
         try:
-            response = requests.get(config.ADSB_URL, timeout=2.0)
-            if response.status_code == 200:
-                data = response.json()
-                # Handle both dump1090 formats (root list or 'aircraft' key)
-                ac_list = data.get('aircraft', []) if isinstance(data, dict) else data
-                
-                parsed_list = []
-                current_time = time.time()
-
-                for ac in ac_list:
-                    # Filter invalid data
-                    lat = ac.get('lat')
-                    lon = ac.get('lon')
-                    reg = ac.get('r') or ac.get('reg') or ac.get('registration') or '---'
-                    try:
-                        alt = int(ac.get('alt_baro') or ac.get('alt_geom') or 0)
-                    except:
-                        alt = 0
-
-                    if lat is None or lon is None:
-                        continue
-
-                    # Calculate Distance and Bearing from Camera
-                    dist_nm, bearing = self._calculate_position(lat, lon)
-
-                    # Filter by range (e.g. 20nm) - Optional, but good for performance
-                    if dist_nm > config.MAX_RANGE_NM * 1.5: 
-                        continue
-
-                    parsed_list.append({
-                        'hex': ac.get('hex'),
-                        'flight': ac.get('flight', '').strip(),
-                        'reg': reg,
-                        'type': ac.get('t') or ac.get('type') or '---',
-                        'lat': lat,
-                        'lon': lon,
-                        'alt': alt,
-                        'track': ac.get('track', 0),
-                        'speed': ac.get('gs', 0),
-                        'dist_nm': dist_nm,
-                        'bearing': bearing,
-                        'seen': ac.get('seen', 0),
-                        'rssi': ac.get('rssi', -99.9)
-                    })
+            response = self.session.get(config.ADSB_URL, headers=headers, timeout=2.0)
+            body = response.content
+        except requests.RequestException:
+            with self.lock:
+                self.metrics['errors'] += 1
+            return
+        t_fetched = time.perf_counter()
 
-                with self.lock:
-                    self.aircraft_data = parsed_list
-                    self.last_update = current_time
-
-        except Exception as e:
-             # print(f"ADS-B Fetch Error: {e}") 
-             pass
-
-    def _calculate_position(self, target_lat, target_lon):
-        # Haversine Formula for distance
-        R = 3440.065 # Earth radius in Nautical Miles
-
-        lat1 = math.radians(config.CAMERA_LAT)
-        lon1 = math.radians(config.CAMERA_LNG)
-        lat2 = math.radians(target_lat)
-        lon2 = math.radians(target_lon)
-
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-
-        a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        dist_nm = R * c
-
-        # Bearing Formula
-        # y = sin(Δλ) * cos(φ2)
-        # x = cos(φ1) * sin(φ2) - sin(φ1) * cos(φ2) * cos(Δλ)
-        # θ = atan2(y, x)
-        y = math.sin(dlon) * math.cos(lat2)
-        x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
-        
-        bearing_rad = math.atan2(y, x)
-        bearing_deg = (math.degrees(bearing_rad) + 360) % 360
-
-        return dist_nm, bearing_deg
+        # Bytes actually pulled over the wire (compressed), falls back to body size
+        try:
+            wire_bytes = response.raw.tell() or len(body)
+        except Exception:
+            wire_bytes = len(body)
+
+        with self.lock:
+            self.metrics['fetches'] += 1
+            self.metrics['last_fetch_ms'] = (t_fetched - t_start) * 1000
+            self.metrics['last_wire_bytes'] = wire_bytes
+            self.metrics['last_body_bytes'] = len(body)
+            self.metrics['total_wire_bytes'] += wire_bytes
+
+        if response.status_code == 304:
+            # Feed unchanged since last poll, keep current data
+            with self.lock:
+                self.metrics['not_modified'] += 1
+            return
+        if response.status_code != 200:
+            with self.lock:
+                self.metrics['errors'] += 1
+            return
+
+        try:
+            data = _json_loads(body)
+        except ValueError:
+            with self.lock:
+                self.metrics['errors'] += 1
+            return
+        # Handle both dump1090 formats (root list or 'aircraft' key)
+        ac_list = data.get('aircraft', []) if isinstance(data, dict) else data
+
+        current_time = time.time()
+        # Column arrays for the vectorized store update (NaN = field missing)
+        ac_list = [ac for ac in ac_list if ac.get('hex')]
+        n = len(ac_list)
+        hexes = [ac['hex'] for ac in ac_list]
+        seen = np.fromiter((_num_or(ac.get('seen'), 0.0) for ac in ac_list), dtype=np.float64, count=n)
+        seen_pos = np.fromiter((_num_or(ac.get('seen_pos'), np.nan) for ac in ac_list), dtype=np.float64, count=n)
+        seen_pos = np.where(np.isnan(seen_pos), seen, seen_pos)
+        lat = np.fromiter((_num_or(ac.get('lat'), np.nan) for ac in ac_list), dtype=np.float64, count=n)
+        lon = np.fromiter((_num_or(ac.get('lon'), np.nan) for ac in ac_list), dtype=np.float64, count=n)
+        alt = np.fromiter((_parse_alt(ac) for ac in ac_list), dtype=np.float64, count=n)
+        track = np.fromiter((_num_or(ac.get('track'), np.nan) for ac in ac_list), dtype=np.float64, count=n)
+        gs = np.fromiter((_num_or(ac.get('gs'), np.nan) for ac in ac_list), dtype=np.float64, count=n)
+        vrate = np.fromiter((_num_or(ac.get('baro_rate', ac.get('geom_rate')), np.nan) for ac in ac_list),
+                            dtype=np.float64, count=n)
+        infos = [extract_info(ac) for ac in ac_list]
+
+        with self.lock:
+            self.store.update_batch(hexes, current_time - seen, current_time - seen_pos,
+                                    lat, lon, alt, track, gs, vrate, infos)
+            self.last_update = current_time
+            self.version += 1
+            self.changed.notify_all()
+            if self.session_log is not None:
+                self._log_states(hexes, current_time)
+            self.metrics['last_parse_ms'] = (time.perf_counter() - t_fetched) * 1000
+
+        # Only validate against a body we actually ingested, so a bad one is fetched again
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+
+    def _log_states(self, hexes, now):
+        """Appends the merged store state of the given aircraft to the session log (lock held)."""
+        n = len(hexes)
+        if n == 0:
+            return
+        store = self.store
+        slots = np.fromiter((store.index[h] for h in hexes), dtype=np.int64, count=n)
+        self.session_log.append_columns(
+            t=np.full(n, now),
+            t_pos=store.t_pos[slots],
+            icao=np.fromiter((icao_to_int(h) for h in hexes), dtype=np.uint32, count=n),
+            lat=store.lat[slots],
+            lon=store.lon[slots],
+            alt=store.alt[slots],
+            track=store.track[slots],
+            gs=store.gs[slots],
+            vrate=store.vrate[slots],
+            flight=[store.info[i].get('flight', '').encode('ascii', 'ignore')[:8] for i in slots.tolist()],
+        )
+
+    def _build_list(self, hexes, info, lat, lon, alt, track, gs, vrate, seen, seen_pos):
+        if len(hexes) == 0:
+            return []
+
+        # Distance, Bearing and Elevation from Camera
+        dist_nm, bearing, elevation = self.origin.look_angles(lat, lon, alt)
+
+        # Filter by range (e.g. 20nm) - Optional, but good for performance
+        in_range = np.flatnonzero(dist_nm <= config.MAX_RANGE_NM * 1.5)
+
+        parsed_list = []
+        db = self.aircraft_db
+        for i in in_range.tolist():
+            meta = info[i]
+            known = db.lookup(hexes[i]) if db is not None else {}
+            parsed_list.append({
+                'hex': hexes[i],
+                'flight': meta.get('flight', ''),
+                'reg': meta.get('reg') or known.get('reg') or '---',
+                'type': meta.get('type') or known.get('type') or '---',
+                'operator': known.get('operator', ''),
+                'category': meta.get('category') or known.get('category', ''),
+                'lat': float(lat[i]),
+                'lon': float(lon[i]),
+                'alt': int(alt[i]),
+                'track': float(track[i]),
+                'speed': float(gs[i]),
+                'vert_rate': int(vrate[i]),
+                'dist_nm': float(dist_nm[i]),
+                'bearing': float(bearing[i]),
+                'elevation': float(elevation[i]),
+                'seen': float(seen[i]),
+                'seen_pos': float(seen_pos[i]),
+                'rssi': meta.get('rssi', -99.9)
+            })
+        return parsed_list
+
+
+def _num_or(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_alt(ac):
+    alt = ac.get('alt_baro', ac.get('alt_geom'))
+    if alt == 'ground':
+        return 0.0
+    return _num_or(alt, np.nan)
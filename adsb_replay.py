@@ -0,0 +1,184 @@
+"""
+Local stand-in for an ADS-B feeder, for exercising ADSBClient without a receiver.
+
+    python adsb_replay.py http capture/*.json --port 8080 --interval 1.0
+
+serves the given dump1090/readsb `aircraft.json` snapshots in rotation at
+`/data/aircraft.json`, honouring ETag / If-Modified-Since and gzip like the
+real feeders behind lighttpd/nginx. Point `adsb.url` at
+`http://localhost:8080/data/aircraft.json`.
+
+    python adsb_replay.py sbs capture.sbs --port 30003 --rate 500
+    python adsb_replay.py beast capture.bin --port 30005 --rate 2000
+
+replay a captured BaseStation log or raw Beast dump to every connecting client
+at the given messages/second, looping at the end of the file. Use with
+`adsb.mode: sbs` / `beast` and `adsb.stream_host: localhost`.
+"""
+import argparse
+import gzip
+import hashlib
+import socketserver
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from adsb_stream import split_beast_frames
+
+
+class SnapshotRotator:
+    """Cycles through snapshot files, advancing every `interval` seconds."""
+    def __init__(self, paths, interval):
+        self.snapshots = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.snapshots.append({
+                'body': body,
+                'gzip': gzip.compress(body),
+                'etag': '"' + hashlib.md5(body).hexdigest() + '"',
+            })
+        self.interval = interval
+        self.index = 0
+        self.changed_at = time.time()
+        self.lock = threading.Lock()
+
+    def current(self):
+        with self.lock:
+            now = time.time()
+            if len(self.snapshots) > 1 and now - self.changed_at >= self.interval:
+                self.index = (self.index + 1) % len(self.snapshots)
+                self.changed_at = now
+            return self.snapshots[self.index], self.changed_at
+
+
+def make_http_handler(rotator, path):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path.split('?')[0] != path:
+                self.send_error(404)
+                return
+            snap, changed_at = rotator.current()
+            last_modified = formatdate(int(changed_at), usegmt=True)
+
+            if self.headers.get('If-None-Match') == snap['etag']:
+                return self._not_modified(snap, last_modified)
+            since = self.headers.get('If-Modified-Since')
+            if since and not self.headers.get('If-None-Match'):
+                try:
+                    if int(changed_at) <= parsedate_to_datetime(since).timestamp():
+                        return self._not_modified(snap, last_modified)
+                except (TypeError, ValueError):
+                    pass
+
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = snap['gzip'] if use_gzip else snap['body']
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', snap['etag'])
+            self.send_header('Last-Modified', last_modified)
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_modified(self, snap, last_modified):
+            self.send_response(304)
+            self.send_header('ETag', snap['etag'])
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve_http(args):
+    rotator = SnapshotRotator(args.files, args.interval)
+    server = ThreadingHTTPServer((args.host, args.port), make_http_handler(rotator, args.path))
+    print(f"Serving {len(args.files)} snapshot(s) at http://{args.host}:{args.port}{args.path}")
+    server.serve_forever()
+
+
+def load_messages(mode, path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if mode == 'beast':
+        frames, _ = split_beast_frames(data)
+        return frames
+    return [line + b'\n' for line in data.splitlines() if line.strip()]
+
+
+def make_stream_handler(messages, rate, loop):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            print(f"Client connected: {self.client_address[0]}:{self.client_address[1]}")
+            # Send in small batches so high rates are not limited by sleep granularity
+            batch = max(1, int(rate / 100))
+            interval = batch / rate
+            next_send = time.perf_counter()
+            try:
+                while True:
+                    for i in range(0, len(messages), batch):
+                        self.request.sendall(b''.join(messages[i:i + batch]))
+                        next_send += interval
+                        delay = next_send - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    if not loop:
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            print(f"Client disconnected: {self.client_address[0]}:{self.client_address[1]}")
+
+    return Handler
+
+
+def serve_stream(args):
+    messages = load_messages(args.mode, args.file)
+    if not messages:
+        print(f"No {args.mode} messages found in {args.file}")
+        return
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((args.host, args.port),
+                                             make_stream_handler(messages, args.rate, not args.once))
+    server.daemon_threads = True
+    print(f"Replaying {len(messages)} {args.mode} messages at {args.rate:g}/s on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ADS-B feed stand-in / replay server")
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    p_http = sub.add_parser('http', help="Serve aircraft.json snapshots over HTTP")
+    p_http.add_argument('files', nargs='+', help="dump1090/readsb aircraft.json snapshot files")
+    p_http.add_argument('--host', default='127.0.0.1')
+    p_http.add_argument('--port', type=int, default=8080)
+    p_http.add_argument('--path', default='/data/aircraft.json')
+    p_http.add_argument('--interval', type=float, default=1.0, help="Seconds between snapshots")
+    p_http.set_defaults(func=serve_http)
+
+    for mode, port in (('sbs', 30003), ('beast', 30005)):
+        p_stream = sub.add_parser(mode, help=f"Replay a captured {mode} log over TCP")
+        p_stream.add_argument('file', help="Captured message log")
+        p_stream.add_argument('--host', default='127.0.0.1')
+        p_stream.add_argument('--port', type=int, default=port)
+        p_stream.add_argument('--rate', type=float, default=200.0, help="Messages per second")
+        p_stream.add_argument('--once', action='store_true', help="Stop at end of file instead of looping")
+        p_stream.set_defaults(func=serve_stream)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
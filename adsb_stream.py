@@ -0,0 +1,235 @@
+import math
+
+# --- SBS-1 (BaseStation, port 30003) ---
+
+def _sbs_float(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class SBSDecoder:
+    """
+    Incremental decoder for the BaseStation CSV stream. `feed()` accepts
+    arbitrary byte chunks and yields (hex, fields) updates, where fields use
+    the same keys as dump1090's aircraft.json.
+    """
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            update = self.decode_line(line)
+            if update is not None:
+                yield update
+
+    @staticmethod
+    def decode_line(line):
+        parts = line.decode('ascii', 'replace').strip().split(',')
+        if len(parts) < 22 or parts[0] != 'MSG' or not parts[4]:
+            return None
+        fields = {}
+        callsign = parts[10].strip()
+        if callsign:
+            fields['flight'] = callsign
+        alt = _sbs_float(parts[11])
+        if alt is not None:
+            fields['alt_baro'] = int(alt)
+        gs = _sbs_float(parts[12])
+        if gs is not None:
+            fields['gs'] = gs
+        track = _sbs_float(parts[13])
+        if track is not None:
+            fields['track'] = track
+        lat = _sbs_float(parts[14])
+        lon = _sbs_float(parts[15])
+        if lat is not None and lon is not None:
+            fields['lat'] = lat
+            fields['lon'] = lon
+        vr = _sbs_float(parts[16])
+        if vr is not None:
+            fields['baro_rate'] = int(vr)
+        if parts[17]:
+            fields['squawk'] = parts[17]
+        return parts[4].strip().lower(), fields
+
+
+# --- Beast binary (port 30005) ---
+
+BEAST_ESC = 0x1a
+BEAST_FRAME_LEN = {0x31: 2, 0x32: 7, 0x33: 14}  # Mode-AC, Mode-S short, Mode-S long
+
+_CRC_POLY = 0xFFF409
+_CRC_TABLE = []
+for _i in range(256):
+    _c = _i << 16
+    for _ in range(8):
+        _c = ((_c << 1) ^ _CRC_POLY) if _c & 0x800000 else (_c << 1)
+    _CRC_TABLE.append(_c & 0xFFFFFF)
+
+
+def modes_crc(msg):
+    """Mode S CRC-24 remainder over the whole message (0 for a valid DF17/18)."""
+    crc = 0
+    for b in msg[:-3]:
+        crc = ((crc << 8) & 0xFFFFFF) ^ _CRC_TABLE[((crc >> 16) ^ b) & 0xFF]
+    return crc ^ int.from_bytes(msg[-3:], 'big')
+
+
+def split_beast_frames(data):
+    """
+    Splits a Beast byte stream into complete raw (still escaped) frames.
+    Returns (frames, remainder) so partial frames can be carried over.
+    """
+    frames = []
+    i = 0
+    n = len(data)
+    while i < n:
+        if data[i] != BEAST_ESC:
+            i += 1
+            continue
+        if i + 1 >= n:
+            break
+        payload_len = BEAST_FRAME_LEN.get(data[i + 1])
+        if payload_len is None:
+            i += 1
+            continue
+
+        # 6 byte MLAT timestamp + 1 byte signal level + payload, 0x1a doubled
+        want = 7 + payload_len
+        got = 0
+        j = i + 2
+        truncated = False
+        while got < want and j < n:
+            if data[j] == BEAST_ESC:
+                if j + 1 >= n:
+                    break
+                if data[j + 1] != BEAST_ESC:
+                    truncated = True  # Unescaped 0x1a starts the next frame
+                    break
+                j += 2
+            else:
+                j += 1
+            got += 1
+
+        if got == want:
+            frames.append(bytes(data[i:j]))
+        elif not truncated:
+            break  # Partial frame, wait for more data
+        i = j
+    return frames, bytes(data[i:])
+
+
+def unescape_beast_frame(frame):
+    """Returns (msg_type, timestamp, signal, payload) for one raw frame."""
+    body = frame[2:].replace(b'\x1a\x1a', b'\x1a')
+    return frame[1], int.from_bytes(body[0:6], 'big'), body[6], body[7:]
+
+
+_CALLSIGN_CHARS = '#ABCDEFGHIJKLMNOPQRSTUVWXYZ##### ###############0123456789######'
+
+
+def _cpr_nl(lat):
+    """Number of CPR longitude zones at a given latitude."""
+    if lat == 0:
+        return 59
+    if abs(lat) == 87:
+        return 2
+    if abs(lat) > 87:
+        return 1
+    a = 1 - math.cos(math.pi / 30)
+    b = math.cos(math.radians(abs(lat)))**2
+    return int(math.floor(2 * math.pi / math.acos(1 - a / b)))
+
+
+def cpr_local_decode(lat_cpr, lon_cpr, odd, ref_lat, ref_lon):
+    """
+    Locally unambiguous airborne CPR decode against a reference position
+    (the receiver), valid within ~180 NM. Needs only a single message.
+    """
+    d_lat = 360.0 / (59 if odd else 60)
+    lat_frac = lat_cpr / 131072.0
+    j = math.floor(ref_lat / d_lat) + math.floor(0.5 + (ref_lat % d_lat) / d_lat - lat_frac)
+    lat = d_lat * (j + lat_frac)
+
+    d_lon = 360.0 / max(_cpr_nl(lat) - (1 if odd else 0), 1)
+    lon_frac = lon_cpr / 131072.0
+    m = math.floor(ref_lon / d_lon) + math.floor(0.5 + (ref_lon % d_lon) / d_lon - lon_frac)
+    lon = d_lon * (m + lon_frac)
+    return lat, lon
+
+
+def decode_extended_squitter(msg, ref_lat, ref_lon):
+    """
+    Decodes a 112-bit DF17/18 message into (hex, fields). Handles
+    identification, airborne position (barometric) and ground velocity;
+    everything else returns None.
+    """
+    if len(msg) != 14:
+        return None
+    df = msg[0] >> 3
+    if df not in (17, 18) or modes_crc(msg) != 0:
+        return None
+
+    icao = msg[1:4].hex()
+    me = int.from_bytes(msg[4:11], 'big')
+    tc = me >> 51
+    fields = {}
+
+    if 1 <= tc <= 4:
+        chars = ''.join(_CALLSIGN_CHARS[(me >> s) & 0x3F] for s in range(42, -1, -6))
+        fields['flight'] = chars.replace('#', '').strip()
+
+    elif 9 <= tc <= 18:
+        alt12 = (me >> 36) & 0xFFF
+        if alt12 and (alt12 >> 4) & 1:
+            n = ((alt12 >> 5) << 4) | (alt12 & 0xF)
+            fields['alt_baro'] = n * 25 - 1000
+        odd = (me >> 34) & 1
+        lat_cpr = (me >> 17) & 0x1FFFF
+        lon_cpr = me & 0x1FFFF
+        lat, lon = cpr_local_decode(lat_cpr, lon_cpr, odd, ref_lat, ref_lon)
+        fields['lat'] = round(lat, 6)
+        fields['lon'] = round(((lon + 180.0) % 360.0) - 180.0, 6)
+
+    elif tc == 19:
+        subtype = (me >> 48) & 0x7
+        if subtype not in (1, 2):
+            return None  # Airspeed subtypes carry no ground track
+        scale = 4 if subtype == 2 else 1
+        v_ew = (me >> 32) & 0x3FF
+        v_ns = (me >> 21) & 0x3FF
+        if v_ew == 0 or v_ns == 0:
+            return None
+        ve = (v_ew - 1) * scale * (-1 if (me >> 42) & 1 else 1)
+        vn = (v_ns - 1) * scale * (-1 if (me >> 31) & 1 else 1)
+        fields['gs'] = round(math.hypot(ve, vn), 1)
+        fields['track'] = round(math.degrees(math.atan2(ve, vn)) % 360.0, 1)
+        vr = (me >> 10) & 0x1FF
+        if vr:
+            fields['baro_rate'] = (vr - 1) * 64 * (-1 if (me >> 19) & 1 else 1)
+    else:
+        return None
+
+    return icao, fields
+
+
+class BeastDecoder:
+    """Incremental decoder for the Beast binary stream, see SBSDecoder."""
+    def __init__(self, ref_lat, ref_lon):
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.buffer = b''
+
+    def feed(self, data):
+        frames, self.buffer = split_beast_frames(self.buffer + data)
+        for frame in frames:
+            msg_type, _, _, payload = unescape_beast_frame(frame)
+            if msg_type != 0x33:
+                continue
+            update = decode_extended_squitter(payload, self.ref_lat, self.ref_lon)
+            if update is not None:
+                yield update
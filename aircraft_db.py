@@ -0,0 +1,180 @@
+"""
+Offline aircraft metadata (registration, type, operator, category) keyed by
+ICAO 24-bit address, for feeds that do not send `r` / `t` themselves.
+
+    python aircraft_db.py build aircraftDatabase.csv --out aircraft.sqlite
+    python aircraft_db.py lookup aircraft.sqlite a1b2c3
+
+`build` accepts the common CSV dumps (OpenSky aircraftDatabase.csv,
+tar1090-db / Mictronics style exports, or anything with similar headers)
+and writes a compact SQLite file. Point `adsb.aircraft_db` at it.
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+FIELDS = ('reg', 'type', 'operator', 'category')
+
+# CSV header aliases (lower-cased) for each stored field
+COLUMN_ALIASES = {
+    'icao': ('icao24', 'icao', 'hex', 'icao_hex', 'modes', 'mode_s'),
+    'reg': ('registration', 'reg', 'r', 'tail'),
+    'type': ('typecode', 'type', 't', 'icaotype', 'icao_type', 'type_code'),
+    'operator': ('operator', 'operatorname', 'operator_name', 'owner', 'ownop', 'operatoricao'),
+    'category': ('category', 'categorydescription', 'icaoaircrafttype', 'icao_aircraft_type', 'desc'),
+}
+
+
+class AircraftDB:
+    """
+    Read-only lookup over a database built by `aircraft_db.py build`. Hits and
+    misses are both kept in an LRU in front of SQLite, so the steady-state
+    cost per aircraft per poll is a dict lookup.
+    """
+    def __init__(self, path, cache_size=4096):
+        # Integer-keyed WITHOUT ROWID table: the primary key B-tree is the data
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, hex_id):
+        """Dict of the known fields for an ICAO hex (empty if unknown)."""
+        if hex_id.startswith('~'):
+            return {}  # Non-ICAO address (TIS-B / anonymous): may collide with a real airframe
+        with self.lock:
+            entry = self.cache.get(hex_id)
+            if entry is not None:
+                self.cache.move_to_end(hex_id)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            entry = {}
+            try:
+                row = self.conn.execute(
+                    "SELECT reg, type, operator, category FROM aircraft WHERE icao = ?",
+                    (int(hex_id, 16),)).fetchone()
+            except (ValueError, sqlite3.Error):
+                row = None
+            if row is not None:
+                entry = {k: v for k, v in zip(FIELDS, row) if v}
+
+            self.cache[hex_id] = entry
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return entry
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.cache)}
+
+    def close(self):
+        self.conn.close()
+
+
+def open_aircraft_db(path, cache_size=4096):
+    """AircraftDB for `path`, or None if no database is configured / present."""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"Warning: Aircraft database not found at {path}")
+        return None
+    try:
+        return AircraftDB(path, cache_size)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not open aircraft database: {e}")
+        return None
+
+
+def _resolve_columns(header):
+    names = [h.strip().strip("'\"").lower() for h in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    return columns
+
+
+def build_database(csv_path, out_path, delimiter=None):
+    """Builds the SQLite lookup file from a CSV dump. Returns the row count."""
+    with open(csv_path, newline='', encoding='utf-8', errors='replace') as f:
+        sample = f.read(65536)
+        f.seek(0)
+        if delimiter is None:
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+            except csv.Error:
+                delimiter = ','
+        reader = csv.reader(f, delimiter=delimiter, quotechar="'" if sample.startswith("'") else '"')
+        columns = _resolve_columns(next(reader))
+        if 'icao' not in columns:
+            raise ValueError(f"No ICAO hex column found in {csv_path}")
+
+        def rows():
+            for row in reader:
+                try:
+                    icao = int(row[columns['icao']].strip(), 16)
+                except (ValueError, IndexError):
+                    continue
+                values = []
+                for field in FIELDS:
+                    i = columns.get(field)
+                    value = row[i].strip() if i is not None and i < len(row) else ''
+                    values.append(value or None)
+                if any(values):
+                    yield (icao, *values)
+
+        tmp_path = out_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE aircraft (icao INTEGER PRIMARY KEY, reg TEXT, type TEXT, "
+                     "operator TEXT, category TEXT) WITHOUT ROWID")
+        conn.executemany("INSERT OR REPLACE INTO aircraft VALUES (?, ?, ?, ?, ?)", rows())
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM aircraft").fetchone()[0]
+        conn.execute("VACUUM")
+        conn.close()
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline aircraft metadata database")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help="Build the lookup file from a CSV dump")
+    p_build.add_argument('csv', help="Aircraft database CSV (e.g. OpenSky aircraftDatabase.csv)")
+    p_build.add_argument('--out', default='aircraft.sqlite')
+    p_build.add_argument('--delimiter', default=None, help="CSV delimiter (sniffed by default)")
+
+    p_lookup = sub.add_parser('lookup', help="Look up ICAO hex codes")
+    p_lookup.add_argument('db')
+    p_lookup.add_argument('hex', nargs='+')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        t_start = time.time()
+        count = build_database(args.csv, args.out, args.delimiter)
+        size_mb = os.path.getsize(args.out) / 1e6
+        print(f"Wrote {count} aircraft to {args.out} ({size_mb:.1f} MB) in {time.time() - t_start:.1f}s")
+    else:
+        db = AircraftDB(args.db)
+        for hex_id in args.hex:
+            print(hex_id.lower(), db.lookup(hex_id.lower()) or "not found")
+
+
+if __name__ == '__main__':
+    main()
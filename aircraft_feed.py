@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from collections import deque
+import config
+
+# Fields pushed to the browser and the precision they are rounded to, so
+# sub-metre dead-reckoning jitter does not show up as a change every push
+STREAM_FIELDS = {
+    'hex': None, 'flight': None, 'reg': None, 'type': None, 'operator': None, 'category': None,
+    'lat': 5, 'lon': 5, 'alt': None, 'track': 1, 'speed': 1, 'vert_rate': None,
+    'dist_nm': 2, 'bearing': 1, 'elevation': 2, 'rssi': 1,
+}
+
+
+def _stream_entry(ac):
+    entry = {}
+    for key, digits in STREAM_FIELDS.items():
+        value = ac.get(key)
+        if digits is not None and isinstance(value, float):
+            value = round(value, digits)
+        entry[key] = value
+    return entry
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class AircraftFeed:
+    """
+    Push side of the aircraft list. One thread wakes whenever ADSBClient
+    ingests new data (at most every `min_interval`), diffs the list against
+    the previous push and serializes the delta once; every connected client
+    then just replays the shared messages. A client that falls further
+    behind than the backlog is resynced with a fresh snapshot. `listeners`
+    are called with (seq, message) for every delta.
+    """
+    def __init__(self, adsb, min_interval=None, backlog=32):
+        self.adsb = adsb
+        self.min_interval = config.ADSB_PUSH_INTERVAL if min_interval is None else min_interval
+        self.running = False
+        self.thread = None
+
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.state = {}             # hex -> last pushed entry
+        self.deltas = deque(maxlen=backlog)  # (seq, serialized delta)
+        self.snapshot_cache = None  # (seq, serialized snapshot)
+        self.listeners = []
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def _loop(self):
+        version = 0
+        while self.running:
+            # Also wake once a second so evictions and extrapolation still go out
+            version = self.adsb.wait_for_change(version, timeout=1.0)
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Error publishing aircraft delta: {e}")
+            time.sleep(self.min_interval)
+
+    def publish(self):
+        aircraft = {ac['hex']: _stream_entry(ac) for ac in self.adsb.get_aircraft()}
+        added = [entry for hex_id, entry in aircraft.items() if hex_id not in self.state]
+        changed = {}
+        for hex_id, entry in aircraft.items():
+            old = self.state.get(hex_id)
+            if old is None:
+                continue
+            diff = {k: v for k, v in entry.items() if old.get(k) != v}
+            if diff:
+                changed[hex_id] = diff
+        removed = [hex_id for hex_id in self.state if hex_id not in aircraft]
+        if not (added or changed or removed):
+            return
+
+        with self.cond:
+            self.seq += 1
+            self.state = aircraft
+            seq = self.seq
+            msg = _sse('delta', {'seq': seq, 'added': added, 'changed': changed, 'removed': removed})
+            self.deltas.append((seq, msg))
+            self.cond.notify_all()
+        for listener in self.listeners:
+            listener(seq, msg)
+
+    def snapshot(self):
+        """(seq, serialized full list) as of the latest push, cached per seq."""
+        with self.cond:
+            if self.snapshot_cache is None or self.snapshot_cache[0] != self.seq:
+                self.snapshot_cache = (self.seq, _sse('snapshot', {
+                    'seq': self.seq, 'aircraft': list(self.state.values()),
+                }))
+            return self.snapshot_cache
+
+    def stream(self, keepalive=15.0):
+        """SSE generator for one client: a snapshot, then deltas as they happen."""
+        seq, msg = self.snapshot()
+        yield msg
+        while True:
+            with self.cond:
+                if not self.cond.wait_for(lambda: self.seq != seq, keepalive):
+                    pending = None
+                elif self.deltas and self.deltas[0][0] <= seq + 1:
+                    pending = [m for s, m in self.deltas if s > seq]
+                    seq = self.seq
+                else:
+                    pending = []  # Fell behind the backlog
+            if pending is None:
+                yield ": keepalive\n\n"
+            elif pending:
+                yield ''.join(pending)
+            else:
+                seq, msg = self.snapshot()
+                yield msg
@@ -0,0 +1,232 @@
+import numpy as np
+from geodesy import dead_reckon
+
+# Text fields kept per aircraft alongside the numeric columns
+INFO_FIELDS = {
+    'flight': 'flight',
+    'r': 'reg', 'reg': 'reg', 'registration': 'reg',
+    't': 'type', 'type': 'type',
+    'squawk': 'squawk',
+    'category': 'category',
+    'rssi': 'rssi',
+}
+
+
+def extract_info(fields):
+    """Text fields of an aircraft.json-style dict, under their store names."""
+    info = {}
+    for key, name in INFO_FIELDS.items():
+        value = fields.get(key)
+        if value is not None:
+            info[name] = value.strip() if isinstance(value, str) else value
+    return info
+
+
+def _num(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # alt_baro is the string "ground" for aircraft on the surface
+        return None
+
+
+class AircraftStore:
+    """
+    Hex-keyed aircraft state held in preallocated column arrays. Every slot
+    keeps a fixed-size ring buffer of recent position fixes, and positions can
+    be dead-reckoned from track / ground speed / vertical rate to any query
+    time in one vectorized pass. Not thread-safe: ADSBClient holds its lock.
+    """
+    def __init__(self, capacity=256, history=32):
+        self.history_len = history
+        self.index = {}     # hex -> slot
+        self.hexes = []     # slot -> hex (None when free)
+        self.info = []      # slot -> dict of text fields
+        self.free = []
+        self._alloc_arrays(capacity)
+
+    def _alloc_arrays(self, capacity):
+        self.capacity = capacity
+        self.lat = np.full(capacity, np.nan)
+        self.lon = np.full(capacity, np.nan)
+        self.alt = np.zeros(capacity)
+        self.track = np.zeros(capacity)
+        self.gs = np.zeros(capacity)
+        self.vrate = np.zeros(capacity)
+        self.t_pos = np.zeros(capacity)
+        self.t_seen = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+
+        self.h_t = np.zeros((capacity, self.history_len))
+        self.h_lat = np.zeros((capacity, self.history_len))
+        self.h_lon = np.zeros((capacity, self.history_len))
+        self.h_alt = np.zeros((capacity, self.history_len))
+        self.h_next = np.zeros(capacity, dtype=np.int32)
+        self.h_count = np.zeros(capacity, dtype=np.int32)
+
+    def _grow(self):
+        old = self.__dict__.copy()
+        old_cap = self.capacity
+        self._alloc_arrays(old_cap * 2)
+        for name in ('lat', 'lon', 'alt', 'track', 'gs', 'vrate', 't_pos', 't_seen', 'active',
+                     'h_t', 'h_lat', 'h_lon', 'h_alt', 'h_next', 'h_count'):
+            getattr(self, name)[:old_cap] = old[name]
+
+    def __len__(self):
+        return len(self.index)
+
+    def _slot(self, hex_id):
+        slot = self.index.get(hex_id)
+        if slot is not None:
+            return slot
+        if self.free:
+            slot = self.free.pop()
+            self.hexes[slot] = hex_id
+            self.info[slot] = {}
+        else:
+            slot = len(self.hexes)
+            if slot >= self.capacity:
+                self._grow()
+            self.hexes.append(hex_id)
+            self.info.append({})
+        self.index[hex_id] = slot
+        self.active[slot] = True
+        self.lat[slot] = np.nan
+        self.lon[slot] = np.nan
+        self.alt[slot] = 0.0
+        self.track[slot] = 0.0
+        self.gs[slot] = 0.0
+        self.vrate[slot] = 0.0
+        self.t_pos[slot] = 0.0
+        self.t_seen[slot] = 0.0
+        self.h_next[slot] = 0
+        self.h_count[slot] = 0
+        return slot
+
+    def update(self, hex_id, fields, t_seen, t_pos=None):
+        """
+        Merges aircraft.json-style fields into the aircraft's state. `t_pos` is
+        the time of the position fix (defaults to `t_seen`).
+        """
+        slot = self._slot(hex_id)
+        self.t_seen[slot] = max(self.t_seen[slot], t_seen)
+
+        alt = _num(fields.get('alt_baro', fields.get('alt_geom')))
+        if alt is not None:
+            self.alt[slot] = alt
+        elif fields.get('alt_baro') == 'ground':
+            self.alt[slot] = 0.0
+        for key, column in (('track', self.track), ('gs', self.gs)):
+            value = _num(fields.get(key))
+            if value is not None:
+                column[slot] = value
+        vrate = _num(fields.get('baro_rate', fields.get('geom_rate')))
+        if vrate is not None:
+            self.vrate[slot] = vrate
+
+        self.info[slot].update(extract_info(fields))
+
+        lat = fields.get('lat')
+        lon = fields.get('lon')
+        if lat is None or lon is None:
+            return
+        t_pos = t_seen if t_pos is None else t_pos
+        if t_pos <= self.t_pos[slot] or (lat == self.lat[slot] and lon == self.lon[slot]):
+            return  # Same fix as before (e.g. re-reported by the next poll)
+        self.lat[slot] = lat
+        self.lon[slot] = lon
+        self.t_pos[slot] = t_pos
+
+        i = self.h_next[slot]
+        self.h_t[slot, i] = t_pos
+        self.h_lat[slot, i] = lat
+        self.h_lon[slot, i] = lon
+        self.h_alt[slot, i] = self.alt[slot]
+        self.h_next[slot] = (i + 1) % self.history_len
+        self.h_count[slot] = min(self.h_count[slot] + 1, self.history_len)
+
+    def update_batch(self, hex_ids, t_seen, t_pos, lat, lon, alt, track, gs, vrate, infos):
+        """
+        Vectorized form of update() for a whole snapshot (e.g. one aircraft.json
+        poll). Numeric arguments are arrays aligned with `hex_ids`, NaN where a
+        field is missing; `infos` is a list of text-field dicts.
+        """
+        n = len(hex_ids)
+        if n == 0:
+            return
+        slots = np.fromiter((self._slot(h) for h in hex_ids), dtype=np.int64, count=n)
+        self.t_seen[slots] = np.maximum(self.t_seen[slots], t_seen)
+        for column, values in ((self.alt, alt), (self.track, track), (self.gs, gs), (self.vrate, vrate)):
+            ok = ~np.isnan(values)
+            column[slots[ok]] = values[ok]
+        for slot, info in zip(slots.tolist(), infos):
+            if info:
+                self.info[slot].update(info)
+
+        # Only genuinely new position fixes go into the ring buffers
+        new = (~np.isnan(lat) & ~np.isnan(lon) & (t_pos > self.t_pos[slots])
+               & ((lat != self.lat[slots]) | (lon != self.lon[slots])))
+        s = slots[new]
+        self.lat[s] = lat[new]
+        self.lon[s] = lon[new]
+        self.t_pos[s] = t_pos[new]
+
+        i = self.h_next[s]
+        self.h_t[s, i] = t_pos[new]
+        self.h_lat[s, i] = lat[new]
+        self.h_lon[s, i] = lon[new]
+        self.h_alt[s, i] = self.alt[s]
+        self.h_next[s] = (i + 1) % self.history_len
+        self.h_count[s] = np.minimum(self.h_count[s] + 1, self.history_len)
+
+    def evict(self, now, max_age):
+        """Drops aircraft not heard from within `max_age` seconds."""
+        stale = np.flatnonzero(self.active[:len(self.hexes)] & (now - self.t_seen[:len(self.hexes)] > max_age))
+        for slot in stale.tolist():
+            del self.index[self.hexes[slot]]
+            self.hexes[slot] = None
+            self.info[slot] = {}
+            self.active[slot] = False
+            self.free.append(slot)
+        return len(stale)
+
+    def predict(self, now, max_extrapolation):
+        """
+        Dead-reckoned state of every aircraft with a position, as of `now`.
+        Returns (slots, lat, lon, alt) arrays; extrapolation is capped at
+        `max_extrapolation` seconds past the last fix.
+        """
+        n = len(self.hexes)
+        slots = np.flatnonzero(self.active[:n] & ~np.isnan(self.lat[:n]))
+        dt = np.clip(now - self.t_pos[slots], 0.0, max_extrapolation)
+        lat, lon, alt = dead_reckon(self.lat[slots], self.lon[slots], self.alt[slots],
+                                    self.track[slots], self.gs[slots], self.vrate[slots], dt)
+        return slots, lat, lon, alt
+
+    def state(self, hex_id):
+        """Last fix and motion of one aircraft (for cueing), or None."""
+        slot = self.index.get(hex_id)
+        if slot is None or np.isnan(self.lat[slot]):
+            return None
+        return {
+            'hex': hex_id,
+            'lat': float(self.lat[slot]),
+            'lon': float(self.lon[slot]),
+            'alt': float(self.alt[slot]),
+            'track': float(self.track[slot]),
+            'gs': float(self.gs[slot]),
+            'vrate': float(self.vrate[slot]),
+            't_pos': float(self.t_pos[slot]),
+            'flight': self.info[slot].get('flight', ''),
+        }
+
+    def history(self, hex_id):
+        """Recent position fixes, oldest first, as a list of (t, lat, lon, alt)."""
+        slot = self.index.get(hex_id)
+        if slot is None:
+            return []
+        count = int(self.h_count[slot])
+        start = (int(self.h_next[slot]) - count) % self.history_len
+        order = [(start + k) % self.history_len for k in range(count)]
+        return [(float(self.h_t[slot, i]), float(self.h_lat[slot, i]),
+                 float(self.h_lon[slot, i]), float(self.h_alt[slot, i])) for i in order]
@@ -1,77 +1,234 @@
-from flask import Flask, render_template, Response, request, jsonify, stream_with_context
+from flask import Flask, render_template, Response, request, jsonify, stream_with_context, abort, send_file
 import time
-import json
 import threading
-from skywatch_core import SkyWatchCore
-import cv2
+from camera_worker import CameraWorker
+from frame_encoder import CameraStreams
+from h264_stream import H264Stream, h264_available
+from telemetry_feed import TelemetryFeed
+from metrics import metrics_text, gauge_text
+import tracing
 import config
+from geodesy import field_of_view
 
 app = Flask(__name__)
 
-# Global Core Instance
-core = SkyWatchCore()
+# Camera Registry: one worker process (capture + tracking + VISCA) per camera
+cameras = {cam['id']: CameraWorker(cam) for cam in config.CAMERAS}
+DEFAULT_CAMERA = config.CAMERAS[0]['id']
+# Shared MJPEG encodes per camera and output variant, started by the first viewer
+streams = {cam_id: CameraStreams(core) for cam_id, core in cameras.items()}
+h264_streams = {cam_id: H264Stream(core) for cam_id, core in cameras.items()}
+# Change-driven telemetry per camera, serialized once per update for all clients
+telemetry_feeds = {cam_id: TelemetryFeed(core) for cam_id, core in cameras.items()}
 from adsb_client import ADSBClient
 adsb = ADSBClient()
+from aircraft_feed import AircraftFeed
+aircraft_feed = AircraftFeed(adsb)
 
-def generate_mjpeg():
-    """Generator for MJPEG stream."""
-    while True:
-        frame = core.get_frame()
-        if frame is None:
-            time.sleep(0.01)
-            continue
-            
-        # Encode
-        (flag, encodedImage) = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-        if not flag:
-            continue
-            
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encodedImage) + b'\r\n')
-        
-        # Limit frame rate to ~60fps to balance smoothness and bandwidth
-        time.sleep(0.016)
-
-def generate_telemetry():
-    """Generator for SSE Telemetry."""
+def get_camera(cam_id):
+    core = cameras.get(cam_id or DEFAULT_CAMERA)
+    if core is None:
+        abort(404, description=f"Unknown camera '{cam_id}'")
+    return core
+
+def cue_refresh_loop():
+    """Keeps cued cameras fed with the latest ADS-B fix of their target."""
     while True:
-        data = core.get_telemetry_data()
-        data['timestamp'] = time.time()
-        yield f"data: {json.dumps(data)}\n\n"
-        time.sleep(0.05) # ~20Hz updates
+        for core in cameras.values():
+            cue_hex = core.get_telemetry_data().get('cue_hex')
+            if cue_hex:
+                target = adsb.get_target_state(cue_hex)
+                if target is not None:
+                    core.update_cue(target)
+        time.sleep(1.0)
 
 @app.route('/')
 def index():
-    return render_template('index.html', version=config.APP_VERSION, camera_height=config.CAMERA_HEIGHT_FT)
+    cam_id = request.args.get('cam', DEFAULT_CAMERA)
+    core = get_camera(cam_id)
+    video_mode = request.args.get('video', config.STREAM_VIDEO_MODE)
+    if video_mode == 'h264' and not h264_available():
+        video_mode = 'mjpeg'
+    return render_template('index.html', version=config.APP_VERSION, camera_height=config.CAMERA_HEIGHT_FT,
+                           camera_id=cam_id, cameras=list(cameras), video_mode=video_mode, osd_mode=config.OSD_MODE,
+                           north_offset=core.cam['north_offset_deg'],
+                           transport='ws' if app.config.get('ASYNC_SERVER') else 'http')
+
+@app.route('/api/osd/overlay')
+def osd_overlay():
+    """The overlay image, for pages that draw the OSD themselves (stream.osd: client)."""
+    return send_file(config.OVERLAY_IMAGE_PATH, mimetype='image/png', max_age=3600)
+
+@app.route('/api/cameras')
+def list_cameras():
+    return jsonify([{'id': cam['id'], 'name': cam['name']} for cam in config.CAMERAS])
 
 @app.route('/video_feed')
-def video_feed():
-    return Response(stream_with_context(generate_mjpeg()),
+@app.route('/video_feed/<cam_id>')
+def video_feed(cam_id=None):
+    """
+    MJPEG stream. Optional `w` (width, px), `q` (JPEG quality) and `fps` cap
+    the variant; it steps down automatically if the client can't keep up
+    (`adapt=0` to disable).
+    """
+    core = get_camera(cam_id)
+    width = request.args.get('w', type=int)
+    quality = request.args.get('q', type=int)
+    fps = request.args.get('fps', type=float)
+    adapt = request.args.get('adapt', '1') != '0'
+    stream = streams[core.cam['id']].stream(width, quality, fps, adapt)
+    return Response(stream_with_context(stream),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/video_h264')
+@app.route('/video_h264/<cam_id>')
+def video_h264(cam_id=None):
+    """
+    Low-latency H.264 as fragmented MP4 for Media Source Extensions. The
+    codec string for addSourceBuffer() is in the X-Codec header.
+    """
+    core = get_camera(cam_id)
+    if not h264_available():
+        return jsonify({'status': 'error', 'message': 'H.264 streaming requires PyAV (pip install av)'}), 501
+    codec, stream = h264_streams[core.cam['id']].open_client()
+    if codec is None:
+        return jsonify({'status': 'error', 'message': 'No video from camera'}), 503
+    return Response(stream_with_context(stream), mimetype='video/mp4',
+                    headers={'X-Codec': codec, 'Cache-Control': 'no-cache'})
+
+@app.route('/api/stream/stats')
+def stream_stats():
+    return jsonify({cam_id: {'mjpeg': s.stats(), 'h264': h264_streams[cam_id].stats()}
+                    for cam_id, s in streams.items()})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Prometheus text format: latency histograms of every core loop stage and
+    of the stream encoders, plus the processed frame rate, per camera.
+    """
+    stage_series, fps_series, encode_series = [], [], []
+    for cam_id, core in cameras.items():
+        try:
+            snapshot = core.metrics_snapshot()
+        except TimeoutError:
+            snapshot = None  # Worker busy or gone: its series are missing from this scrape
+        for stage, hist in (snapshot or {}).items():
+            stage_series.append(({'camera': cam_id, 'stage': stage}, hist))
+        fps_series.append(({'camera': cam_id}, core.get_telemetry_data().get('fps', 0)))
+
+        for (width, quality), hist in streams[cam_id].encode_times():
+            encode_series.append(({'camera': cam_id, 'codec': 'mjpeg', 'variant': f"{width}q{quality}"}, hist))
+        h264 = h264_streams[cam_id]
+        encode_series.append(({'camera': cam_id, 'codec': 'h264', 'variant': str(h264.width)},
+                              h264.encode_time.snapshot()))
+
+    body = (metrics_text('skywatch_stage_seconds', "Duration of each stage of the camera loop", stage_series)
+            + metrics_text('skywatch_encode_seconds', "Duration of one stream frame encode", encode_series)
+            + gauge_text('skywatch_fps', "Frames processed per second by the camera loop", fps_series))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/trace')
+def get_trace():
+    """
+    Chrome Trace Event JSON of the last `seconds` (default 10) of every thread
+    of the web server and the camera workers, for ui.perfetto.dev. Needs
+    trace.enabled.
+    """
+    if not tracing.ENABLED:
+        return jsonify({'status': 'error', 'message': 'Tracing is off (trace.enabled)'}), 409
+    seconds = request.args.get('seconds', type=float, default=10.0)
+    events = tracing.events(seconds, "SkyWatch web")
+    for cam_id, core in cameras.items():
+        try:
+            events += core.trace_events(seconds) or []
+        except TimeoutError:
+            print(f"[{cam_id}] No trace from camera worker")
+    response = jsonify({'traceEvents': events, 'displayTimeUnit': 'ms'})
+    response.headers['Content-Disposition'] = f'attachment; filename="skywatch-trace-{int(time.time())}.json"'
+    return response
+
 @app.route('/api/telemetry')
-def telemetry_feed():
-    return Response(stream_with_context(generate_telemetry()),
-                    mimetype='text/event-stream')
+@app.route('/api/telemetry/<cam_id>')
+def telemetry_feed(cam_id=None):
+    """
+    SSE: the full telemetry on connect, then `delta` events with the changed
+    fields whenever it changes. `max_hz` caps the rate, `delta=0` sends full
+    states only.
+    """
+    core = get_camera(cam_id)
+    feed = telemetry_feeds[core.cam['id']]
+    stream = feed.stream(request.args.get('max_hz', type=float), request.args.get('delta', '1') != '0')
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/aircraft')
 def get_aircraft():
     return jsonify(adsb.get_aircraft())
 
+@app.route('/api/aircraft/stream')
+def aircraft_stream():
+    """SSE: full aircraft snapshot on connect, then added/changed/removed deltas."""
+    return Response(stream_with_context(aircraft_feed.stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/aircraft/in_view')
+def get_aircraft_in_view():
+    """
+    Aircraft in a camera's current field of view (pan/tilt + zoom-derived
+    FOV), best match first. `az`, `el`, `hfov`, `vfov` override the camera;
+    `offset` replaces its north_offset_deg (the page sends its RADAR OFFSET).
+    """
+    cam_id = request.args.get('cam', DEFAULT_CAMERA)
+    core = get_camera(cam_id)
+    cam = core.cam
+    telemetry = core.get_telemetry_data()
+
+    crop = config.DIGITAL_CROP_FACTOR if telemetry.get('stab_active') else 1.0
+    hfov, vfov = field_of_view(telemetry.get('zoom', 1.0), cam['hfov_wide_deg'],
+                               config.CAMERA_WIDTH / config.CAMERA_HEIGHT, crop)
+    offset = request.args.get('offset', type=float, default=cam['north_offset_deg'])
+    az = request.args.get('az', type=float, default=(telemetry.get('pan', 0.0) + offset) % 360.0)
+    el = request.args.get('el', type=float, default=telemetry.get('tilt', 0.0))
+    hfov = request.args.get('hfov', type=float, default=float(hfov))
+    vfov = request.args.get('vfov', type=float, default=float(vfov))
+
+    aircraft = adsb.get_in_view(az, el, hfov, vfov)
+    return jsonify({
+        'camera': cam['id'],
+        'az': az, 'el': el, 'hfov': hfov, 'vfov': vfov,
+        'target': aircraft[0] if aircraft else None,
+        'aircraft': aircraft,
+    })
+
+@app.route('/api/aircraft/<hex_id>/history')
+def get_aircraft_history(hex_id):
+    return jsonify([{'t': t, 'lat': lat, 'lon': lon, 'alt': alt}
+                    for t, lat, lon, alt in adsb.get_history(hex_id.lower())])
+
+@app.route('/api/adsb/stats')
+def get_adsb_stats():
+    return jsonify(adsb.get_metrics())
+
 @app.route('/api/control', methods=['POST'])
 def control():
     cmd = request.json
+    core = get_camera(cmd.get('camera'))
+    result, status = handle_control(core, cmd)
+    return jsonify(result), status
+
+def handle_control(core, cmd):
+    """Applies one control command (HTTP or WebSocket). Returns (response, HTTP status)."""
     action = cmd.get('action')
-    
     if action == 'move':
         pan = float(cmd.get('pan', 0))
         tilt = float(cmd.get('tilt', 0))
         zoom = float(cmd.get('zoom', 0))
         core.set_manual_command(pan, tilt, zoom)
-        
+
     elif action == 'toggle_track':
         core.toggle_tracking()
-        
+
     elif action == 'toggle_stab':
         core.toggle_stabilization()
 
@@ -80,20 +237,62 @@ def control():
         i = float(cmd.get('i'))
         d = float(cmd.get('d'))
         core.set_pid(p, i, d)
-        
+
     elif action == 'set_speed':
         s = float(cmd.get('speed'))
         core.set_max_speed(s)
-        
-    return jsonify({'status': 'ok'})
 
-def start_server():
-    # Start Core
-    core.start()
+    elif action == 'cue':
+        target = adsb.get_target_state(str(cmd.get('hex', '')).lower())
+        if target is None:
+            return {'status': 'error', 'message': 'No position for that aircraft'}, 404
+        core.cue_target(target)
+
+    elif action == 'cancel_cue':
+        core.cancel_cue()
+
+    elif action == 'toggle_record':
+        core.toggle_recording()
+
+    elif action == 'start_record':
+        core.start_recording()
+
+    elif action == 'stop_record':
+        core.stop_recording()
+
+    elif action == 'save_clip':
+        post = cmd.get('post_seconds')
+        core.save_clip(None if post is None else float(post))
+
+    return {'status': 'ok'}, 200
+
+def start_services():
+    # Start Cameras (one worker process each)
+    for core in cameras.values():
+        core.start()
+    for feed in telemetry_feeds.values():
+        feed.start()
     adsb.start()
-    
+    aircraft_feed.start()
+    threading.Thread(target=cue_refresh_loop, daemon=True).start()
+
+def stop_services():
+    for stream in streams.values():
+        stream.stop()
+    for stream in h264_streams.values():
+        stream.stop()
+    for feed in telemetry_feeds.values():
+        feed.stop()
+    for core in cameras.values():
+        core.stop()
+    aircraft_feed.stop()
+    adsb.stop()
+
+def start_server():
+    start_services()
+
     # Start Flask
-    app.run(host='0.0.0.0', port=5001, debug=False, use_reloader=False)
+    app.run(host='0.0.0.0', port=5001, debug=False, use_reloader=False, threaded=True)
 
 if __name__ == '__main__':
     try:
@@ -101,5 +300,4 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         pass
     finally:
-        core.stop()
-        adsb.stop()
+        stop_services()
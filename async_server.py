@@ -0,0 +1,353 @@
+"""
+Async (ASGI) server mode.
+
+    pip install starlette "uvicorn[standard]" a2wsgi
+    python async_server.py [--host 0.0.0.0] [--port 5001]
+
+Video, telemetry and the aircraft feed are served from one asyncio event
+loop, so a viewer costs a coroutine and a small queue instead of an OS
+thread blocked in a generator. Camera control and telemetry share one
+persistent WebSocket per page (`/ws/<cam>`), so joystick commands no longer
+pay for a new HTTP request each tick. Everything else (the page, static
+files, JSON APIs) is the regular Flask app, mounted underneath.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+
+import config
+from app import (app as flask_app, cameras, DEFAULT_CAMERA, streams, h264_streams, telemetry_feeds,
+                 aircraft_feed, handle_control, start_services, stop_services)
+from frame_encoder import AdaptiveVariant
+from h264_stream import H264Stream, h264_available
+from telemetry_feed import ENCODINGS
+
+try:
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Mount, Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+except ImportError as e:
+    raise SystemExit(f"Async server mode needs: pip install starlette 'uvicorn[standard]' a2wsgi ({e})")
+
+KEEPALIVE = 15.0
+
+
+class Broadcast:
+    """
+    Fans items published by worker threads out to asyncio subscribers. Each
+    subscriber has its own bounded queue; when it is full the oldest item is
+    dropped, so a slow client skips ahead instead of holding anything up.
+    Items carry sequence numbers where gaps matter.
+    """
+    def __init__(self, loop, maxsize=1):
+        self.loop = loop
+        self.maxsize = maxsize
+        self.queues = set()
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.maxsize)
+        self.queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+
+    def publish(self, item):
+        """Event loop side."""
+        for queue in self.queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(item)
+
+    def publish_threadsafe(self, *item):
+        """Listener for SharedMJPEGEncoder / H264Stream / AircraftFeed (any thread)."""
+        if not self.queues:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.publish, item)
+        except RuntimeError:
+            pass  # Loop closed during shutdown
+
+
+_broadcasts = {}         # id(source) -> Broadcast fed by the source's listeners
+
+
+def broadcast_for(source, maxsize=1):
+    bc = _broadcasts.get(id(source))
+    if bc is None:
+        bc = Broadcast(asyncio.get_running_loop(), maxsize)
+        _broadcasts[id(source)] = bc
+        source.listeners.append(bc.publish_threadsafe)
+    return bc
+
+
+async def telemetry_updates(feed, max_hz, encoding='json', deltas=True):
+    """
+    Yields the pre-serialized TelemetryFeed messages for one client as the
+    telemetry changes, at most `max_hz` times a second.
+    """
+    min_interval = 1.0 / (max_hz or config.TELEMETRY_MAX_HZ)
+    bc = broadcast_for(feed)
+    queue = bc.subscribe()
+    seq = cold_seq = 0
+    try:
+        while True:
+            seq, cold_seq, messages = feed.updates_since(seq, cold_seq, encoding, deltas)
+            if not messages:
+                await queue.get()
+                continue
+            sent = time.perf_counter()
+            yield messages
+            wait = min_interval - (time.perf_counter() - sent)
+            if wait > 0:
+                await asyncio.sleep(wait)
+    finally:
+        bc.unsubscribe(queue)
+
+
+def _camera_id(conn):
+    cam_id = conn.path_params.get('cam_id') or DEFAULT_CAMERA
+    return cam_id if cam_id in cameras else None
+
+
+def _arg(params, name, type_):
+    try:
+        return type_(params[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _not_found(cam_id):
+    return JSONResponse({'status': 'error', 'message': f"Unknown camera '{cam_id}'"}, status_code=404)
+
+
+# --- Video ---
+async def _mjpeg_stream(cam_streams, width, quality, fps, adapt):
+    client = AdaptiveVariant(cam_streams, width, quality, fps, adapt)
+    bc = broadcast_for(client.encoder)
+    queue = bc.subscribe()
+    try:
+        while True:
+            seq, part = await queue.get()
+            wait = client.frame_arrived()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                while not queue.empty():
+                    seq, part = queue.get_nowait()  # Send the newest frame after pacing
+
+            client.sending()
+            yield part
+            if client.sent():
+                bc.unsubscribe(queue)
+                bc = broadcast_for(client.encoder)
+                queue = bc.subscribe()
+    finally:
+        bc.unsubscribe(queue)
+        client.close()
+
+
+async def video_feed(request):
+    """Same parameters as the Flask /video_feed (w, q, fps, adapt)."""
+    cam_id = _camera_id(request)
+    if cam_id is None:
+        return _not_found(request.path_params.get('cam_id'))
+    params = request.query_params
+    stream = _mjpeg_stream(streams[cam_id], _arg(params, 'w', int), _arg(params, 'q', int),
+                           _arg(params, 'fps', float), params.get('adapt', '1') != '0')
+    return StreamingResponse(stream, media_type='multipart/x-mixed-replace; boundary=frame')
+
+
+async def _h264_stream(stream, bc, queue, init_segment, seq):
+    try:
+        yield init_segment
+        need_keyframe = True
+        while True:
+            frag_seq, is_keyframe, fragment = await queue.get()
+            if frag_seq <= seq:
+                continue
+            if frag_seq != seq + 1 and not need_keyframe:
+                need_keyframe = True  # Fell out of the queue
+                stream.request_keyframe()
+            seq = frag_seq
+            if need_keyframe and not is_keyframe:
+                continue
+            need_keyframe = False
+            yield fragment
+    finally:
+        bc.unsubscribe(queue)
+        stream.unsubscribe()
+
+
+async def video_h264(request):
+    cam_id = _camera_id(request)
+    if cam_id is None:
+        return _not_found(request.path_params.get('cam_id'))
+    if not h264_available():
+        return JSONResponse({'status': 'error', 'message': 'H.264 streaming requires PyAV (pip install av)'},
+                            status_code=501)
+    stream = h264_streams[cam_id]
+    bc = broadcast_for(stream, H264Stream.BACKLOG)
+    queue = bc.subscribe()  # Before subscribing, so no fragment after the init segment is missed
+    subscription = await asyncio.get_running_loop().run_in_executor(None, stream.subscribe)
+    if subscription is None:
+        bc.unsubscribe(queue)
+        return JSONResponse({'status': 'error', 'message': 'No video from camera'}, status_code=503)
+    codec, init_segment, seq = subscription
+    return StreamingResponse(_h264_stream(stream, bc, queue, init_segment, seq), media_type='video/mp4',
+                             headers={'X-Codec': codec, 'Cache-Control': 'no-cache'})
+
+
+# --- Telemetry / Aircraft (SSE) ---
+async def telemetry_feed(request):
+    cam_id = _camera_id(request)
+    if cam_id is None:
+        return _not_found(request.path_params.get('cam_id'))
+
+    params = request.query_params
+    updates = telemetry_updates(telemetry_feeds[cam_id], _arg(params, 'max_hz', float),
+                                deltas=params.get('delta', '1') != '0')
+
+    async def events():
+        async for messages in updates:
+            yield ''.join((f"event: delta\ndata: {payload}\n\n" if kind == 'delta' else f"data: {payload}\n\n")
+                          for kind, payload in messages)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def aircraft_stream(request):
+    """Same protocol as AircraftFeed.stream(): a snapshot, then deltas, resynced on a gap."""
+    async def events(bc):
+        queue = bc.subscribe()  # Before the snapshot, so no delta after it is missed
+        try:
+            seq, msg = aircraft_feed.snapshot()
+            yield msg
+            while True:
+                try:
+                    delta_seq, delta = await asyncio.wait_for(queue.get(), KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if delta_seq <= seq:
+                    continue
+                if delta_seq == seq + 1:
+                    seq = delta_seq
+                    yield delta
+                else:
+                    seq, msg = aircraft_feed.snapshot()
+                    yield msg
+        finally:
+            bc.unsubscribe(queue)
+
+    bc = broadcast_for(aircraft_feed, maxsize=32)
+    return StreamingResponse(events(bc), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# --- Control + Telemetry (WebSocket) ---
+async def control_socket(websocket):
+    """
+    Client -> server: the /api/control JSON commands (the camera is the one in
+    the URL). An optional `id` is echoed in the `ack` reply, for measuring
+    round trips. Server -> client: telemetry whenever it changes, at most
+    `max_hz` times a second, as {"type": "telemetry", "data": {...}} (full
+    state) and {"type": "telemetry_delta", "data": {...}} (changed fields).
+    With `encoding=struct`, updates that only move pan/tilt/zoom are sent as
+    binary STATE_STRUCT records instead.
+    """
+    cam_id = _camera_id(websocket)
+    if cam_id is None:
+        await websocket.close(code=4404)
+        return
+    params = websocket.query_params
+    encoding = params.get('encoding', 'json')
+    if encoding not in ENCODINGS:
+        await websocket.close(code=4400)
+        return
+    core = cameras[cam_id]
+    await websocket.accept()
+
+    send_lock = asyncio.Lock()
+
+    async def send(message):
+        async with send_lock:
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+
+    async def push_telemetry():
+        updates = telemetry_updates(telemetry_feeds[cam_id], _arg(params, 'max_hz', float), encoding)
+        async for messages in updates:
+            for kind, payload in messages:
+                if kind == 'state':
+                    await send(payload)
+                else:
+                    await send(('{"type":"telemetry_delta","data":' if kind == 'delta'
+                                else '{"type":"telemetry","data":') + payload + '}')
+
+    pusher = asyncio.create_task(push_telemetry())
+    try:
+        while True:
+            try:
+                cmd = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(cmd, dict):
+                await send(json.dumps({'type': 'ack', 'id': None, 'code': 400,
+                                       'status': 'error', 'message': 'Command must be a JSON object'}))
+                continue
+            try:
+                result, status = handle_control(core, cmd)
+            except (TypeError, ValueError) as e:
+                result, status = {'status': 'error', 'message': str(e)}, 400
+            await send(json.dumps({'type': 'ack', 'id': cmd.get('id'), 'code': status, **result}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, start_services)
+    try:
+        yield
+    finally:
+        await loop.run_in_executor(None, stop_services)
+
+
+flask_app.config['ASYNC_SERVER'] = True  # Page uses the WebSocket for control + telemetry
+
+asgi_app = Starlette(routes=[
+    Route('/video_feed', video_feed),
+    Route('/video_feed/{cam_id}', video_feed),
+    Route('/video_h264', video_h264),
+    Route('/video_h264/{cam_id}', video_h264),
+    Route('/api/telemetry', telemetry_feed),
+    Route('/api/telemetry/{cam_id}', telemetry_feed),
+    Route('/api/aircraft/stream', aircraft_stream),
+    WebSocketRoute('/ws', control_socket),
+    WebSocketRoute('/ws/{cam_id}', control_socket),
+    Mount('/', WSGIMiddleware(flask_app)),
+], lifespan=lifespan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkyWatch async (ASGI) server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+    # One process: the camera workers and shared encoders live in it
+    uvicorn.run(asgi_app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+OSD renderer benchmark for main.py at 1080p.
+
+    python bench_hud.py
+    python bench_hud.py --image frame.png
+
+Times the previous per-frame OpenCV path (mask-copied overlay, every string
+and gauge redrawn with outlined anti-aliased primitives) against
+osd.HUDRenderer (pre-rendered static layer + cached sprites) while the pan
+sweeps, the tilt moves and the clock ticks, and reports how far the two
+images differ.
+"""
+import argparse
+import math
+import time
+from datetime import datetime, timezone
+import cv2
+import numpy as np
+import config
+from bench_jpeg import synthetic_frame
+from osd import HUDRenderer
+
+
+# --- The outlined OpenCV primitives main.py drew the OSD with before HUDRenderer ---
+def draw_text(img, text, pos, font, scale, color, thickness=1):
+    cv2.putText(img, text, pos, font, scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.putText(img, text, pos, font, scale, color, thickness, cv2.LINE_AA)
+
+def draw_line(img, pt1, pt2, color, thickness=1):
+    cv2.line(img, pt1, pt2, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.line(img, pt1, pt2, color, thickness, cv2.LINE_AA)
+
+def draw_circle(img, center, radius, color, thickness=1):
+    cv2.circle(img, center, radius, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.circle(img, center, radius, color, thickness, cv2.LINE_AA)
+
+def draw_ellipse(img, center, axes, angle, start_angle, end_angle, color, thickness=1):
+    cv2.ellipse(img, center, axes, angle, start_angle, end_angle, (0, 0, 0), thickness + 2, cv2.LINE_AA)
+    cv2.ellipse(img, center, axes, angle, start_angle, end_angle, color, thickness, cv2.LINE_AA)
+
+def draw_poly_filled(img, pts, color):
+    cv2.drawContours(img, [pts], 0, color, -1, cv2.LINE_AA)
+    cv2.drawContours(img, [pts], 0, (0, 0, 0), 1, cv2.LINE_AA)
+
+
+def legacy_osd(frame, overlay, status, status_color, stab_active, speed_str, pid_str, pan_deg, tilt_deg, zoom_ratio):
+    """The main.py OSD as it was drawn before HUDRenderer."""
+    h, w = frame.shape[:2]
+    if overlay is not None:
+        oh, ow = overlay.shape[:2]
+        if oh <= h and ow <= w and overlay.shape[2] == 4:
+            mask = overlay[:, :, 3] > 0
+            frame[0:oh, 0:ow][mask] = overlay[:, :, :3][mask]
+
+    white = (255, 255, 255)
+    font = cv2.FONT_HERSHEY_PLAIN
+    s, t, lh = 1.5, 2, 25
+    now = datetime.now()
+    draw_text(frame, "AIRPLANE IAN SYSTEMS 401", (20, 30), font, s, white, t)
+    draw_text(frame, now.strftime("%m/%d/%Y"), (20, 30 + lh), font, s, white, t)
+    draw_text(frame, datetime.now(timezone.utc).strftime("%H:%M:%S Z"), (20, 30 + lh * 2), font, s, white, t)
+    draw_text(frame, now.strftime("%H:%M:%S LCL"), (20, 30 + lh * 3), font, s, white, t)
+    y = h - 60
+    for i, label in enumerate(("HDEO", "FOC MAN", "EXP AUT")):
+        draw_text(frame, label, (20, y - lh * (3 - i)), font, s, white, t)
+    draw_text(frame, speed_str, (20, y), font, s, white, t)
+    draw_text(frame, pid_str, (20, y + lh), font, s, white, t)
+    draw_text(frame, "SPACE=TRACK WASD=MAN Q/E=SPEED Z=STAB", (20, y + lh * 2), font, s, white, t)
+    draw_text(frame, status, (20, h // 2), font, s, status_color, t)
+    draw_text(frame, "DSTAB ACT" if stab_active else "DSTAB STBY", (20, h // 2 + 25), font, s,
+              (0, 0, 255) if stab_active else white, t)
+
+    r = 60
+    zx, zy = (w - 240) // 2, h - 40
+    tcx, tcy = w // 2 - r - 20, zy - r - 30
+    pcx, pcy = w // 2 + r + 20, tcy
+    draw_circle(frame, (pcx, pcy), r, white, 2)
+    draw_line(frame, (pcx, pcy - r), (pcx, pcy - r + 5), white, 2)
+    rad = math.radians(pan_deg - 90)
+    draw_line(frame, (pcx, pcy), (int(pcx + r * math.cos(rad)), int(pcy + r * math.sin(rad))), white, 2)
+    draw_text(frame, f"{int(pan_deg)}", (pcx + r + 5, pcy + r), font, 1, white, 2)
+    draw_ellipse(frame, (tcx, tcy), (r, r), 0, -90, 30, white, 2)
+    draw_line(frame, (tcx + r - 5, tcy), (tcx + r, tcy), white, 2)
+    rad = math.radians(-max(config.TILT_MIN_DEG, min(config.TILT_MAX_DEG, tilt_deg)))
+    draw_line(frame, (tcx, tcy), (int(tcx + r * math.cos(rad)), int(tcy + r * math.sin(rad))), white, 2)
+    t_str = f"{int(tilt_deg)}"
+    (t_w, _), _ = cv2.getTextSize(t_str, font, 1, 1)
+    draw_text(frame, t_str, (tcx - r - t_w - 5, tcy + r), font, 1, white, 2)
+    draw_line(frame, (zx, zy), (zx + 240, zy), white, 2)
+    draw_text(frame, "W", (zx - 20, zy + 5), font, 1, white, 2)
+    draw_text(frame, "N", (zx + 250, zy + 5), font, 1, white, 2)
+    mx = int(zx + zoom_ratio * 240)
+    draw_poly_filled(frame, np.array([(mx, zy), (mx - 8, zy + 13), (mx + 8, zy + 13)]), white)
+
+
+def state(i):
+    """OSD inputs of frame i: pan sweeps 1 deg/frame, tilt oscillates, zoom creeps."""
+    return ("TRK ACT", (0, 0, 255), i % 60 < 30, f"MAX SPD {5 + (i % 8) * 0.25:.2f} (SET)",
+            "P=0.50 I=0.05 D=0.90", float(i % 360), 40 * math.sin(i / 30), (i % 100) / 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main.py OSD renderer")
+    parser.add_argument('--image', help="Background frame (default: synthetic sky)")
+    parser.add_argument('--frames', type=int, default=600)
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image) if args.image else synthetic_frame()
+    frame = cv2.resize(frame, (1920, 1080))
+    overlay = cv2.imread(config.OVERLAY_IMAGE_PATH, cv2.IMREAD_UNCHANGED)
+    hud = HUDRenderer(overlay)
+
+    def run(draw):
+        canvas = frame.copy()
+        elapsed = 0.0
+        for i in range(args.frames):
+            canvas[:] = frame
+            t = time.perf_counter()
+            draw(canvas, i)
+            elapsed += time.perf_counter() - t
+        return elapsed / args.frames * 1000, canvas
+
+    def new(hud):
+        def draw(canvas, i):
+            hud.draw_static(canvas)
+            hud.draw(canvas, *state(i))
+        return draw
+
+    t = time.perf_counter()
+    hud.draw_static(frame.copy())
+    setup_ms = (time.perf_counter() - t) * 1000
+    legacy_ms, legacy_img = run(lambda canvas, i: legacy_osd(canvas, overlay, *state(i)))
+    new_ms, new_img = run(new(hud))
+    bare_legacy_ms, _ = run(lambda canvas, i: legacy_osd(canvas, None, *state(i)))
+    bare_new_ms, _ = run(new(HUDRenderer()))
+
+    diff = cv2.absdiff(legacy_img, new_img)
+    print(f"1080p, {args.frames} frames (pan sweep, tilt swing, clock ticking)")
+    print(f"legacy OSD:    {legacy_ms:7.3f} ms/frame")
+    print(f"HUDRenderer:   {new_ms:7.3f} ms/frame  ({legacy_ms / new_ms:.0f}x, static layer built once in {setup_ms:.1f} ms)")
+    print(f"without overlay: legacy {bare_legacy_ms:.3f} ms/frame, HUDRenderer {bare_new_ms:.3f} ms/frame "
+          f"({bare_legacy_ms / bare_new_ms:.1f}x)")
+    print(f"sprite cache:  {hud.sprites.hits} hits, {hud.sprites.misses} misses, {len(hud.sprites.cache)} cached")
+    print(f"image diff:    mean {diff.mean():.4f}, {np.count_nonzero(diff.max(axis=2) > 32)} px differ by > 32 "
+          f"(overlay and text edges now alpha-blended)")
+
+
+if __name__ == '__main__':
+    main()
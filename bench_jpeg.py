@@ -0,0 +1,89 @@
+"""
+JPEG encoder benchmark for the /video_feed pipeline.
+
+    python bench_jpeg.py                     # synthetic sky frame
+    python bench_jpeg.py --image frame.png   # or a real capture
+    python bench_jpeg.py --video clip.mp4
+
+Times every available backend (OpenCV, libjpeg-turbo) at the stream
+resolutions and quality levels, then measures throughput of the shared
+encode pool with 1..N threads.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from frame_encoder import available_backends, make_jpeg_encoder
+from concurrent.futures import ThreadPoolExecutor
+
+RESOLUTIONS = [(1920, 1080), (1280, 720), (960, 540), (640, 360)]
+QUALITIES = [60, 75, 85]
+
+
+def synthetic_frame(w=1920, h=1080):
+    """Sky gradient with cloud-like noise, a horizon band and a small aircraft."""
+    rng = np.random.default_rng(0)
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    sky = np.empty((h, w, 3), np.float32)
+    sky[..., 0] = 230 - 60 * y
+    sky[..., 1] = 190 - 50 * y
+    sky[..., 2] = 140 - 40 * y
+    clouds = cv2.GaussianBlur(rng.normal(0, 40, (h // 8, w // 8)).astype(np.float32), (0, 0), 3)
+    sky += cv2.resize(clouds, (w, h))[..., None]
+    sky[int(h * 0.85):] = rng.normal(70, 25, (h - int(h * 0.85), w, 3))
+    frame = np.clip(sky, 0, 255).astype(np.uint8)
+    cv2.rectangle(frame, (w // 2 - 12, h // 2 - 3), (w // 2 + 12, h // 2 + 3), (40, 40, 40), -1)
+    return frame
+
+
+def time_encode(encoder, frame, repeat):
+    encoder.encode(frame)
+    t = time.perf_counter()
+    for _ in range(repeat):
+        jpeg = encoder.encode(frame)
+    return (time.perf_counter() - t) / repeat * 1000, len(jpeg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JPEG encoder backends")
+    parser.add_argument('--image', help="Frame to encode (default: synthetic)")
+    parser.add_argument('--video', help="Take the first frame of a video file")
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=4, help="Max pool size for the throughput test")
+    args = parser.parse_args()
+
+    if args.image:
+        frame = cv2.imread(args.image)
+    elif args.video:
+        ok, frame = cv2.VideoCapture(args.video).read()
+        frame = frame if ok else None
+    else:
+        frame = synthetic_frame()
+    if frame is None:
+        print("Could not load frame")
+        return
+    frame = cv2.resize(frame, (1920, 1080))
+
+    print(f"{'backend':10s} {'subsamp':8s} {'res':>10s} {'q':>3s} {'ms':>8s} {'KB':>8s}")
+    for backend in available_backends():
+        for subsampling in ('420', '444'):
+            for w, h in RESOLUTIONS:
+                scaled = frame if w == 1920 else cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+                for quality in QUALITIES:
+                    encoder = make_jpeg_encoder(backend, quality, subsampling, fast_dct=True)
+                    ms, size = time_encode(encoder, scaled, args.repeat)
+                    print(f"{backend:10s} {subsampling:8s} {w:>5d}x{h:<4d} {quality:3d} {ms:8.2f} {size / 1024:8.1f}")
+
+    print(f"\nPool throughput, 1080p q85 4:2:0 ({args.repeat * 4} frames)")
+    for backend in available_backends():
+        encoder = make_jpeg_encoder(backend, 85, '420', fast_dct=True)
+        for threads in range(1, args.threads + 1):
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                t = time.perf_counter()
+                list(pool.map(encoder.encode, [frame] * (args.repeat * 4)))
+                fps = args.repeat * 4 / (time.perf_counter() - t)
+            print(f"{backend:10s} {threads} thread(s): {fps:7.1f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
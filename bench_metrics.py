@@ -0,0 +1,72 @@
+"""
+Overhead of the per-stage latency instrumentation (metrics.py).
+
+    python bench_metrics.py
+    python bench_metrics.py --frame-ms 20    # compare against a faster loop
+
+Times StageMetrics.lap() (one clock read + one histogram sample), the
+once-a-second telemetry summary and a /metrics render, then reports the
+cost of instrumenting every stage of one frame as a share of the frame
+time: a synthetic 1080p core loop iteration (copy, overlay blend, OSD) or
+`--frame-ms`. The budget is 1%.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from metrics import StageMetrics, CORE_STAGES, metrics_text
+from bench_jpeg import synthetic_frame
+
+
+def time_per_call(fn, repeat):
+    fn()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat
+
+
+def synthetic_loop_ms(frame, repeat):
+    """Median of the untimed per-frame work every loop iteration does, without tracking."""
+    h, w = frame.shape[:2]
+    overlay = np.zeros((h, w, 4), np.uint8)
+    cv2.rectangle(overlay, (40, 40), (w - 40, h - 40), (255, 255, 255, 255), 2)
+    mask = overlay[:, :, 3] > 0
+    overlay_bgr = overlay[:, :, :3]
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        display = frame.copy()
+        display[mask] = overlay_bgr[mask]
+        cv2.line(display, (w // 2 - 20, h // 2), (w // 2 + 20, h // 2), (255, 255, 255), 1, cv2.LINE_AA)
+        cv2.line(display, (w // 2, h // 2 - 20), (w // 2, h // 2 + 20), (255, 255, 255), 1, cv2.LINE_AA)
+        times.append(time.perf_counter() - t)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the latency instrumentation overhead")
+    parser.add_argument('--repeat', type=int, default=200000)
+    parser.add_argument('--frame-ms', type=float, help="Frame time to compare against (default: measured)")
+    args = parser.parse_args()
+
+    metrics = StageMetrics(CORE_STAGES)
+    stage = iter(CORE_STAGES * (args.repeat // len(CORE_STAGES) + 2))
+    lap_us = time_per_call(lambda: metrics.lap(next(stage), time.perf_counter()), args.repeat) * 1e6
+    summary_us = time_per_call(metrics.summary, 1000) * 1e6
+    render_us = time_per_call(lambda: metrics_text('skywatch_stage_seconds', '',
+                                                    [({'camera': 'cam1', 'stage': s}, h)
+                                                     for s, h in metrics.snapshot().items()]), 1000) * 1e6
+
+    frame_ms = args.frame_ms or synthetic_loop_ms(synthetic_frame(), 50)
+    per_frame_us = lap_us * len(CORE_STAGES) + summary_us * frame_ms / 1000
+    print(f"lap():              {lap_us:8.3f} us")
+    print(f"summary():          {summary_us:8.3f} us (once a second)")
+    print(f"/metrics render:    {render_us:8.3f} us (per scrape, off the loop)")
+    print(f"frame time:         {frame_ms:8.3f} ms {'(given)' if args.frame_ms else '(synthetic 1080p loop)'}")
+    print(f"overhead per frame: {per_frame_us:8.3f} us = {per_frame_us / (frame_ms * 10):.4f}% "
+          f"of the frame ({len(CORE_STAGES)} stages, budget 1%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Digital stabilization benchmark at 1080p.
+
+    python bench_stabilize.py
+    python bench_stabilize.py --smoothing 0.2
+
+Compares the previous crop (fresh black canvas, paste, cv2.resize to full
+size) with stabilizer.Stabilizer (one resize, or warpAffine with `subpixel`,
+into a reused buffer). It reports time and bytes allocated per frame
+(tracemalloc), plus how much the crop centre shakes (RMS frame-to-frame change of its velocity, in pixels) and
+how far it is from a target that moves across the frame while the tracker
+reports it with a few pixels of noise.
+"""
+import argparse
+import math
+import time
+import tracemalloc
+import cv2
+import numpy as np
+import config
+from bench_jpeg import synthetic_frame
+from kalman_filter import SkyWatchKalman
+from stabilizer import Stabilizer
+
+
+def legacy_crop(frame, target_x, target_y):
+    """The stabilization crop as it was done before Stabilizer."""
+    h, w = frame.shape[:2]
+    crop_h = int(h * config.DIGITAL_CROP_FACTOR)
+    crop_w = int(w * config.DIGITAL_CROP_FACTOR)
+    crop_x1 = int(target_x - crop_w // 2)
+    crop_y1 = int(target_y - crop_h // 2)
+    cropped_frame = np.zeros((crop_h, crop_w, 3), dtype=np.uint8)
+    src_x1, src_y1 = max(0, crop_x1), max(0, crop_y1)
+    src_x2, src_y2 = min(w, crop_x1 + crop_w), min(h, crop_y1 + crop_h)
+    dst_x1, dst_y1 = src_x1 - crop_x1, src_y1 - crop_y1
+    if src_x2 > src_x1 and src_y2 > src_y1:
+        cropped_frame[dst_y1:dst_y1 + src_y2 - src_y1, dst_x1:dst_x1 + src_x2 - src_x1] = frame[src_y1:src_y2, src_x1:src_x2]
+    return cv2.resize(cropped_frame, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def track(frames, dt, rng):
+    """(true, measured, (kf_x, kf_y, kf_vx, kf_vy)) per frame of a target sweeping across the frame."""
+    kf = None
+    for i in range(frames):
+        tx = 400 + 1100 * (0.5 - 0.5 * math.cos(i / frames * math.pi))
+        ty = 540 + 150 * math.sin(i / 90)
+        mx, my = tx + rng.normal(0, 3), ty + rng.normal(0, 3)
+        if kf is None:
+            kf = SkyWatchKalman(mx, my, process_noise=config.KF_PROCESS_NOISE,
+                                measurement_noise=config.KF_MEASUREMENT_NOISE)
+        kf.predict(dt)
+        yield (tx, ty), (mx, my), kf.update(mx, my)
+
+
+def shake_and_lag(centres, truth):
+    c = np.asarray(centres)
+    accel = np.diff(c, n=2, axis=0)
+    return (float(np.sqrt((accel ** 2).sum(axis=1).mean())),
+            float(np.linalg.norm(c - np.asarray(truth), axis=1).mean()))
+
+
+def per_frame(fn, frames):
+    t = time.perf_counter()
+    for i in range(frames):
+        fn(i)
+    elapsed = (time.perf_counter() - t) / frames
+    tracemalloc.start()
+    for i in range(frames // 10):
+        fn(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the digital stabilization crop")
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--smoothing', type=float, default=config.DIGITAL_STAB_SMOOTHING)
+    args = parser.parse_args()
+
+    frame = cv2.resize(synthetic_frame(), (1920, 1080))
+    dt = 1 / 30
+    samples = list(track(args.frames, dt, np.random.default_rng(0)))
+    truth = [s[0] for s in samples]
+
+    legacy_ms, legacy_bytes = per_frame(lambda i: legacy_crop(frame, *samples[i][1]), args.frames)
+    stab = Stabilizer(smoothing_s=args.smoothing)
+    h, w = frame.shape[:2]
+
+    def render(i):
+        _, measured, (_, _, kf_vx, kf_vy) = samples[i]
+        stab.update(measured, (kf_vx, kf_vy), dt)
+        stab.render(frame, stab.crop(w, h))
+    render(0)  # Allocates the output buffers
+    new_ms, new_bytes = per_frame(render, args.frames)
+    stab.subpixel = True
+    stab.reset()
+    subpixel_ms, subpixel_bytes = per_frame(render, args.frames)
+
+    stab.reset()
+    centres = []
+    for _, measured, (_, _, kf_vx, kf_vy) in samples:
+        stab.update(measured, (kf_vx, kf_vy), dt)
+        centres.append(stab.center[:])
+    legacy_shake, legacy_lag = shake_and_lag([s[1] for s in samples], truth)
+    new_shake, new_lag = shake_and_lag(centres, truth)
+
+    print(f"1080p, crop factor {config.DIGITAL_CROP_FACTOR}, {args.frames} frames, smoothing {args.smoothing} s")
+    print(f"legacy crop+resize:  {legacy_ms:7.3f} ms/frame, {legacy_bytes / 1e6:6.2f} MB allocated at peak")
+    print(f"Stabilizer:          {new_ms:7.3f} ms/frame, {new_bytes / 1e6:6.2f} MB allocated at peak")
+    print(f"Stabilizer subpixel: {subpixel_ms:7.3f} ms/frame, {subpixel_bytes / 1e6:6.2f} MB allocated at peak")
+    print(f"crop centre shake:   legacy {legacy_shake:.2f} px, Stabilizer {new_shake:.2f} px (RMS change of velocity per frame)")
+    print(f"crop centre error:   legacy {legacy_lag:.2f} px, Stabilizer {new_lag:.2f} px (mean distance from the true target)")
+
+
+if __name__ == '__main__':
+    main()
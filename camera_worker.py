@@ -0,0 +1,296 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import itertools
+import signal
+import threading
+import time
+import traceback
+import cv2
+import numpy as np
+import config
+
+# Every worker publishes its latest output frame into one shared-memory slot
+# sized for the configured camera resolution, so frames never get pickled.
+# The slot is followed by the frame's capture time (float64, time.time()).
+FRAME_SLOT_BYTES = config.CAMERA_WIDTH * config.CAMERA_HEIGHT * 3
+SHM_BYTES = FRAME_SLOT_BYTES + 8
+
+
+def _worker_main(camera, shm_name, frame_lock, cmd_queue, evt_conn):
+    """Entry point of a camera worker process: owns one SkyWatchCore."""
+    # Ctrl-C goes to the whole process group; shutdown is driven by the parent.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from skywatch_core import SkyWatchCore
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slot = np.ndarray((FRAME_SLOT_BYTES,), dtype=np.uint8, buffer=shm.buf)
+    slot_time = np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=FRAME_SLOT_BYTES)
+    send_lock = threading.Lock()
+    pending = {'frame': None, 'seq': 0, 'captured': 0.0, 'render': None, 'telemetry': None}
+    pending_lock = threading.Lock()
+    pending_event = threading.Event()
+    running = True
+
+    def send(msg):
+        with send_lock:
+            evt_conn.send(msg)
+
+    def on_update(frame, telemetry):
+        # Called from the core loop: only hand over references, never block
+        with pending_lock:
+            if frame is not None:
+                pending['frame'] = frame
+                pending['seq'] = core.frame_seq  # Same numbering as the `osd` geometry in telemetry
+                pending['captured'] = core.frame_time
+                pending['render'] = core.frame_render
+            if telemetry is not None:
+                pending['telemetry'] = telemetry  # Unchanged telemetry never overwrites a pending change
+        pending_event.set()
+
+    def publisher():
+        while running:
+            if not pending_event.wait(timeout=0.5):
+                continue
+            with pending_lock:
+                frame = pending['frame']
+                seq = pending['seq']
+                captured = pending['captured']
+                render = pending['render']
+                telemetry = pending['telemetry']
+                pending['frame'] = None
+                pending['telemetry'] = None
+                pending_event.clear()
+
+            shape = None
+            if frame is not None:
+                # The frame may be a Stabilizer buffer the loop renders into again
+                with core.render_lock:
+                    if core.display_intact(render):  # Else a newer frame is already pending
+                        if frame.nbytes > FRAME_SLOT_BYTES:
+                            frame = cv2.resize(frame, (config.CAMERA_WIDTH, config.CAMERA_HEIGHT))
+                        with frame_lock:
+                            slot[:frame.nbytes] = frame.reshape(-1)
+                            slot_time[0] = captured
+                        shape = frame.shape
+            try:
+                send(('update', seq, shape, telemetry))
+            except (BrokenPipeError, EOFError, OSError):
+                break
+
+    core = SkyWatchCore(camera)
+    core.on_update = on_update
+    core.start()
+    pub_thread = threading.Thread(target=publisher, daemon=True)
+    pub_thread.start()
+
+    try:
+        while True:
+            req_id, method, args = cmd_queue.get()
+            if method == 'stop':
+                break
+            try:
+                result = getattr(core, method)(*args)
+            except Exception as e:
+                print(f"[{camera['id']}] Error in {method}: {e}")
+                traceback.print_exc()
+                result = None
+            if req_id is not None:
+                send(('reply', req_id, result))
+    finally:
+        running = False
+        core.stop()
+        pub_thread.join(timeout=1.0)
+        shm.close()
+        evt_conn.close()
+
+
+class CameraWorker:
+    """
+    Runs one camera's capture, tracking and VISCA pipeline in a separate
+    process and mirrors the SkyWatchCore interface used by the web server.
+    """
+    def __init__(self, camera):
+        self.cam = camera
+        self.process = None
+        self.reader = None
+        self.shm = None
+        self.frame = None
+        self.frame_time = None
+
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.frame_seq = 0
+        self.frame_shape = None
+        self.subscribers = 0
+        self.telemetry = {'camera': camera['id'], 'status': "STARTING"}
+        self.telemetry_version = 0
+        self._replies = {}
+        self._pending = set()  # Request ids a call() is still waiting on; other replies are dropped
+        self._req_ids = itertools.count(1)
+
+    def start(self):
+        if self.process is not None: return
+        ctx = mp.get_context('spawn')
+        self.shm = shared_memory.SharedMemory(create=True, size=SHM_BYTES)
+        self.frame = np.ndarray((FRAME_SLOT_BYTES,), dtype=np.uint8, buffer=self.shm.buf)
+        self.frame_time = np.ndarray((1,), dtype=np.float64, buffer=self.shm.buf, offset=FRAME_SLOT_BYTES)
+        self.frame_lock = ctx.Lock()
+        self.cmd_queue = ctx.Queue()
+        self.evt_conn, child_conn = ctx.Pipe(duplex=False)
+
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(self.cam, self.shm.name, self.frame_lock, self.cmd_queue, child_conn),
+            name=f"SkyWatchWorker-{self.cam['id']}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader.start()
+        print(f"Camera Worker [{self.cam['id']}] Started (pid {self.process.pid}).")
+
+    def stop(self):
+        if self.process is None: return
+        self._send('stop')
+        self.process.join(timeout=5.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.frame = self.frame_time = None
+        self.shm.close()
+        self.shm.unlink()
+        print(f"Camera Worker [{self.cam['id']}] Stopped.")
+
+    # --- Command Channel ---
+    def _send(self, method, *args, req_id=None):
+        self.cmd_queue.put((req_id, method, args))
+
+    def call(self, method, *args, timeout=2.0):
+        """Invokes a SkyWatchCore method in the worker and waits for its result."""
+        req_id = next(self._req_ids)
+        with self.cond:
+            self._pending.add(req_id)
+        self._send(method, *args, req_id=req_id)
+        deadline = time.time() + timeout
+        with self.cond:
+            try:
+                while req_id not in self._replies:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Camera {self.cam['id']}: no reply to {method}")
+                    self.cond.wait(remaining)
+                return self._replies.pop(req_id)
+            finally:
+                self._pending.discard(req_id)
+
+    def set_manual_command(self, pan, tilt, zoom):
+        self._send('set_manual_command', pan, tilt, zoom)
+
+    def toggle_tracking(self):
+        self._send('toggle_tracking')
+
+    def toggle_stabilization(self):
+        self._send('toggle_stabilization')
+
+    def set_pid(self, p, i, d):
+        self._send('set_pid', p, i, d)
+
+    def set_max_speed(self, speed):
+        self._send('set_max_speed', speed)
+
+    def cue_target(self, target):
+        self._send('cue_target', target)
+
+    def update_cue(self, target):
+        self._send('update_cue', target)
+
+    def start_recording(self):
+        self._send('start_recording')
+
+    def stop_recording(self):
+        self._send('stop_recording')
+
+    def toggle_recording(self):
+        self._send('toggle_recording')
+
+    def save_clip(self, post_seconds=None):
+        self._send('save_clip', post_seconds)
+
+    def cancel_cue(self):
+        self._send('cancel_cue')
+
+    def add_subscriber(self, name):
+        with self.lock:
+            self.subscribers += 1
+            if self.subscribers == 1:
+                self.frame_shape = None  # The slot holds a frame from before the worker stopped rendering
+        self._send('add_subscriber', name)
+
+    def remove_subscriber(self, name):
+        with self.lock:
+            self.subscribers -= 1
+        self._send('remove_subscriber', name)
+
+    def metrics_snapshot(self):
+        return self.call('metrics_snapshot', timeout=1.0)
+
+    def trace_events(self, seconds):
+        return self.call('trace_events', seconds, timeout=5.0)
+
+    # --- Published State ---
+    def get_frame(self):
+        return self.get_timed_frame()[0]
+
+    def get_timed_frame(self):
+        """(copy of the latest frame, its capture time as time.time()), or (None, None)."""
+        with self.lock:
+            shape = self.frame_shape
+        if shape is None or self.frame is None:
+            return None, None
+        nbytes = shape[0] * shape[1] * shape[2]
+        with self.frame_lock:
+            return self.frame[:nbytes].reshape(shape).copy(), float(self.frame_time[0])
+
+    def wait_for_frame(self, after_seq, timeout=None):
+        """Blocks until a frame newer than `after_seq` is published; returns the latest seq."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.frame_seq != after_seq, timeout)
+            return self.frame_seq
+
+    def get_telemetry_data(self):
+        with self.lock:
+            return self.telemetry.copy()
+
+    def wait_for_telemetry(self, after_version, timeout=None):
+        """Blocks until the telemetry differs from version `after_version`; returns (version, telemetry)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.telemetry_version != after_version, timeout)
+            return self.telemetry_version, self.telemetry.copy()
+
+    def _read_loop(self):
+        while True:
+            try:
+                msg = self.evt_conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.cond:
+                if msg[0] == 'update':
+                    _, seq, shape, telemetry = msg
+                    if shape is not None:
+                        self.frame_seq = seq
+                        self.frame_shape = shape
+                    if telemetry is not None:
+                        telemetry['camera'] = self.cam['id']
+                        self.telemetry = telemetry
+                        self.telemetry_version += 1
+                elif msg[0] == 'reply':
+                    if msg[1] in self._pending:  # Late replies to timed-out calls are dropped
+                        self._replies[msg[1]] = msg[2]
+                self.cond.notify_all()
+        with self.cond:
+            self.telemetry['status'] = "OFFLINE"
+            self.telemetry_version += 1
+            self.cond.notify_all()
@@ -99,12 +99,19 @@ RETICLE_SIZE = 50
 # --- Digital Stabilization Settings ---
 DIGITAL_STABILIZATION_ENABLED = False
 DIGITAL_CROP_FACTOR = 0.5
+DIGITAL_STAB_SMOOTHING = get_cfg('stabilization.smoothing_s', 0.1)  # Crop centre easing time constant (0 = none)
+DIGITAL_STAB_SUBPIXEL = get_cfg('stabilization.subpixel', False)     # warpAffine at sub-pixel offsets (slower)
 
 # --- VISCA Calibration / Mapping ---
 PAN_COUNTS_PER_DEGREE = get_cfg('camera.mechanics.pan_counts_per_degree', 24.0)
 TILT_COUNTS_PER_DEGREE = get_cfg('camera.mechanics.tilt_counts_per_degree', 24.0)
 ZOOM_MAX_HEX = get_cfg('camera.mechanics.zoom_max_hex', 0x4000)
 ZOOM_MAX_X = get_cfg('camera.mechanics.zoom_max_x', 20.0)
+HFOV_WIDE_DEG = get_cfg('camera.mechanics.hfov_wide_deg', 60.0) # Horizontal FOV at 1x zoom
+
+# Pan angle (deg) at which the camera points true north. Camera azimuth is
+# pan + offset, matching the RADAR OFFSET setting in the web UI.
+NORTH_OFFSET_DEG = get_cfg('camera.north_offset_deg', 0.0)
 
 # Camera Mechanical Limits
 PAN_MIN_DEG = -170
@@ -112,6 +119,55 @@ PAN_MAX_DEG = 170
 TILT_MIN_DEG = -30
 TILT_MAX_DEG = 90
 
+# --- Camera Registry ---
+# Each entry inherits anything it does not set from the top-level `camera`
+# section, so single-camera configs keep working unchanged.
+def _camera_entry(cam_id, section):
+    def cam_get(key, default):
+        if key in section:
+            return section[key]
+        return get_cfg(f'camera.{key}', default)
+
+    def mech_get(key, default):
+        mech = section.get('mechanics', {}) or {}
+        if key in mech:
+            return mech[key]
+        return get_cfg(f'camera.mechanics.{key}', default)
+
+    ip = cam_get('ip', CAMERA_IP)
+    if section.get('rtsp_url'):
+        rtsp_url = section['rtsp_url']
+    elif 'ip' in section or 'rtsp_port' in section:
+        rtsp_url = f"rtsp://{ip}:{cam_get('rtsp_port', RTSP_PORT)}/"
+    else:
+        rtsp_url = RTSP_URL
+    return {
+        'id': str(cam_id),
+        'name': section.get('name', str(cam_id)),
+        'ip': ip,
+        'visca_port': cam_get('visca_port', VISCA_PORT),
+        'rtsp_url': rtsp_url,
+        'invert_pan': mech_get('invert_pan', PAN_INVERT),
+        'invert_tilt': mech_get('invert_tilt', TILT_INVERT),
+        'max_pan_speed': mech_get('max_pan_speed', MAX_PAN_SPEED),
+        'min_pan_speed': mech_get('min_pan_speed', MIN_PAN_SPEED),
+        'min_tilt_speed': mech_get('min_tilt_speed', MIN_TILT_SPEED),
+        'pan_counts_per_degree': mech_get('pan_counts_per_degree', PAN_COUNTS_PER_DEGREE),
+        'tilt_counts_per_degree': mech_get('tilt_counts_per_degree', TILT_COUNTS_PER_DEGREE),
+        'zoom_max_hex': mech_get('zoom_max_hex', ZOOM_MAX_HEX),
+        'zoom_max_x': mech_get('zoom_max_x', ZOOM_MAX_X),
+        'hfov_wide_deg': mech_get('hfov_wide_deg', HFOV_WIDE_DEG),
+        'north_offset_deg': cam_get('north_offset_deg', NORTH_OFFSET_DEG),
+    }
+
+def load_cameras():
+    cams = get_cfg('cameras', None)
+    if not cams:
+        return [_camera_entry('cam0', {})]
+    return [_camera_entry(c.get('id', f'cam{i}'), c) for i, c in enumerate(cams)]
+
+CAMERAS = load_cameras()
+
 # --- Location & Radar Settings ---
 CAMERA_LAT = get_cfg('location.lat', 37.818728)
 CAMERA_LNG = get_cfg('location.lng', -122.268427)
@@ -122,3 +178,86 @@ MAX_RANGE_NM = get_cfg('adsb.max_range_nm', 10)
 
 # --- ADS-B Feed ---
 ADSB_URL = get_cfg('adsb.url', "http://adsb-feeder.local:8080/data/aircraft.json")
+
+# Ingestion Mode: "json" polls ADSB_URL at 1Hz, "sbs" (BaseStation, port 30003)
+# and "beast" (binary, port 30005) stream every message as it is received
+ADSB_MODE = get_cfg('adsb.mode', "json")
+ADSB_STREAM_HOST = get_cfg('adsb.stream_host', "adsb-feeder.local")
+ADSB_STREAM_PORT = get_cfg('adsb.stream_port', 30005 if ADSB_MODE == "beast" else 30003)
+ADSB_STALE_SECONDS = get_cfg('adsb.stale_seconds', 60)
+
+# Aircraft State Store: position fixes kept per aircraft, and how far past the
+# last fix positions are dead-reckoned from track / ground speed
+ADSB_HISTORY_LENGTH = get_cfg('adsb.history_length', 32)
+ADSB_MAX_EXTRAPOLATION = get_cfg('adsb.max_extrapolation_s', 15.0)
+
+# Offline aircraft metadata (built with `python aircraft_db.py build <csv>`)
+AIRCRAFT_DB_PATH = get_cfg('adsb.aircraft_db', None)
+AIRCRAFT_DB_CACHE_SIZE = get_cfg('adsb.aircraft_db_cache_size', 4096)
+
+# Minimum spacing of pushed aircraft deltas on /api/aircraft/stream
+ADSB_PUSH_INTERVAL = get_cfg('adsb.push_interval_s', 0.25)
+
+# --- Video Streaming (MJPEG) ---
+JPEG_BACKEND = get_cfg('stream.jpeg_backend', "auto")       # auto | turbojpeg | opencv
+JPEG_QUALITY = get_cfg('stream.jpeg_quality', 85)
+JPEG_SUBSAMPLING = str(get_cfg('stream.jpeg_subsampling', "420"))  # 444 | 422 | 420
+JPEG_FAST_DCT = get_cfg('stream.jpeg_fast_dct', True)        # turbojpeg only
+JPEG_ENCODE_THREADS = get_cfg('stream.encode_threads', 4)    # Shared encode pool size
+JPEG_MAX_INFLIGHT = get_cfg('stream.max_inflight', 2)        # Frames encoding at once per stream
+
+# --- Video Streaming (H.264 / fMP4, requires PyAV) ---
+STREAM_VIDEO_MODE = get_cfg('stream.video', "mjpeg")         # mjpeg | h264 (page default, ?video= overrides)
+H264_WIDTH = get_cfg('stream.h264_width', 1280)
+H264_FPS = get_cfg('stream.h264_fps', 30)
+H264_BITRATE_KBPS = get_cfg('stream.h264_bitrate_kbps', 2500)
+H264_GOP_SECONDS = get_cfg('stream.h264_gop_s', 2.0)         # Keyframe interval (joins also force one)
+
+# --- OSD ---
+# server: box, Kalman dot, reticle and overlay are burned into the frames
+# client: frames stay clean and the browser draws them from telemetry (`osd`)
+OSD_MODE = get_cfg('stream.osd', "server")
+
+# --- Telemetry Stream ---
+TELEMETRY_MAX_HZ = get_cfg('stream.telemetry_max_hz', 20)    # Default per-client cap (?max_hz= overrides)
+
+# --- Session Logging (columnar ADS-B + tracking telemetry, see session_log.py) ---
+LOG_ENABLED = get_cfg('logging.enabled', False)
+LOG_DIR = get_cfg('logging.directory', "logs")
+LOG_CHUNK_ROWS = get_cfg('logging.chunk_rows', 4096)
+LOG_FLUSH_INTERVAL = get_cfg('logging.flush_interval_s', 5.0)
+LOG_ROTATE_MB = get_cfg('logging.rotate_mb', 256)
+LOG_ROTATE_HOURS = get_cfg('logging.rotate_hours', 1.0)
+
+# --- ADS-B Cue (Slew-to-Target) ---
+CUE_SLEW_RATE_DPS = get_cfg('cue.slew_rate_dps', 60.0)    # Effective pan/tilt rate for lead estimation
+CUE_LATENCY = get_cfg('cue.latency_s', 0.4)                # Command + feed latency added to the lead
+CUE_REAIM_INTERVAL = get_cfg('cue.reaim_interval_s', 0.3)  # Re-send the absolute position this often
+CUE_HANDOFF_DEG = get_cfg('cue.handoff_deg', 2.0)          # Pointing error at which we look for the target
+CUE_SEARCH_RADIUS = get_cfg('cue.search_radius_px', 160)   # Half-size of the centre search window
+CUE_DETECT_THRESHOLD = get_cfg('cue.detect_threshold', 25) # Min contrast against the sky background
+CUE_TIMEOUT = get_cfg('cue.timeout_s', 10.0)
+CUE_PAN_SPEED = 0x18
+CUE_TILT_SPEED = 0x14
+
+# --- Server-Side Recording (clean frames + telemetry sidecar, see recorder.py) ---
+RECORD_DIR = get_cfg('recording.directory', "recordings")
+RECORD_FPS = get_cfg('recording.fps', 30)
+RECORD_SEGMENT_SECONDS = get_cfg('recording.segment_s', 300)
+RECORD_FOURCC = get_cfg('recording.fourcc', "mp4v")        # mp4v | avc1 | MJPG | XVID
+RECORD_QUEUE_FRAMES = get_cfg('recording.queue_frames', 16) # Raw frames buffered for the writer (~6 MB each at 1080p)
+
+# --- Pre-Event Clip Buffer (see recorder.ClipBuffer) ---
+CLIP_ENABLED = get_cfg('clip.enabled', False)
+CLIP_DIR = get_cfg('clip.directory', "clips")
+CLIP_PRE_SECONDS = get_cfg('clip.pre_s', 20)        # Seconds kept before a save is triggered
+CLIP_POST_SECONDS = get_cfg('clip.post_s', 10)      # Seconds added after the trigger
+CLIP_POOL_MB = get_cfg('clip.pool_mb', 64)          # Hard memory limit of the buffer
+CLIP_FPS = get_cfg('clip.fps', 15)
+CLIP_WIDTH = get_cfg('clip.width', 1280)
+CLIP_QUALITY = get_cfg('clip.jpeg_quality', 70)
+CLIP_ON_TRACK_START = get_cfg('clip.on_track_start', False)
+
+# --- Pipeline Tracing (Chrome Trace Events at /api/trace, see tracing.py) ---
+TRACE_ENABLED = get_cfg('trace.enabled', False)
+TRACE_BUFFER_EVENTS = get_cfg('trace.buffer_events', 20000)  # Spans kept per thread
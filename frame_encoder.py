@@ -0,0 +1,353 @@
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import config
+from metrics import LatencyHistogram
+import tracing
+
+# Optional libjpeg-turbo backend (pip install PyTurboJPEG)
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420, TJSAMP_422, TJSAMP_444, TJFLAG_FASTDCT
+    _turbo = TurboJPEG()
+except Exception:
+    TurboJPEG = None
+    _turbo = None
+
+SUBSAMPLING = ('444', '422', '420')
+
+# Variant ladders: requested sizes / qualities snap to these so clients share encodes
+WIDTH_LADDER = (1920, 1280, 960, 640, 480, 320)
+QUALITY_LADDER = (85, 75, 60, 45)
+
+
+class OpenCVJPEGEncoder:
+    name = 'opencv'
+
+    def __init__(self, quality=85, subsampling='420'):
+        self.quality = quality
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+        if hasattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR'):
+            factor = {
+                '444': cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+                '422': cv2.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+                '420': cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420,
+            }[subsampling]
+            self.params += [int(cv2.IMWRITE_JPEG_SAMPLING_FACTOR), int(factor)]
+
+    def encode(self, frame):
+        flag, jpeg = cv2.imencode(".jpg", frame, self.params)
+        return jpeg.tobytes() if flag else None
+
+
+class TurboJPEGEncoder:
+    name = 'turbojpeg'
+
+    def __init__(self, quality=85, subsampling='420', fast_dct=True):
+        self.quality = quality
+        self.subsampling = {'444': TJSAMP_444, '422': TJSAMP_422, '420': TJSAMP_420}[subsampling]
+        self.flags = TJFLAG_FASTDCT if fast_dct else 0
+
+    def encode(self, frame):
+        # BGR input is the default pixel format, no conversion needed
+        return _turbo.encode(frame, quality=self.quality, jpeg_subsample=self.subsampling, flags=self.flags)
+
+
+def available_backends():
+    return ['turbojpeg', 'opencv'] if _turbo is not None else ['opencv']
+
+
+def make_jpeg_encoder(backend=None, quality=None, subsampling=None, fast_dct=None):
+    """
+    JPEG encoder for the configured backend ('auto' picks libjpeg-turbo when
+    PyTurboJPEG is installed, else OpenCV). Both release the GIL while encoding.
+    """
+    backend = config.JPEG_BACKEND if backend is None else backend
+    quality = config.JPEG_QUALITY if quality is None else quality
+    subsampling = str(config.JPEG_SUBSAMPLING if subsampling is None else subsampling)
+    fast_dct = config.JPEG_FAST_DCT if fast_dct is None else fast_dct
+    if subsampling not in SUBSAMPLING:
+        raise ValueError(f"Unknown JPEG subsampling '{subsampling}' (expected one of {SUBSAMPLING})")
+
+    if backend in ('auto', 'turbojpeg') and _turbo is not None:
+        return TurboJPEGEncoder(quality, subsampling, fast_dct)
+    if backend == 'turbojpeg':
+        print("Warning: PyTurboJPEG not available, falling back to OpenCV JPEG encoder")
+    return OpenCVJPEGEncoder(quality, subsampling)
+
+
+# Shared by every camera / output variant, so independent frames encode in parallel
+ENCODE_POOL = ThreadPoolExecutor(max_workers=config.JPEG_ENCODE_THREADS, thread_name_prefix="JPEG")
+
+
+class SharedMJPEGEncoder:
+    """
+    JPEG-encodes each new frame of one camera exactly once and publishes the
+    finished multipart part with a sequence number. Every /video_feed client
+    streams the same bytes, waiting for a newer sequence instead of polling,
+    so N viewers cost one encode per frame and never get duplicates.
+
+    Encodes run on ENCODE_POOL with up to `max_inflight` frames in flight, so
+    a slow encode of one frame does not hold up capture of the next; a frame
+    that finishes after a newer one has been published is dropped. `width`
+    downscales before encoding. Nothing is encoded while no client is attached.
+    `listeners` are called with (seq, part) for every published frame.
+    `encode_time` is the latency histogram of the resize + encode.
+    """
+    def __init__(self, core, encoder=None, max_inflight=None, width=None):
+        self.core = core
+        self.encoder = encoder or make_jpeg_encoder()
+        self.width = width
+        self.clients = 0
+        self.slots = threading.Semaphore(config.JPEG_MAX_INFLIGHT if max_inflight is None else max_inflight)
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.part = None
+        self.published_ticket = 0
+        self.running = False
+        self.thread = None
+        self.listeners = []
+        self.encode_time = LatencyHistogram()
+
+    def start(self):
+        with self.cond:
+            if self.running: return
+            self.running = True
+        name = f"MJPEG-{self.core.cam['id']}-{self.width or 'full'}q{self.encoder.quality}"
+        self.thread = threading.Thread(target=self._encode_loop, name=name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def subscribe(self):
+        self.core.add_subscriber('mjpeg')
+        with self.cond:
+            self.clients += 1
+            self.cond.notify_all()
+        self.start()
+
+    def unsubscribe(self):
+        with self.cond:
+            self.clients -= 1
+        self.core.remove_subscriber('mjpeg')
+
+    def _encode(self, frame):
+        t = time.perf_counter()
+        if self.width and frame.shape[1] > self.width:
+            height = int(round(frame.shape[0] * self.width / frame.shape[1]))
+            frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        jpeg = self.encoder.encode(frame)
+        end = time.perf_counter()
+        self.encode_time.observe(end - t)
+        tracing.complete('mjpeg.encode', t, end, 'web')
+        return jpeg
+
+    def _encode_loop(self):
+        frame_seq = 0
+        ticket = 0
+        while self.running:
+            with self.cond:
+                if not self.cond.wait_for(lambda: self.clients > 0 or not self.running, timeout=1.0):
+                    continue
+            latest = self.core.wait_for_frame(frame_seq, timeout=1.0)
+            if latest == frame_seq:
+                continue
+            if not self.slots.acquire(timeout=1.0):
+                continue
+            frame_seq = latest
+            frame = self.core.get_frame()
+            if frame is None:
+                self.slots.release()
+                continue
+
+            ticket += 1
+            future = ENCODE_POOL.submit(self._encode, frame)
+            future.add_done_callback(functools.partial(self._publish, ticket))
+
+    def _publish(self, ticket, future):
+        self.slots.release()
+        try:
+            jpeg = future.result()
+        except Exception as e:
+            print(f"JPEG encode error: {e}")
+            return
+        if jpeg is None:
+            return
+        part = (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+        with self.cond:
+            if ticket < self.published_ticket:
+                return  # A newer frame is already out
+            self.published_ticket = ticket
+            self.seq += 1
+            self.part = part
+            seq = self.seq
+            self.cond.notify_all()
+        for listener in self.listeners:
+            listener(seq, part)
+
+    def wait_next(self, after_seq, timeout=1.0):
+        """(seq, part) of the first frame newer than `after_seq`, or (after_seq, None) on timeout."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq != after_seq, timeout):
+                return after_seq, None
+            return self.seq, self.part
+
+
+def _ladder_index(ladder, value):
+    """Index of the largest ladder step not above `value` (the smallest step if all are)."""
+    for i, step in enumerate(ladder):
+        if step <= value:
+            return i
+    return len(ladder) - 1
+
+
+class AdaptiveVariant:
+    """
+    One client's position on a CameraStreams variant ladder: paces sends to
+    the requested fps and moves between variants as its sends block or
+    clear. Holds a subscription on the current variant's encoder until
+    close(). Drives both the threaded and the async MJPEG streams.
+    """
+    SLOW_SENDS = 3      # Consecutive slow sends before stepping down
+    FAST_SENDS = 60     # Consecutive quick sends before stepping up
+
+    def __init__(self, streams, width=None, quality=None, fps=None, adapt=True):
+        self.streams = streams
+        self.steps = streams._steps(width or WIDTH_LADDER[0], quality or config.JPEG_QUALITY)
+        self.min_interval = 1.0 / fps if fps else 0.0
+        self.adapt = adapt
+        self.level = 0
+        self.slow = self.fast = 0
+        self.frame_interval = 1.0 / 30  # Smoothed source frame interval
+        self.last_frame = self.last_send = time.perf_counter()
+        self.encoder = streams.variant(*self.steps[0])
+        self.encoder.subscribe()
+
+    def close(self):
+        self.encoder.unsubscribe()
+
+    def frame_arrived(self):
+        """Call on each new frame; returns how long to hold it back to keep to the fps cap."""
+        now = time.perf_counter()
+        self.frame_interval += 0.1 * (min(now - self.last_frame, 1.0) - self.frame_interval)
+        self.last_frame = now
+        return self.min_interval - (now - self.last_send)
+
+    def sending(self):
+        self.last_send = time.perf_counter()
+
+    def sent(self):
+        """Call once the part is written; True if the client switched to another variant."""
+        send_time = time.perf_counter() - self.last_send
+        if not self.adapt:
+            return False
+
+        # Writes only block once the socket buffer is full: the client is falling behind
+        if send_time > 0.5 * max(self.min_interval, self.frame_interval):
+            self.slow += 1
+            self.fast = 0
+        else:
+            self.fast += 1
+            self.slow = 0
+
+        level = self.level
+        if self.slow >= self.SLOW_SENDS and level < len(self.steps) - 1:
+            level += 1
+        elif self.fast >= self.FAST_SENDS and level > 0:
+            level -= 1
+        if level == self.level:
+            return False
+        self.level = level
+        self.slow = self.fast = 0
+        previous = self.encoder
+        self.encoder = self.streams.variant(*self.steps[level])
+        self.encoder.subscribe()
+        previous.unsubscribe()  # After subscribing, so the camera never sees zero viewers in between
+        return True
+
+
+class CameraStreams:
+    """
+    Per-camera cache of MJPEG variants keyed by (width, quality). Clients
+    asking for the same variant share one SharedMJPEGEncoder. Each client
+    stream is paced to its requested fps and adapts on its own: when writes
+    to its socket start blocking it steps down (quality first, then size),
+    and it steps back up towards what was requested once sends are quick
+    again. Slow clients only ever skip frames, they never queue them.
+    """
+
+    def __init__(self, core):
+        self.core = core
+        self.lock = threading.Lock()
+        self.variants = {}
+
+    def variant(self, width, quality):
+        key = (width, quality)
+        with self.lock:
+            encoder = self.variants.get(key)
+            if encoder is None:
+                encoder = SharedMJPEGEncoder(self.core, make_jpeg_encoder(quality=quality),
+                                             width=None if width >= WIDTH_LADDER[0] else width)
+                self.variants[key] = encoder
+            return encoder
+
+    def stop(self):
+        with self.lock:
+            variants = list(self.variants.values())
+        for encoder in variants:
+            encoder.stop()
+
+    def stats(self):
+        with self.lock:
+            return [{'width': w, 'quality': q, 'clients': e.clients, 'frames': e.seq}
+                    for (w, q), e in self.variants.items()]
+
+    def encode_times(self):
+        """[((width, quality), (counts, sum))] of every variant's encode histogram."""
+        with self.lock:
+            return [(key, e.encode_time.snapshot()) for key, e in self.variants.items()]
+
+    @staticmethod
+    def _steps(width, quality):
+        """Degradation ladder from the requested variant down to the smallest one."""
+        wi = _ladder_index(WIDTH_LADDER, width)
+        qi = _ladder_index(QUALITY_LADDER, quality)
+        steps = [(wi, qi)]
+        while wi < len(WIDTH_LADDER) - 1 or qi < len(QUALITY_LADDER) - 1:
+            if qi < len(QUALITY_LADDER) - 1 and (len(steps) % 2 == 1 or wi == len(WIDTH_LADDER) - 1):
+                qi += 1
+            else:
+                wi += 1
+            steps.append((wi, qi))
+        return [(WIDTH_LADDER[w], QUALITY_LADDER[q]) for w, q in steps]
+
+    def stream(self, width=None, quality=None, fps=None, adapt=True):
+        """Multipart generator for one client."""
+        client = AdaptiveVariant(self, width, quality, fps, adapt)
+        seq = 0
+        try:
+            while True:
+                seq, part = client.encoder.wait_next(seq)
+                if part is None:
+                    continue
+                wait = client.frame_arrived()
+                if wait > 0:
+                    time.sleep(wait)
+                    with client.encoder.cond:
+                        seq, part = client.encoder.seq, client.encoder.part  # Send the newest frame after pacing
+
+                client.sending()
+                with tracing.span('mjpeg.send', 'web'):
+                    yield part
+                if client.sent():
+                    seq = client.encoder.seq
+        finally:
+            client.close()
@@ -0,0 +1,172 @@
+import numpy as np
+
+EARTH_RADIUS_NM = 3440.065
+FT_PER_NM = 6076.12
+
+
+class GeoOrigin:
+    """
+    Fixed observer position (the camera) with its trig terms precomputed, so
+    look angles for a whole aircraft list are computed in one vectorized pass.
+    """
+    def __init__(self, lat, lon, alt_ft=0.0):
+        self.lat = lat
+        self.lon = lon
+        self.alt_ft = alt_ft
+        self.lat_rad = np.radians(lat)
+        self.lon_rad = np.radians(lon)
+        self.sin_lat = np.sin(self.lat_rad)
+        self.cos_lat = np.cos(self.lat_rad)
+
+    def distance_bearing(self, lat, lon):
+        """
+        Haversine distance (NM) and true bearing (deg, 0-360) from the origin.
+        Accepts scalars or arrays of target lat/lon in degrees.
+        """
+        lat2 = np.radians(lat)
+        dlon = np.radians(lon) - self.lon_rad
+        dlat = lat2 - self.lat_rad
+        cos_lat2 = np.cos(lat2)
+
+        a = np.sin(dlat / 2)**2 + self.cos_lat * cos_lat2 * np.sin(dlon / 2)**2
+        dist_nm = 2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+        # θ = atan2(sin(Δλ) * cos(φ2), cos(φ1) * sin(φ2) - sin(φ1) * cos(φ2) * cos(Δλ))
+        y = np.sin(dlon) * cos_lat2
+        x = self.cos_lat * np.sin(lat2) - self.sin_lat * cos_lat2 * np.cos(dlon)
+        bearing_deg = np.degrees(np.arctan2(y, x)) % 360.0
+
+        return dist_nm, bearing_deg
+
+    def elevation(self, dist_nm, alt_ft):
+        """
+        Elevation angle (deg) above the local horizon to a target at the given
+        ground range and altitude, including the Earth curvature drop.
+        """
+        dist_ft = np.asarray(dist_nm) * FT_PER_NM
+        drop_ft = dist_ft**2 / (2 * EARTH_RADIUS_NM * FT_PER_NM)
+        return np.degrees(np.arctan2(np.asarray(alt_ft) - self.alt_ft - drop_ft, dist_ft))
+
+    def look_angles(self, lat, lon, alt_ft):
+        """Returns (dist_nm, bearing_deg, elevation_deg) for scalars or arrays."""
+        dist_nm, bearing_deg = self.distance_bearing(lat, lon)
+        return dist_nm, bearing_deg, self.elevation(dist_nm, alt_ft)
+
+
+def dead_reckon(lat, lon, alt_ft, track_deg, gs_kt, vrate_fpm, dt):
+    """
+    Extrapolates position `dt` seconds along the current track, ground speed
+    and vertical rate (flat-Earth step, fine over the few seconds we need).
+    Works on scalars or arrays.
+    """
+    dist_nm = gs_kt * dt / 3600.0
+    track_rad = np.radians(track_deg)
+    new_lat = lat + dist_nm * np.cos(track_rad) / 60.0
+    cos_lat = np.maximum(np.cos(np.radians(new_lat)), 1e-6)
+    new_lon = lon + dist_nm * np.sin(track_rad) / (60.0 * cos_lat)
+    new_alt = np.maximum(alt_ft + vrate_fpm * dt / 60.0, 0.0)
+    return new_lat, new_lon, new_alt
+
+
+def field_of_view(zoom, hfov_wide_deg, aspect, crop=1.0):
+    """
+    Horizontal and vertical FOV (deg) at a zoom factor. Focal length scales
+    with zoom, so the half-angle tangent shrinks as 1/zoom; `crop` is the
+    fraction of the sensor actually shown (e.g. the digital stabilization crop).
+    """
+    tan_h = np.tan(np.radians(hfov_wide_deg) / 2) * crop / max(zoom, 1.0)
+    tan_v = tan_h / aspect
+    return 2 * np.degrees(np.arctan(tan_h)), 2 * np.degrees(np.arctan(tan_v))
+
+
+def camera_frame_offsets(bearing_deg, elevation_deg, cam_az_deg, cam_el_deg):
+    """
+    Projects look angles into the frame of a camera pointing at
+    (cam_az, cam_el). Returns (x, y, forward): x / y are the image-plane
+    tangents right and up of the boresight, `forward` the cosine of the
+    off-axis angle (<= 0 means behind the camera).
+    """
+    az = np.radians(bearing_deg)
+    el = np.radians(elevation_deg)
+    caz = np.radians(cam_az_deg)
+    cel = np.radians(cam_el_deg)
+
+    # Target direction in local East / North / Up
+    cos_el = np.cos(el)
+    e = cos_el * np.sin(az)
+    n = cos_el * np.cos(az)
+    u = np.sin(el)
+
+    sin_caz, cos_caz = np.sin(caz), np.cos(caz)
+    sin_cel, cos_cel = np.sin(cel), np.cos(cel)
+    forward = cos_cel * (e * sin_caz + n * cos_caz) + sin_cel * u
+    right = e * cos_caz - n * sin_caz
+    up = -sin_cel * (e * sin_caz + n * cos_caz) + cos_cel * u
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return right / forward, up / forward, forward
+
+
+class AngularIndex:
+    """
+    Aircraft look angles sorted by bearing, with a per-degree bin table of
+    start offsets, so a field-of-view query only touches the bearing slice
+    the view can reach instead of scanning every aircraft.
+    """
+    BINS = 360
+
+    def __init__(self, bearing_deg, elevation_deg):
+        bearing = np.asarray(bearing_deg, dtype=np.float64) % 360.0
+        self.order = np.argsort(bearing, kind='stable')
+        self.bearing = bearing[self.order]
+        self.elevation = np.asarray(elevation_deg, dtype=np.float64)[self.order]
+        # bin_start[b] = first sorted entry with bearing >= b degrees
+        self.bin_start = np.searchsorted(self.bearing, np.arange(self.BINS + 1, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.order)
+
+    def _slice(self, lo, hi):
+        """Sorted positions with lo <= bearing < hi, for 0 <= lo <= hi <= 360."""
+        b_lo = int(lo)
+        b_hi = min(int(np.ceil(hi)), self.BINS)
+        start, stop = self.bin_start[b_lo], self.bin_start[b_hi]
+        pos = np.arange(start, stop)
+        sel = self.bearing[start:stop]
+        return pos[(sel >= lo) & (sel < hi)]
+
+    def query(self, cam_az_deg, cam_el_deg, hfov_deg, vfov_deg):
+        """
+        Aircraft inside the camera's field of view. Returns (indices, x, y)
+        where indices refer to the arrays the index was built from and x / y
+        are the angular offsets (deg) right and up of the boresight.
+        """
+        empty = np.zeros(0)
+        if len(self.order) == 0:
+            return empty.astype(np.int64), empty, empty
+
+        tan_h = np.tan(np.radians(hfov_deg) / 2)
+        tan_v = np.tan(np.radians(vfov_deg) / 2)
+        # Cone around the boresight that contains the whole image rectangle
+        radius = np.degrees(np.arctan(np.hypot(tan_h, tan_v)))
+
+        el_lo = cam_el_deg - radius
+        el_hi = cam_el_deg + radius
+        if abs(cam_el_deg) + radius >= 90.0:
+            pos = np.arange(len(self.order))  # View reaches the zenith: all bearings
+        else:
+            half = np.degrees(np.arcsin(min(1.0, np.sin(np.radians(radius)) / np.cos(np.radians(cam_el_deg)))))
+            lo = (cam_az_deg - half) % 360.0
+            hi = lo + 2 * half
+            if hi <= 360.0:
+                pos = self._slice(lo, hi)
+            else:
+                pos = np.concatenate((self._slice(lo, 360.0), self._slice(0.0, hi - 360.0)))
+
+        el = self.elevation[pos]
+        pos = pos[(el >= el_lo) & (el <= el_hi)]
+
+        x, y, forward = camera_frame_offsets(self.bearing[pos], self.elevation[pos], cam_az_deg, cam_el_deg)
+        inside = (forward > 0) & (np.abs(x) <= tan_h) & (np.abs(y) <= tan_v)
+        pos = pos[inside]
+        return self.order[pos], np.degrees(np.arctan(x[inside])), np.degrees(np.arctan(y[inside]))
@@ -0,0 +1,322 @@
+import fractions
+import io
+import threading
+import time
+from collections import deque
+import config
+from metrics import LatencyHistogram
+import tracing
+
+# Optional H.264 encoder (pip install av)
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def h264_available():
+    return av is not None
+
+
+def split_mp4_boxes(data):
+    """Splits a byte stream into complete top-level MP4 boxes: ([(type, bytes)], remainder)."""
+    boxes = []
+    pos = 0
+    while len(data) - pos >= 8:
+        size = int.from_bytes(data[pos:pos + 4], 'big')
+        if size < 8:
+            break  # 64-bit / to-end-of-file sizes never appear in a fragmented stream
+        if len(data) - pos < size:
+            break
+        boxes.append((data[pos + 4:pos + 8].decode('ascii', 'replace'), data[pos:pos + size]))
+        pos += size
+    return boxes, data[pos:]
+
+
+def avc_codec_string(init_segment):
+    """RFC 6381 codec string (e.g. avc1.42C01F) from the avcC box of an init segment."""
+    i = init_segment.find(b'avcC')
+    if i < 0 or len(init_segment) < i + 8:
+        return 'avc1.42E01F'
+    profile, compat, level = init_segment[i + 5], init_segment[i + 6], init_segment[i + 7]
+    return f"avc1.{profile:02X}{compat:02X}{level:02X}"
+
+
+def mdat_has_idr(mdat):
+    """True if the (length-prefixed AVC) mdat payload contains an IDR slice."""
+    pos = 8
+    while pos + 5 <= len(mdat):
+        length = int.from_bytes(mdat[pos:pos + 4], 'big')
+        if mdat[pos + 4] & 0x1F == 5:
+            return True
+        pos += 4 + length
+    return False
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file object the MP4 muxer writes fragments into."""
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+class H264Stream:
+    """
+    Low-latency H.264 of one camera as fragmented MP4 (one fragment per
+    frame), for Media Source Extensions playback. libx264 runs with the
+    `ultrafast` preset and `zerolatency` tune, so frames leave the encoder
+    immediately without B-frames or lookahead. Like SharedMJPEGEncoder, the
+    encode is shared by every viewer and only runs while someone watches; a
+    joining viewer gets the init segment and a forced keyframe. `listeners`
+    are called with (seq, is_keyframe, fragment) for every fragment.
+    """
+    BACKLOG = 60  # Fragments a client may lag before it is resynced at a keyframe
+
+    def __init__(self, core, width=None, fps=None, bitrate_kbps=None, gop_seconds=None):
+        self.core = core
+        self.width = config.H264_WIDTH if width is None else width
+        self.fps = config.H264_FPS if fps is None else fps
+        self.bitrate_kbps = config.H264_BITRATE_KBPS if bitrate_kbps is None else bitrate_kbps
+        self.gop_seconds = config.H264_GOP_SECONDS if gop_seconds is None else gop_seconds
+
+        self.cond = threading.Condition()
+        self.clients = 0
+        self.thread = None
+        self.init_segment = None
+        self.codec = None
+        self.seq = 0
+        self.fragments = deque(maxlen=self.BACKLOG)  # (seq, is_keyframe, bytes)
+        self.keyframe_requested = False
+        self.stopped = False
+        self.listeners = []
+
+        self.stats_data = {'frames': 0, 'bitrate_kbps': 0.0, 'encode_ms': 0.0, 'latency_ms': 0.0}
+        self.encode_time = LatencyHistogram()
+
+    # --- Clients ---
+    def subscribe(self, timeout=5.0):
+        """
+        Adds a viewer (starting the encoder if needed) and waits for the init
+        segment. Returns (codec, init_segment, seq) or None if the encoder
+        produced nothing; pair every successful call with unsubscribe().
+        """
+        self.core.add_subscriber('h264')
+        with self.cond:
+            if self.stopped:
+                self.core.remove_subscriber('h264')
+                return None
+            self.clients += 1
+            self.keyframe_requested = True
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._safe_encode_loop,
+                                               name=f"H264-{self.core.cam['id']}", daemon=True)
+                self.thread.start()
+            if not self.cond.wait_for(lambda: self.init_segment is not None, timeout):
+                self.clients -= 1
+                self.core.remove_subscriber('h264')
+                return None
+            return self.codec, self.init_segment, self.seq
+
+    def unsubscribe(self):
+        with self.cond:
+            self.clients -= 1
+        self.core.remove_subscriber('h264')
+
+    def stop(self):
+        """Ends the encoder and every client stream (server shutdown)."""
+        with self.cond:
+            self.stopped = True
+            thread = self.thread
+            self.cond.notify_all()
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    def request_keyframe(self):
+        with self.cond:
+            self.keyframe_requested = True
+
+    def open_client(self, timeout=5.0):
+        """(codec, generator) for one viewer, or (None, None) if the encoder produced nothing."""
+        subscription = self.subscribe(timeout)
+        if subscription is None:
+            return None, None
+        codec, init_segment, seq = subscription
+        return codec, self._client_stream(init_segment, seq)
+
+    def _client_stream(self, init_segment, seq):
+        try:
+            yield init_segment
+            need_keyframe = True
+            while True:
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.seq != seq or self.stopped, 2.0):
+                        continue
+                    if self.stopped:
+                        return
+                    if self.fragments and self.fragments[0][0] > seq + 1:
+                        need_keyframe = True  # Fell out of the backlog
+                        self.keyframe_requested = True
+                    pending = [(s, key, frag) for s, key, frag in self.fragments if s > seq]
+                    seq = self.seq
+                out = []
+                for _, key, frag in pending:
+                    if need_keyframe and not key:
+                        continue
+                    need_keyframe = False
+                    out.append(frag)
+                if out:
+                    yield b''.join(out)
+        finally:
+            self.unsubscribe()
+
+    def stats(self):
+        with self.cond:
+            return dict(self.stats_data, clients=self.clients)
+
+    # --- Encoder ---
+    def _safe_encode_loop(self):
+        try:
+            self._encode_loop()
+        except Exception as e:
+            print(f"H.264 encoder error [{self.core.cam['id']}]: {e}")
+
+    def _open_encoder(self, frame_shape):
+        h, w = frame_shape[:2]
+        if self.width and w > self.width:
+            h = int(round(h * self.width / w))
+            w = self.width
+        w -= w % 2
+        h -= h % 2
+
+        sink = _Sink()
+        container = av.open(sink, mode='w', format='mp4', options={
+            # Empty moov up front, then a moof/mdat fragment for every frame
+            'movflags': 'empty_moov+default_base_moof+frag_keyframe',
+            'frag_duration': '1',
+        })
+        stream = container.add_stream('libx264', rate=self.fps)
+        stream.width = w
+        stream.height = h
+        stream.pix_fmt = 'yuv420p'
+        stream.bit_rate = int(self.bitrate_kbps * 1000)
+        stream.codec_context.time_base = fractions.Fraction(1, 1000)
+        stream.options = {
+            'preset': 'ultrafast',
+            'tune': 'zerolatency',
+            'profile': 'baseline',
+            'g': str(max(1, int(self.fps * self.gop_seconds))),
+            'x264-params': f"vbv-maxrate={int(self.bitrate_kbps)}:vbv-bufsize={int(self.bitrate_kbps / 2)}",
+        }
+        return sink, container, stream
+
+    def _encode_loop(self):
+        sink = container = stream = None
+        frame_seq = 0
+        t0 = None
+        window_start = time.time()
+        window_bytes = 0
+        try:
+            while True:
+                with self.cond:
+                    if self.clients <= 0 or self.stopped:
+                        self._reset()
+                        break
+                latest = self.core.wait_for_frame(frame_seq, timeout=1.0)
+                if latest == frame_seq:
+                    continue
+                frame_seq = latest
+                img, t_captured = self.core.get_timed_frame()
+                if img is None:
+                    continue
+                t_grab = time.time()
+                t_start = time.perf_counter()
+                if container is None:
+                    sink, container, stream = self._open_encoder(img.shape)
+                    t0 = t_grab
+
+                frame = av.VideoFrame.from_ndarray(img, format='bgr24')
+                if (img.shape[1], img.shape[0]) != (stream.width, stream.height):
+                    frame = frame.reformat(width=stream.width, height=stream.height)
+                frame.pts = int((t_grab - t0) * 1000)
+                frame.time_base = fractions.Fraction(1, 1000)
+                with self.cond:
+                    if self.keyframe_requested:
+                        self.keyframe_requested = False
+                        frame.pict_type = av.video.frame.PictureType.I if hasattr(av.video.frame, 'PictureType') else 'I'
+
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+                t_encoded = time.time()
+                self.encode_time.observe(t_encoded - t_grab)
+                tracing.complete('h264.encode', t_start, time.perf_counter(), 'web')
+
+                nbytes = self._drain(sink)
+                window_bytes += nbytes
+                with self.cond:
+                    s = self.stats_data
+                    s['frames'] += 1
+                    s['encode_ms'] += 0.1 * ((t_encoded - t_grab) * 1000 - s['encode_ms'])
+                    # Capture in the worker to fragments published to viewers
+                    s['latency_ms'] += 0.1 * ((time.time() - t_captured) * 1000 - s['latency_ms'])
+                    if t_encoded - window_start >= 1.0:
+                        s['bitrate_kbps'] = window_bytes * 8 / 1000 / (t_encoded - window_start)
+                        window_start = t_encoded
+                        window_bytes = 0
+        finally:
+            if container is not None:
+                try:
+                    container.close()
+                except Exception:
+                    pass
+            with self.cond:
+                if self.thread is threading.current_thread():
+                    self._reset()
+
+    def _reset(self):
+        # Encoder is gone: the next viewer starts a fresh one (lock held)
+        self.thread = None
+        self.init_segment = None
+        self.fragments.clear()
+        self.cond.notify_all()
+
+    def _drain(self, sink):
+        """Publishes the init segment and every complete moof+mdat written so far."""
+        boxes, rest = split_mp4_boxes(bytes(sink.data))
+        consumed = len(sink.data) - len(rest)
+        published = 0
+        init = bytearray()
+        moof = None
+        for box_type, box in boxes:
+            if box_type in ('ftyp', 'moov'):
+                init += box
+            elif box_type == 'moof':
+                moof = box
+            elif box_type == 'mdat' and moof is not None:
+                fragment = moof + box
+                moof = None
+                published += len(fragment)
+                is_keyframe = mdat_has_idr(box)
+                with self.cond:
+                    self.seq += 1
+                    seq = self.seq
+                    self.fragments.append((seq, is_keyframe, fragment))
+                    self.cond.notify_all()
+                for listener in self.listeners:
+                    listener(seq, is_keyframe, fragment)
+            # styp / sidx / mfra carry nothing MSE needs here
+        if moof is not None:
+            consumed -= len(moof)  # Its mdat hasn't been written yet, keep it for next time
+        del sink.data[:consumed]
+
+        if init:
+            with self.cond:
+                self.init_segment = bytes(init)
+                self.codec = avc_codec_string(self.init_segment)
+                self.cond.notify_all()
+        return published
@@ -1,24 +1,13 @@
 import cv2
-import numpy as np
-import math
 import time
-from datetime import datetime, timezone
 import config
 from video_capture import ThreadedVideoCapture
 from visca_control import CameraControl
 from kalman_filter import SkyWatchKalman
+from osd import HUDRenderer
+from stabilizer import Stabilizer
 
 # --- OSD Drawing Helpers ---
-def draw_text(img, text, pos, font, scale, color, thickness=1):
-    # Black outline
-    cv2.putText(img, text, pos, font, scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    # Colored text
-    cv2.putText(img, text, pos, font, scale, color, thickness, cv2.LINE_AA)
-
-def draw_line(img, pt1, pt2, color, thickness=1):
-    cv2.line(img, pt1, pt2, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.line(img, pt1, pt2, color, thickness, cv2.LINE_AA)
-
 def draw_rect(img, pt1, pt2, color, thickness=1):
     cv2.rectangle(img, pt1, pt2, (0, 0, 0), thickness + 2, cv2.LINE_AA)
     cv2.rectangle(img, pt1, pt2, color, thickness, cv2.LINE_AA)
@@ -33,16 +22,6 @@ def draw_circle(img, center, radius, color, thickness=1):
         cv2.circle(img, center, radius, (0, 0, 0), thickness + 2, cv2.LINE_AA)
         cv2.circle(img, center, radius, color, thickness, cv2.LINE_AA)
 
-def draw_ellipse(img, center, axes, angle, startAngle, endAngle, color, thickness=1):
-    cv2.ellipse(img, center, axes, angle, startAngle, endAngle, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.ellipse(img, center, axes, angle, startAngle, endAngle, color, thickness, cv2.LINE_AA)
-
-def draw_poly_filled(img, pts, color):
-    # Draw filled
-    cv2.drawContours(img, [pts], 0, color, -1, cv2.LINE_AA)
-    # Draw outline
-    cv2.drawContours(img, [pts], 0, (0, 0, 0), 1, cv2.LINE_AA)
-
 def main():
     # Initialize Camera Control
     print("Initializing VISCA Control...")
@@ -69,6 +48,8 @@ def main():
     except Exception as e:
         print(f"Warning: Could not load overlay: {e}")
         overlay = None
+    # Overlay, fixed labels and gauges pre-rendered; live values from cached sprites
+    hud = HUDRenderer(overlay)
 
     # Tracker Setup
     tracker = None
@@ -100,6 +81,8 @@ def main():
     cam_el_str = "---"
     last_pan_val = -1
     last_tilt_val = -1
+    pan_deg = None
+    tilt_deg = None
     JITTER_THRESHOLD = 3
     prev_time = time.time()
     
@@ -113,6 +96,7 @@ def main():
     
     # Digital Stabilization State
     digital_stabilization_active = config.DIGITAL_STABILIZATION_ENABLED
+    stabilizer = Stabilizer()
     
     # Dynamic PID Control
     current_kp = config.PAN_KP
@@ -325,78 +309,33 @@ def main():
 
             # --- Digital Stabilization Logic ---
             if digital_stabilization_active:
-                crop_h = int(h * config.DIGITAL_CROP_FACTOR)
-                crop_w = int(w * config.DIGITAL_CROP_FACTOR)
-                
                 if tracking_active and cur_obj_center_x is not None:
-                    # Use RAW position (cur_obj_center_x) for "Locked On" feel
-                    target_x = cur_obj_center_x
-                    target_y = cur_obj_center_y
-                    
-                    # Do NOT clamp the center. Allow it to go wherever.
-                    # Calculate ideal crop coordinates
-                    crop_x1 = int(target_x - crop_w // 2)
-                    crop_y1 = int(target_y - crop_h // 2)
+                    # Follow the RAW position for a "Locked On" feel, smoothed and led by the Kalman velocity
+                    # Do NOT clamp the center. Allow it to go wherever (black outside the frame).
+                    stabilizer.update((cur_obj_center_x, cur_obj_center_y), (kf_vx, kf_vy), dt)
                 else:
-                    # Default to center crop
-                    crop_x1 = (w - crop_w) // 2
-                    crop_y1 = (h - crop_h) // 2
-                
-                crop_x2 = crop_x1 + crop_w
-                crop_y2 = crop_y1 + crop_h
-                
-                # Handle Out-of-Bounds with Padding (Black Bars)
-                # 1. Create black canvas
-                cropped_frame = np.zeros((crop_h, crop_w, 3), dtype=np.uint8)
-                
-                # 2. Calculate intersection with actual frame
-                # Frame coords: 0,0 to w,h
-                # Crop coords: crop_x1,crop_y1 to crop_x2,crop_y2
-                
-                src_x1 = max(0, crop_x1)
-                src_y1 = max(0, crop_y1)
-                src_x2 = min(w, crop_x2)
-                src_y2 = min(h, crop_y2)
-                
-                # 3. Calculate placement on canvas
-                dst_x1 = src_x1 - crop_x1
-                dst_y1 = src_y1 - crop_y1
-                dst_x2 = dst_x1 + (src_x2 - src_x1)
-                dst_y2 = dst_y1 + (src_y2 - src_y1)
-                
-                # 4. Copy valid region if it exists
-                if src_x2 > src_x1 and src_y2 > src_y1:
-                    cropped_frame[dst_y1:dst_y2, dst_x1:dst_x2] = frame[src_y1:src_y2, src_x1:src_x2]
-                
-                display_frame = cv2.resize(cropped_frame, (w, h), interpolation=cv2.INTER_LINEAR)
+                    # Ease back to center crop
+                    stabilizer.update((center_x, center_y), (0.0, 0.0), dt)
+                crop = stabilizer.crop(w, h)
+                display_frame = stabilizer.render(frame, crop)
             else:
+                stabilizer.reset()
                 display_frame = frame.copy()
 
-            # Overlay Blending
-            if overlay is not None:
-                oh, ow = overlay.shape[:2]
-                if oh <= h and ow <= w:
-                    if overlay.shape[2] == 4:
-                        alpha_channel = overlay[:, :, 3]
-                        overlay_bgr = overlay[:, :, :3]
-                        mask = alpha_channel > 0
-                        display_frame[0:oh, 0:ow][mask] = overlay_bgr[mask]
+            # Overlay + Static OSD (labels, gauge backgrounds)
+            hud.draw_static(display_frame)
             
             # --- Drawing Logic (Boxes & Reticles) ---
             if tracking_active and cur_obj_center_x is not None:
                 # Draw Bounding Box
                 if digital_stabilization_active:
-                    scale_x = w / crop_w
-                    scale_y = h / crop_h
-                    disp_x = int((x - crop_x1) * scale_x)
-                    disp_y = int((y - crop_y1) * scale_y)
-                    disp_w = int(w_box * scale_x)
-                    disp_h = int(h_box * scale_y)
+                    disp_x, disp_y = (int(v) for v in Stabilizer.to_display(x, y, crop))
+                    disp_w = int(w_box / crop[2])
+                    disp_h = int(h_box / crop[2])
                     draw_rect(display_frame, (disp_x, disp_y), (disp_x + disp_w, disp_y + disp_h), (255, 255, 255), 1)
                     
                     # Draw Filtered Center (White Dot) - mapped
-                    disp_kf_x = int((kf_x - crop_x1) * scale_x)
-                    disp_kf_y = int((kf_y - crop_y1) * scale_y)
+                    disp_kf_x, disp_kf_y = (int(v) for v in Stabilizer.to_display(kf_x, kf_y, crop))
                     draw_circle(display_frame, (disp_kf_x, disp_kf_y), 2, (255, 255, 255), -1)
                 else:
                     draw_rect(display_frame, (x, y), (x + w_box, y + h_box), (255, 255, 255), 1)
@@ -470,178 +409,16 @@ def main():
                     tilt_deg = t_signed / config.TILT_COUNTS_PER_DEGREE
                     cam_el_str = f"{tilt_deg:+03.0f} DEG"
             
-            # --- Simple OpenCV OSD (Lower Left) ---
-            # Display Max Speed, PID, and Keybinds
-            osd_color = (255, 255, 255)
-            font = cv2.FONT_HERSHEY_PLAIN
-            font_scale = 1.5 
-            thickness = 2
-            line_height = 25
-            
-            # --- Top Left OSD ---
-            tl_start_x = 20
-            tl_start_y = 30
-            
-            # 1. Static Text
-            draw_text(display_frame, "AIRPLANE IAN SYSTEMS 401", (tl_start_x, tl_start_y), font, font_scale, osd_color, thickness)
-            
-            # 2. Date
-            now = datetime.now()
-            date_str = now.strftime("%m/%d/%Y")
-            draw_text(display_frame, date_str, (tl_start_x, tl_start_y + line_height), font, font_scale, osd_color, thickness)
-            
-            # 3. UTC Time
-            utc_now = datetime.now(timezone.utc)
-            utc_str = utc_now.strftime("%H:%M:%S Z")
-            draw_text(display_frame, utc_str, (tl_start_x, tl_start_y + line_height * 2), font, font_scale, osd_color, thickness)
-            
-            # 4. Local Time
-            local_str = now.strftime("%H:%M:%S LCL")
-            draw_text(display_frame, local_str, (tl_start_x, tl_start_y + line_height * 3), font, font_scale, osd_color, thickness)
-
-
-
-            start_x = 20
-            start_y = h - 60
-            
-            # New Static Lines (Stacked above Max Speed)
-            draw_text(display_frame, "HDEO", (start_x, start_y - line_height * 3), font, font_scale, osd_color, thickness)
-            draw_text(display_frame, "FOC MAN", (start_x, start_y - line_height * 2), font, font_scale, osd_color, thickness)
-            draw_text(display_frame, "EXP AUT", (start_x, start_y - line_height * 1), font, font_scale, osd_color, thickness)
-            
-            # 1. Max Speed
+            # --- Simple OpenCV OSD ---
             # Show both Global Setting and Current Dynamic Limit
             if tracking_active and 'active_max_speed' in locals():
                  speed_str = f"MAX SPD {active_max_speed:.2f} (DYN) / {current_max_speed:.2f} (SET)"
             else:
                  speed_str = f"MAX SPD {current_max_speed:.2f} (SET)"
-            
-            draw_text(display_frame, speed_str, (start_x, start_y), font, font_scale, osd_color, thickness)
-            
-            # 2. PID Values
             pid_str = f"P={current_kp:.2f} I={current_ki:.2f} D={current_kd:.2f}"
-            draw_text(display_frame, pid_str, (start_x, start_y + line_height), font, font_scale, osd_color, thickness)
-            
-            # 3. Keybinds
-            keys_str = "SPACE=TRACK WASD=MAN Q/E=SPEED Z=STAB"
-            draw_text(display_frame, keys_str, (start_x, start_y + line_height * 2), font, font_scale, osd_color, thickness)
-            
-            # 4. Status Indicator (Vertically Centered)
-            draw_text(display_frame, f"{status_text}", (start_x, h // 2), font, font_scale, osd_status_color, thickness)
-
-            # Digital Stabilization Indicator
-            dstb_text = "DSTAB ACT" if digital_stabilization_active else "DSTAB STBY"
-            dstb_color = (0, 0, 255) if digital_stabilization_active else (255, 255, 255)
-            draw_text(display_frame, dstb_text, (start_x, h // 2 + 25), font, font_scale, dstb_color, thickness)
-
-            # 5. Graphical PTZ Gauges
-            
-            # Gauge Settings
-            gauge_color = (255, 255, 255)
-            gauge_radius = 60
-            gauge_thickness = 2
-            
-            # Positions
-            # Zoom: Bottom Center
-            zoom_bar_w = 240
-            zoom_bar_h = 20
-            zoom_bar_x = (w - zoom_bar_w) // 2
-            zoom_bar_y = h - 40
-            
-            # Pan/Tilt: Centered above Zoom
-            # Place them side-by-side with a small gap
-            gauge_gap = 40
-            
-            # Tilt on Left
-            tilt_cx = (w // 2) - gauge_radius - (gauge_gap // 2)
-            tilt_cy = zoom_bar_y - gauge_radius - 30
-            
-            # Pan on Right
-            pan_cx = (w // 2) + gauge_radius + (gauge_gap // 2)
-            pan_cy = tilt_cy
-            
-            # --- Pan Gauge (Full Circle) ---
-            # Draw Ring
-            draw_circle(display_frame, (pan_cx, pan_cy), gauge_radius, gauge_color, gauge_thickness)
-            
-            # Draw North Marker (Top)
-            draw_line(display_frame, (pan_cx, pan_cy - gauge_radius), (pan_cx, pan_cy - gauge_radius + 5), gauge_color, 2)
-            
-            # Draw Indicator
-            # Map Pan Degrees to Visual Angle
-            # Cam 0 (North) -> Visual -90 (Top)
-            # Cam +90 (East) -> Visual 0 (Right)
-            # visual_angle = cam_angle - 90
-            if 'pan_deg' in locals():
-                p_rad = math.radians(pan_deg - 90)
-                p_end_x = int(pan_cx + gauge_radius * math.cos(p_rad))
-                p_end_y = int(pan_cy + gauge_radius * math.sin(p_rad))
-                draw_line(display_frame, (pan_cx, pan_cy), (p_end_x, p_end_y), gauge_color, 2)
-                
-                # Text Value: Lower Right (Mirrored)
-                draw_text(display_frame, f"{int(pan_deg)}", (pan_cx + gauge_radius + 5, pan_cy + gauge_radius), font, 1, gauge_color, 2)
-
-            # --- Tilt Gauge (Arc) ---
-            # Range: +90 (Up) to -30 (Down)
-            # Visual Mapping:
-            # Cam +90 -> Visual -90 (Top)
-            # Cam 0 -> Visual 0 (Right)
-            # Cam -30 -> Visual +30 (Bottom Right)
-            # Arc Start: -90 (Top)
-            # Arc End: +30
-            
-            # Draw Arc
-            # ellipse(img, center, axes, angle, startAngle, endAngle, color, thickness)
-            # Note: startAngle and endAngle are in degrees clockwise from the major axis.
-            # If angle=0, major axis is horizontal (Right).
-            # So startAngle=-90 (Top), endAngle=30 (Bottom Right).
-            draw_ellipse(display_frame, (tilt_cx, tilt_cy), (gauge_radius, gauge_radius), 0, -90, 30, gauge_color, gauge_thickness)
-            
-            # Draw Horizon Marker (0 deg) -> Visual 0 (Right)
-            h_mark_x = int(tilt_cx + gauge_radius)
-            h_mark_y = tilt_cy
-            draw_line(display_frame, (h_mark_x - 5, h_mark_y), (h_mark_x, h_mark_y), gauge_color, 2)
-            
-            # Draw Indicator
-            if 'tilt_deg' in locals():
-                # Clamp to limits for display safety
-                disp_tilt = max(config.TILT_MIN_DEG, min(config.TILT_MAX_DEG, tilt_deg))
-                
-                # Visual Angle = -Camera Angle
-                t_rad = math.radians(-disp_tilt)
-                t_end_x = int(tilt_cx + gauge_radius * math.cos(t_rad))
-                t_end_y = int(tilt_cy + gauge_radius * math.sin(t_rad))
-                
-                # Draw Line from Center
-                draw_line(display_frame, (tilt_cx, tilt_cy), (t_end_x, t_end_y), gauge_color, 2)
-                
-                # Text Value: Lower Left (Mirrored)
-                # Estimate width to align right
-                t_str = f"{int(tilt_deg)}"
-                (t_w, _), _ = cv2.getTextSize(t_str, font, 1, 1)
-                draw_text(display_frame, t_str, (tilt_cx - gauge_radius - t_w - 5, tilt_cy + gauge_radius), font, 1, gauge_color, 2)
 
-            # --- Zoom Gauge (Linear) ---
-            # Draw Line
-            draw_line(display_frame, (zoom_bar_x, zoom_bar_y), (zoom_bar_x + zoom_bar_w, zoom_bar_y), gauge_color, gauge_thickness)
-            
-            # Labels
-            draw_text(display_frame, "W", (zoom_bar_x - 20, zoom_bar_y + 5), font, 1, gauge_color, 2)
-            draw_text(display_frame, "N", (zoom_bar_x + zoom_bar_w + 10, zoom_bar_y + 5), font, 1, gauge_color, 2)
-            
-            # Indicator
-            if z_pos is not None:
-                # Map z_pos (0 to ZOOM_MAX_HEX) to (0 to zoom_bar_w)
-                ratio = z_pos / config.ZOOM_MAX_HEX
-                marker_x = int(zoom_bar_x + ratio * zoom_bar_w)
-                
-                # Draw Triangle/Tick
-                # Triangle points up
-                pt1 = (marker_x, zoom_bar_y)
-                pt2 = (marker_x - 8, zoom_bar_y + 13)
-                pt3 = (marker_x + 8, zoom_bar_y + 13)
-                triangle_cnt = np.array([pt1, pt2, pt3])
-                draw_poly_filled(display_frame, triangle_cnt, gauge_color)
+            hud.draw(display_frame, status_text, osd_status_color, digital_stabilization_active, speed_str, pid_str,
+                     pan_deg, tilt_deg, None if z_pos is None else z_pos / config.ZOOM_MAX_HEX)
 
             # Display
             # Force resize to 1920x1080 for consistent window size
@@ -0,0 +1,294 @@
+"""
+Sprite-based OSD compositing.
+
+Everything is rendered once into premultiplied-alpha BGRA images (drawing
+opaque colours with LINE_AA onto a premultiplied canvas is exactly
+premultiplied "over") and composited onto frames in place as
+dst = dst * (1 - alpha) + colour, with cv2.multiply/add into preallocated
+scratch buffers, touching only the pixels an element covers.
+
+    AlphaLayer    a full-frame layer, kept as the runs of tiles that contain anything
+    Sprite        a small image with an anchor point, blitted anywhere with clipping
+    SpriteCache   LRU of rendered sprites (text keyed by string, scale and colour)
+    HUDRenderer   the main.py OSD
+"""
+import math
+from collections import OrderedDict
+from datetime import datetime, timezone
+import cv2
+import numpy as np
+import config
+
+FONT = cv2.FONT_HERSHEY_PLAIN
+WHITE = (255, 255, 255)
+RED = (0, 0, 255)
+_OUTLINE = (0, 0, 0, 255)
+
+
+def _opaque(color):
+    return tuple(color[:3]) + (255,)
+
+
+def premultiply(bgra):
+    """Straight-alpha BGRA (as loaded from a PNG) to premultiplied."""
+    alpha = bgra[:, :, 3:4].astype(np.uint16)
+    out = np.empty_like(bgra)
+    out[:, :, :3] = (bgra[:, :, :3] * alpha + 127) // 255
+    out[:, :, 3] = bgra[:, :, 3]
+    return out
+
+
+def _split(layer):
+    """(colour, 3-channel inverse alpha, scratch buffer) of a premultiplied BGRA image."""
+    color = np.ascontiguousarray(layer[:, :, :3])
+    inv_alpha = np.ascontiguousarray(np.repeat(255 - layer[:, :, 3:4], 3, axis=2))
+    return color, inv_alpha, np.empty_like(inv_alpha)
+
+
+def _blend(roi, color, inv_alpha, scratch):
+    cv2.multiply(roi, inv_alpha, dst=scratch, scale=1 / 255)
+    cv2.add(scratch, color, dst=roi)
+
+
+# --- Outlined drawing onto premultiplied BGRA (same look as the draw_* helpers) ---
+def draw_text(layer, text, pos, scale, color, thickness=1, font=FONT):
+    cv2.putText(layer, text, pos, font, scale, _OUTLINE, thickness + 2, cv2.LINE_AA)
+    cv2.putText(layer, text, pos, font, scale, _opaque(color), thickness, cv2.LINE_AA)
+
+def draw_line(layer, pt1, pt2, color, thickness=1):
+    cv2.line(layer, pt1, pt2, _OUTLINE, thickness + 2, cv2.LINE_AA)
+    cv2.line(layer, pt1, pt2, _opaque(color), thickness, cv2.LINE_AA)
+
+def draw_circle(layer, center, radius, color, thickness=1):
+    cv2.circle(layer, center, radius, _OUTLINE, thickness + 2, cv2.LINE_AA)
+    cv2.circle(layer, center, radius, _opaque(color), thickness, cv2.LINE_AA)
+
+def draw_ellipse(layer, center, axes, angle, start_angle, end_angle, color, thickness=1):
+    cv2.ellipse(layer, center, axes, angle, start_angle, end_angle, _OUTLINE, thickness + 2, cv2.LINE_AA)
+    cv2.ellipse(layer, center, axes, angle, start_angle, end_angle, _opaque(color), thickness, cv2.LINE_AA)
+
+def draw_poly_filled(layer, pts, color):
+    cv2.drawContours(layer, [pts], 0, _opaque(color), -1, cv2.LINE_AA)
+    cv2.drawContours(layer, [pts], 0, _OUTLINE, 1, cv2.LINE_AA)
+
+
+class AlphaLayer:
+    """
+    A premultiplied BGRA layer the size of the frame, reduced to the runs of
+    TILE x TILE tiles that contain anything, each with its colour, inverse
+    alpha and a scratch buffer. blend() composites it in place with real
+    alpha and no per-frame allocations.
+    """
+    TILE = 32
+
+    def __init__(self, layer):
+        height, width = layer.shape[:2]
+        self.regions = []  # (y0, y1, x0, x1, colour, inverse alpha, scratch)
+        t = self.TILE
+        for y0 in range(0, height, t):
+            y1 = min(y0 + t, height)
+            used = [layer[y0:y1, x0:x0 + t, 3].any() for x0 in range(0, width, t)]
+            i = 0
+            while i < len(used):
+                if not used[i]:
+                    i += 1
+                    continue
+                j = i
+                while j < len(used) and used[j]:
+                    j += 1
+                x0, x1 = i * t, min(j * t, width)
+                self.regions.append((y0, y1, x0, x1) + _split(layer[y0:y1, x0:x1]))
+                i = j
+
+    def blend(self, frame):
+        for y0, y1, x0, x1, color, inv_alpha, scratch in self.regions:
+            _blend(frame[y0:y1, x0:x1], color, inv_alpha, scratch)
+
+
+class Sprite:
+    """
+    A premultiplied BGRA image cropped to what it covers, drawn so that
+    `anchor` (a point of the original canvas, e.g. a text origin) lands on
+    the given position. `width` is the layout width (text advance).
+    """
+    __slots__ = ('color', 'inv_alpha', 'scratch', 'dx', 'dy', 'width')
+
+    def __init__(self, layer, anchor, width=None):
+        ys, xs = np.nonzero(layer[:, :, 3])
+        if len(xs):
+            layer = layer[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+            self.dx, self.dy = int(xs.min()) - anchor[0], int(ys.min()) - anchor[1]
+        else:
+            layer = layer[:0, :0]
+            self.dx = self.dy = 0
+        self.color, self.inv_alpha, self.scratch = _split(layer)
+        self.width = layer.shape[1] if width is None else width
+
+    def blit(self, frame, x, y):
+        h, w = self.color.shape[:2]
+        x0, y0 = x + self.dx, y + self.dy
+        fx0, fy0 = max(x0, 0), max(y0, 0)
+        fx1, fy1 = min(x0 + w, frame.shape[1]), min(y0 + h, frame.shape[0])
+        if fx1 <= fx0 or fy1 <= fy0:
+            return
+        sx, sy = fx0 - x0, fy0 - y0
+        sw, sh = fx1 - fx0, fy1 - fy0
+        _blend(frame[fy0:fy1, fx0:fx1], self.color[sy:sy + sh, sx:sx + sw],
+               self.inv_alpha[sy:sy + sh, sx:sx + sw], self.scratch[sy:sy + sh, sx:sx + sw])
+
+
+def text_sprite(text, scale, color, thickness=1, font=FONT):
+    """Outlined text whose anchor is the putText origin (baseline left)."""
+    (tw, th), baseline = cv2.getTextSize(text, font, scale, thickness + 2)
+    pad = thickness + 2
+    canvas = np.zeros((th + baseline + 2 * pad, tw + 2 * pad, 4), np.uint8)
+    origin = (pad, pad + th)
+    draw_text(canvas, text, origin, scale, color, thickness, font)
+    return Sprite(canvas, origin, width=cv2.getTextSize(text, font, scale, 1)[0][0])
+
+
+def needle_sprite(radius, angle_deg, color=WHITE, thickness=2):
+    """Gauge needle from the anchor (gauge centre) out to `radius` at a screen angle (0 = right, clockwise)."""
+    size = 2 * (radius + thickness + 2) + 1
+    c = size // 2
+    canvas = np.zeros((size, size, 4), np.uint8)
+    rad = math.radians(angle_deg)
+    draw_line(canvas, (c, c), (int(c + radius * math.cos(rad)), int(c + radius * math.sin(rad))), color, thickness)
+    return Sprite(canvas, (c, c))
+
+
+def marker_sprite(color=WHITE):
+    """Upward zoom-bar triangle, tip at the anchor."""
+    canvas = np.zeros((18, 20, 4), np.uint8)
+    tip = (10, 1)
+    draw_poly_filled(canvas, np.array([tip, (tip[0] - 8, tip[1] + 13), (tip[0] + 8, tip[1] + 13)]), color)
+    return Sprite(canvas, tip)
+
+
+class SpriteCache:
+    """LRU of rendered sprites. Not thread-safe: one per render thread."""
+    def __init__(self, size=1024):
+        self.cache = OrderedDict()
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        sprite = self.cache.get(key)
+        if sprite is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self.cache[key] = render()
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return sprite
+
+    def text(self, text, scale, color, thickness=1):
+        return self.get(('text', text, scale, color, thickness), lambda: text_sprite(text, scale, color, thickness))
+
+
+class HUDRenderer:
+    """
+    The main.py OSD. The overlay image, the fixed labels and the gauge
+    backgrounds (pan ring, tilt arc, zoom bar and their markers) are rendered
+    once per frame size into an AlphaLayer (draw_static). Per frame, draw()
+    only composites what changes: the clock, status and tuning strings and
+    the gauge readouts from LRU text sprites, and the needles (one sprite per
+    whole degree) and zoom marker, each within its own small rect.
+    """
+    SCALE = 1.5
+    THICKNESS = 2
+    LINE_HEIGHT = 25
+    MARGIN = 20
+    GAUGE_RADIUS = 60
+    GAUGE_GAP = 40
+    ZOOM_BAR_W = 240
+    KEYS = "SPACE=TRACK WASD=MAN Q/E=SPEED Z=STAB"
+
+    def __init__(self, overlay=None, cache_size=1024):
+        self.overlay = overlay
+        self.sprites = SpriteCache(cache_size)
+        self.size = None
+        self.static = None
+        self.marker = marker_sprite()
+
+    def _layout(self, w, h):
+        if self.size == (w, h):
+            return
+        r = self.GAUGE_RADIUS
+        self.zoom_bar = ((w - self.ZOOM_BAR_W) // 2, h - 40)
+        self.tilt_center = (w // 2 - r - self.GAUGE_GAP // 2, self.zoom_bar[1] - r - 30)
+        self.pan_center = (w // 2 + r + self.GAUGE_GAP // 2, self.tilt_center[1])
+        self.static = AlphaLayer(self._render_static(w, h))
+        self.size = (w, h)
+
+    def _render_static(self, w, h):
+        layer = np.zeros((h, w, 4), np.uint8)
+        overlay = self.overlay
+        if overlay is not None and overlay.ndim == 3 and overlay.shape[2] == 4:
+            oh, ow = overlay.shape[:2]
+            if oh <= h and ow <= w:
+                layer[:oh, :ow] = premultiply(overlay)
+
+        x, lh, s, t = self.MARGIN, self.LINE_HEIGHT, self.SCALE, self.THICKNESS
+        draw_text(layer, "AIRPLANE IAN SYSTEMS 401", (x, 30), s, WHITE, t)
+        y = h - 60
+        for i, label in enumerate(("HDEO", "FOC MAN", "EXP AUT")):
+            draw_text(layer, label, (x, y - lh * (3 - i)), s, WHITE, t)
+        draw_text(layer, self.KEYS, (x, y + lh * 2), s, WHITE, t)
+
+        r = self.GAUGE_RADIUS
+        pcx, pcy = self.pan_center
+        draw_circle(layer, (pcx, pcy), r, WHITE, 2)
+        draw_line(layer, (pcx, pcy - r), (pcx, pcy - r + 5), WHITE, 2)        # North
+        tcx, tcy = self.tilt_center
+        draw_ellipse(layer, (tcx, tcy), (r, r), 0, -90, 30, WHITE, 2)       # +90 (top) to -30
+        draw_line(layer, (tcx + r - 5, tcy), (tcx + r, tcy), WHITE, 2)        # Horizon
+        zx, zy = self.zoom_bar
+        draw_line(layer, (zx, zy), (zx + self.ZOOM_BAR_W, zy), WHITE, 2)
+        draw_text(layer, "W", (zx - 20, zy + 5), 1, WHITE, 2)
+        draw_text(layer, "N", (zx + self.ZOOM_BAR_W + 10, zy + 5), 1, WHITE, 2)
+        return layer
+
+    def draw_static(self, frame):
+        h, w = frame.shape[:2]
+        self._layout(w, h)
+        self.static.blend(frame)
+
+    def draw(self, frame, status, status_color, stab_active, speed_str, pid_str,
+             pan_deg=None, tilt_deg=None, zoom_ratio=None):
+        h, w = frame.shape[:2]
+        self._layout(w, h)
+        text = self.sprites.text
+        x, lh, s, t = self.MARGIN, self.LINE_HEIGHT, self.SCALE, self.THICKNESS
+
+        now = datetime.now()
+        text(now.strftime("%m/%d/%Y"), s, WHITE, t).blit(frame, x, 30 + lh)
+        text(datetime.now(timezone.utc).strftime("%H:%M:%S Z"), s, WHITE, t).blit(frame, x, 30 + lh * 2)
+        text(now.strftime("%H:%M:%S LCL"), s, WHITE, t).blit(frame, x, 30 + lh * 3)
+
+        y = h - 60
+        text(speed_str, s, WHITE, t).blit(frame, x, y)
+        text(pid_str, s, WHITE, t).blit(frame, x, y + lh)
+        text(status, s, status_color, t).blit(frame, x, h // 2)
+        text("DSTAB ACT" if stab_active else "DSTAB STBY", s, RED if stab_active else WHITE, t).blit(frame, x, h // 2 + 25)
+
+        r = self.GAUGE_RADIUS
+        if pan_deg is not None:
+            # Camera 0 (North) is screen -90 (top)
+            pcx, pcy = self.pan_center
+            angle = round(pan_deg) - 90
+            self.sprites.get(('needle', angle), lambda: needle_sprite(r, angle)).blit(frame, pcx, pcy)
+            text(f"{int(pan_deg)}", 1, WHITE, 2).blit(frame, pcx + r + 5, pcy + r)
+        if tilt_deg is not None:
+            # Screen angle is minus the camera tilt, clamped to the arc
+            tcx, tcy = self.tilt_center
+            angle = -round(max(config.TILT_MIN_DEG, min(config.TILT_MAX_DEG, tilt_deg)))
+            self.sprites.get(('needle', angle), lambda: needle_sprite(r, angle)).blit(frame, tcx, tcy)
+            readout = text(f"{int(tilt_deg)}", 1, WHITE, 2)
+            readout.blit(frame, tcx - r - readout.width - 5, tcy + r)
+        if zoom_ratio is not None:
+            zx, zy = self.zoom_bar
+            self.marker.blit(frame, int(zx + zoom_ratio * self.ZOOM_BAR_W), zy)
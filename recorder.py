@@ -0,0 +1,368 @@
+"""
+Server-side recording of clean (un-annotated) camera frames.
+
+Recordings are cut into `<directory>/rec-<cam>-<YYYYmmdd-HHMMSS>.<ext>`
+segments. Next to every segment is a session log sidecar of the same name
+(`.swlog`, see session_log.py) with one row per written frame: its index in
+the segment, capture time, pan/tilt/zoom, status and the tracker box / Kalman
+state, so analysis can line telemetry up with video frame by frame:
+
+    from session_log import iter_chunks
+    for t_min, t_max, cols in iter_chunks('recordings/rec-cam0-20260101-120000.swlog'):
+        cols['frame'], cols['t'], cols['box_x'], ...
+
+ClipBuffer keeps the last few seconds as JPEGs in a fixed memory pool and
+saves them, plus what follows, as `<directory>/clip-<cam>-<stamp>.mjpeg` (a
+raw MJPEG stream: `ffmpeg -f mjpeg -r 15 -i clip.mjpeg -c copy clip.avi`)
+with the same kind of sidecar.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+import cv2
+import numpy as np
+import config
+from session_log import TELEMETRY_SCHEMA, write_header, pack_chunk
+
+# Sidecar row: the telemetry log columns plus the frame index within the segment
+RECORDING_SCHEMA = TELEMETRY_SCHEMA[:1] + [('frame', 'u4')] + TELEMETRY_SCHEMA[1:]
+
+CONTAINERS = {'mp4v': 'mp4', 'avc1': 'mp4', 'MJPG': 'avi', 'XVID': 'avi'}
+
+
+class FrameRecorder:
+    """
+    Writes frames handed over by the control loop to segmented video files
+    from a background thread. submit() never blocks: frames pass through a
+    bounded queue and are dropped (and counted) when the encoder or disk
+    falls behind, so recording can't stall tracking. Each written frame gets
+    a sidecar row with the telemetry row it was submitted with.
+    """
+    SIDECAR_CHUNK_ROWS = 256
+
+    def __init__(self, directory, name, fps=30.0, segment_seconds=300, fourcc='mp4v', max_queue=16):
+        self.directory = directory
+        self.name = name
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.fourcc = fourcc
+        self.ext = CONTAINERS.get(fourcc, 'avi')
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.written_frames = 0
+        self.dropped_frames = 0
+        self.segments = 0
+
+        self.writer = None
+        self.sidecar = None
+        self.segment_start = None
+        self.segment_shape = None
+        self.segment_frames = 0
+        self.dtype = np.dtype(RECORDING_SCHEMA)
+        self.rows = np.zeros(self.SIDECAR_CHUNK_ROWS, dtype=self.dtype)
+        self.row_count = 0
+
+    def start(self):
+        if self.running: return self
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, name=f"Recorder-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops accepting frames, writes out what is queued and closes the segment."""
+        if not self.running: return
+        self.running = False
+        self.thread.join(timeout=10.0)
+        print(f"Recording [{self.name}] stopped: {self.written_frames} frames in {self.segments} segments, "
+              f"{self.dropped_frames} dropped")
+
+    def submit(self, frame, row):
+        """
+        Queues a frame with its telemetry row (TELEMETRY_SCHEMA order). The
+        frame must not be modified afterwards.
+        """
+        if not self.running:
+            return
+        try:
+            self.queue.put_nowait((frame, row))
+        except queue.Full:
+            with self.lock:
+                self.dropped_frames += 1
+
+    def stats(self):
+        with self.lock:
+            return {'recording': self.running, 'written_frames': self.written_frames,
+                    'dropped_frames': self.dropped_frames, 'queued_frames': self.queue.qsize(),
+                    'segments': self.segments}
+
+    def _writer_loop(self):
+        try:
+            while self.running or not self.queue.empty():
+                try:
+                    frame, row = self.queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
+                    self._write(frame, row)
+                except (OSError, cv2.error) as e:
+                    print(f"Error recording {self.name}: {e}")
+                    with self.lock:
+                        self.dropped_frames += 1
+        finally:
+            self._close_segment()
+
+    def _write(self, frame, row):
+        t = row[0]
+        if (self.writer is None or frame.shape != self.segment_shape
+                or t - self.segment_start >= self.segment_seconds):
+            self._close_segment()
+            self._open_segment(frame.shape, t)
+
+        self.writer.write(frame)
+        self.rows[self.row_count] = (t, self.segment_frames) + tuple(row[1:])
+        self.row_count += 1
+        self.segment_frames += 1
+        if self.row_count == self.SIDECAR_CHUNK_ROWS:
+            self._flush_rows()
+        with self.lock:
+            self.written_frames += 1
+
+    def _open_segment(self, shape, t):
+        stamp = datetime.fromtimestamp(t).strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.directory, f"{self.name}-{stamp}")
+        suffix = 1
+        while os.path.exists(f"{base}.{self.ext}"):
+            base = os.path.join(self.directory, f"{self.name}-{stamp}-{suffix}")
+            suffix += 1
+
+        h, w = shape[:2]
+        self.writer = cv2.VideoWriter(f"{base}.{self.ext}", cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+        if not self.writer.isOpened():
+            self.writer = None
+            raise OSError(f"Could not open video writer for {base}.{self.ext} ({self.fourcc})")
+        self.sidecar = open(f"{base}.swlog", 'wb')
+        write_header(self.sidecar, self.dtype)
+        self.segment_start = t
+        self.segment_shape = shape
+        self.segment_frames = 0
+        with self.lock:
+            self.segments += 1
+
+    def _flush_rows(self):
+        if self.row_count and self.sidecar is not None:
+            self.sidecar.write(pack_chunk(self.rows[:self.row_count]))
+            self.sidecar.flush()
+        self.row_count = 0
+
+    def _close_segment(self):
+        self._flush_rows()
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+
+
+_ClipFrame = namedtuple('_ClipFrame', 'seq t offset length row')
+
+
+class ClipBuffer:
+    """
+    Rolling pre-event buffer. The control loop offers every frame to
+    submit(), which keeps at most the newest one for the encoder thread
+    (rate-limited to `fps`); the encoder downscales it, JPEG-encodes it and
+    copies it into a ring inside one preallocated `pool_bytes` block,
+    evicting the oldest frames as it wraps or as they age past `seconds`.
+    Memory use is the pool plus a small index, whatever the frame size.
+
+    save() writes out the buffered frames plus the next `post_seconds` on a
+    background thread, copying one frame at a time out of the pool. A save
+    triggered while one is running extends it instead of starting another.
+    """
+    def __init__(self, directory, name, seconds=20, post_seconds=10, pool_bytes=64 * 1024 * 1024,
+                 fps=15, width=1280, quality=70):
+        self.directory = directory
+        self.name = name
+        self.seconds = seconds
+        self.post_seconds = post_seconds
+        self.min_interval = 1.0 / fps
+        self.width = width
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+
+        self.pool = np.zeros(pool_bytes, dtype=np.uint8)  # Touched once so it is resident from the start
+        self.index = deque()        # _ClipFrame, oldest first
+        self.head = 0               # Next write offset in the pool
+        self.seq = 0
+        self.cond = threading.Condition()
+
+        self.pending = None         # Newest (frame, row) not yet encoded
+        self.pending_event = threading.Event()
+        self.last_submit = 0.0
+        self.save_until = None      # End time of the running save, if any
+        self.dropped_frames = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running: return self
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._encode_loop, name=f"Clip-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.pending_event.set()
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def submit(self, frame, row):
+        """Offers a frame and its telemetry row; never blocks. The frame must not be modified afterwards."""
+        t = row[0]
+        if t - self.last_submit < self.min_interval:
+            return
+        self.last_submit = t
+        with self.cond:
+            self.pending = (frame, row)
+        self.pending_event.set()
+
+    def stats(self):
+        with self.cond:
+            frames = len(self.index)
+            return {'frames': frames, 'pool_bytes': len(self.pool),
+                    'used_bytes': sum(f.length for f in self.index),
+                    'span_s': self.index[-1].t - self.index[0].t if frames else 0.0,
+                    'dropped_frames': self.dropped_frames, 'saving': self.save_until is not None}
+
+    def _encode_loop(self):
+        while self.running:
+            if not self.pending_event.wait(timeout=0.5):
+                continue
+            with self.cond:
+                item, self.pending = self.pending, None
+                self.pending_event.clear()
+            if item is None:
+                continue
+            frame, row = item
+            if self.width and frame.shape[1] > self.width:
+                height = int(round(frame.shape[0] * self.width / frame.shape[1]))
+                frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", frame, self.params)
+            if ok:
+                self._store(row, jpeg.reshape(-1))
+
+    def _store(self, row, jpeg):
+        n = len(jpeg)
+        t = row[0]
+        with self.cond:
+            if n > len(self.pool):
+                self.dropped_frames += 1
+                return
+            start = self.head
+            if start + n > len(self.pool):
+                start = 0  # Wrap; the skipped tail only holds frames older than those at the start
+            end = start + n
+            # The frames overlapping the write (and the wrapped-over tail) are always the oldest
+            while self.index:
+                oldest = self.index[0]
+                if not (t - oldest.t > self.seconds
+                        or (start < self.head and oldest.offset >= self.head)
+                        or (oldest.offset < end and oldest.offset + oldest.length > start)):
+                    break
+                self.index.popleft()
+            self.pool[start:end] = jpeg
+            self.index.append(_ClipFrame(self.seq, t, start, n, row))
+            self.head = end
+            self.seq += 1
+            self.cond.notify_all()
+
+    def save(self, post_seconds=None):
+        """Saves the buffered frames and the following `post_seconds` without blocking."""
+        post_seconds = self.post_seconds if post_seconds is None else post_seconds
+        with self.cond:
+            until = time.time() + post_seconds
+            if self.save_until is not None:
+                self.save_until = max(self.save_until, until)
+                return
+            if not self.index:
+                return
+            self.save_until = until
+            first_seq = self.index[0].seq
+        threading.Thread(target=self._safe_save, args=(first_seq,), name=f"ClipSave-{self.name}", daemon=True).start()
+
+    def _safe_save(self, first_seq):
+        try:
+            self._save(first_seq)
+        except OSError as e:
+            print(f"Error saving clip {self.name}: {e}")
+        finally:
+            with self.cond:
+                self.save_until = None
+
+    def _next_frame(self, seq):
+        """(seq, _ClipFrame, JPEG bytes) of the first buffered frame at or after `seq`, waiting for it."""
+        with self.cond:
+            while True:
+                if self.index and self.index[-1].seq >= seq:
+                    first = self.index[0].seq
+                    seq = max(seq, first)  # Frames overwritten before they could be copied are skipped
+                    frame = self.index[seq - first]
+                    if frame.t > self.save_until:
+                        return None
+                    return seq, frame, bytes(self.pool[frame.offset:frame.offset + frame.length])
+                if not self.running or time.time() > self.save_until:
+                    return None
+                self.cond.wait(0.5)
+
+    def _save(self, seq):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.directory, f"clip-{self.name}-{stamp}")
+        dtype = np.dtype(RECORDING_SCHEMA)
+        rows = []
+        with open(f"{base}.mjpeg", 'wb') as video, open(f"{base}.swlog", 'wb') as sidecar:
+            write_header(sidecar, dtype)
+            while True:
+                item = self._next_frame(seq)
+                if item is None:
+                    break
+                seq, frame, jpeg = item
+                video.write(jpeg)
+                rows.append((frame.t, len(rows)) + tuple(frame.row[1:]))
+                seq += 1
+            if rows:
+                sidecar.write(pack_chunk(np.array(rows, dtype=dtype)))
+        print(f"Saved clip {base}.mjpeg ({len(rows)} frames)")
+
+
+def open_recorder(name):
+    """Started FrameRecorder for a camera using the `recording` config."""
+    return FrameRecorder(config.RECORD_DIR, name,
+                         fps=config.RECORD_FPS,
+                         segment_seconds=config.RECORD_SEGMENT_SECONDS,
+                         fourcc=config.RECORD_FOURCC,
+                         max_queue=config.RECORD_QUEUE_FRAMES).start()
+
+
+def open_clip_buffer(name):
+    """Started ClipBuffer for a camera using the `clip` config, or None if disabled."""
+    if not config.CLIP_ENABLED:
+        return None
+    return ClipBuffer(config.CLIP_DIR, name,
+                      seconds=config.CLIP_PRE_SECONDS,
+                      post_seconds=config.CLIP_POST_SECONDS,
+                      pool_bytes=int(config.CLIP_POOL_MB * 1024 * 1024),
+                      fps=config.CLIP_FPS,
+                      width=config.CLIP_WIDTH,
+                      quality=config.CLIP_QUALITY).start()
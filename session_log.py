@@ -0,0 +1,316 @@
+"""
+Append-only columnar session logs (ADS-B states, per-frame tracking telemetry).
+
+Each stream is written to `<directory>/<name>-<YYYYmmdd-HHMMSS>.swlog` files,
+rotated by size / age. A file is a small self-describing header (the column
+schema as JSON) followed by chunks; every chunk carries its row count and
+time span, then one contiguous array per column. Reading a time range maps
+the files and only touches the chunks that overlap it:
+
+    from session_log import read_range
+    cols = read_range('logs', 'adsb', t_start, t_end)   # dict of NumPy arrays
+
+    python session_log.py info logs
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import config
+
+FILE_MAGIC = b'SWLOG1\n'
+CHUNK_MAGIC = b'SWLC'
+_FILE_HEADER = struct.Struct('<I')          # schema JSON length
+_CHUNK_HEADER = struct.Struct('<4sIIdd')    # magic, rows, columns, t_min, t_max
+_FILE_NAME = re.compile(r'^(?P<name>.+)-\d{8}-\d{6}(-\d+)?\.swlog$')
+
+# --- Stream Schemas (first column is always the timestamp 't') ---
+ADSB_SCHEMA = [
+    ('t', 'f8'), ('t_pos', 'f8'), ('icao', 'u4'),
+    ('lat', 'f8'), ('lon', 'f8'), ('alt', 'f4'),
+    ('track', 'f4'), ('gs', 'f4'), ('vrate', 'f4'),
+    ('flight', 'S8'),
+]
+
+TELEMETRY_SCHEMA = [
+    ('t', 'f8'), ('pan', 'f4'), ('tilt', 'f4'), ('zoom', 'f4'),
+    ('status', 'u1'), ('track_active', 'u1'), ('stab_active', 'u1'),
+    ('box_x', 'f4'), ('box_y', 'f4'), ('box_w', 'f4'), ('box_h', 'f4'),
+    ('kf_x', 'f4'), ('kf_y', 'f4'), ('kf_vx', 'f4'), ('kf_vy', 'f4'),
+]
+
+STATUS_CODES = {'STANDBY': 0, 'MANUAL': 1, 'TRACKING': 2, 'CUE': 3}
+
+
+def icao_to_int(hex_id):
+    """ICAO hex as an integer; non-ICAO ('~' prefixed TIS-B) addresses get bit 24 set."""
+    try:
+        if hex_id.startswith('~'):
+            return (1 << 24) | int(hex_id[1:], 16)
+        return int(hex_id, 16)
+    except ValueError:
+        return 0
+
+
+def write_header(f, dtype):
+    """Writes the file header (magic + schema) for rows of `dtype`."""
+    schema = json.dumps([[name, dtype[name].str] for name in dtype.names]).encode()
+    f.write(FILE_MAGIC + _FILE_HEADER.pack(len(schema)) + schema)
+
+
+def pack_chunk(chunk):
+    """One chunk (header + a contiguous array per column) from a structured array of rows."""
+    names = chunk.dtype.names
+    t = chunk['t']
+    parts = [_CHUNK_HEADER.pack(CHUNK_MAGIC, len(chunk), len(names), float(t.min()), float(t.max()))]
+    parts.extend(np.ascontiguousarray(chunk[name]).tobytes() for name in names)
+    return b''.join(parts)
+
+
+def open_session_log(name, schema):
+    """Started ColumnarLog for a stream using the `logging` config, or None if disabled."""
+    if not config.LOG_ENABLED:
+        return None
+    return ColumnarLog(config.LOG_DIR, name, schema,
+                       chunk_rows=config.LOG_CHUNK_ROWS,
+                       flush_interval=config.LOG_FLUSH_INTERVAL,
+                       rotate_bytes=int(config.LOG_ROTATE_MB * 1024 * 1024),
+                       rotate_seconds=config.LOG_ROTATE_HOURS * 3600).start()
+
+
+class ColumnarLog:
+    """
+    Writer for one stream. append() copies a row into a preallocated chunk
+    buffer under a lock; full chunks (or whatever is buffered every
+    `flush_interval`) go to a background thread through a bounded queue, so
+    callers never wait on disk. If the disk falls behind by more than
+    `max_pending` chunks, new chunks are dropped and counted.
+    """
+    def __init__(self, directory, name, schema, chunk_rows=4096, flush_interval=5.0,
+                 rotate_bytes=256 * 1024 * 1024, rotate_seconds=3600, max_pending=8):
+        self.directory = directory
+        self.name = name
+        self.dtype = np.dtype(schema)
+        self.names = self.dtype.names
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+
+        self.lock = threading.Lock()
+        self.buffer = np.zeros(chunk_rows, dtype=self.dtype)
+        self.count = 0
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped_rows = 0
+        self.written_rows = 0
+
+        self.file = None
+        self.file_opened = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running: return self
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, name=f"Log-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if not self.running: return
+        self.flush()
+        self.running = False
+        self.thread.join(timeout=5.0)
+        self._close_file()
+
+    def append(self, row):
+        """Appends one row given as a tuple in schema order."""
+        with self.lock:
+            self.buffer[self.count] = row
+            self.count += 1
+            if self.count == self.chunk_rows:
+                self._hand_off()
+
+    def append_columns(self, **columns):
+        """Appends many rows from equal-length column arrays (missing columns are zero)."""
+        n = len(columns['t'])
+        start = 0
+        with self.lock:
+            while start < n:
+                take = min(n - start, self.chunk_rows - self.count)
+                dst = self.buffer[self.count:self.count + take]
+                for key, values in columns.items():
+                    dst[key] = values[start:start + take]
+                self.count += take
+                start += take
+                if self.count == self.chunk_rows:
+                    self._hand_off()
+
+    def flush(self):
+        with self.lock:
+            if self.count:
+                self._hand_off()
+
+    def stats(self):
+        with self.lock:
+            return {'written_rows': self.written_rows, 'dropped_rows': self.dropped_rows,
+                    'buffered_rows': self.count, 'pending_chunks': self.queue.qsize()}
+
+    def _hand_off(self):
+        chunk = self.buffer[:self.count]
+        try:
+            self.queue.put_nowait(chunk)
+            self.buffer = np.zeros(self.chunk_rows, dtype=self.dtype)
+        except queue.Full:
+            self.dropped_rows += self.count  # Reuse the buffer, the rows are lost
+        self.count = 0
+
+    def _writer_loop(self):
+        while self.running or not self.queue.empty():
+            try:
+                chunk = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self.flush()
+                continue
+            try:
+                self._write_chunk(chunk)
+            except OSError as e:
+                print(f"Error writing {self.name} log: {e}")
+                with self.lock:
+                    self.dropped_rows += len(chunk)
+
+    def _open_file(self):
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"{self.name}-{stamp}.swlog")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.name}-{stamp}-{suffix}.swlog")
+            suffix += 1
+        self.file = open(path, 'wb')
+        write_header(self.file, self.dtype)
+        self.file_opened = time.time()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _write_chunk(self, chunk):
+        if self.file is not None and (self.file.tell() >= self.rotate_bytes
+                                      or time.time() - self.file_opened >= self.rotate_seconds):
+            self._close_file()
+        if self.file is None:
+            self._open_file()
+
+        self.file.write(pack_chunk(chunk))
+        self.file.flush()
+        with self.lock:
+            self.written_rows += len(chunk)
+
+
+def _read_schema(buf):
+    if buf[:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError("Not a SkyWatch session log")
+    offset = len(FILE_MAGIC)
+    (length,) = _FILE_HEADER.unpack_from(buf, offset)
+    offset += _FILE_HEADER.size
+    schema = [(name, np.dtype(dt)) for name, dt in json.loads(bytes(buf[offset:offset + length]))]
+    return schema, offset + length
+
+
+def iter_chunks(path):
+    """
+    Yields (t_min, t_max, columns) per chunk of one file, where `columns` are
+    zero-copy NumPy views onto the memory-mapped file. A truncated last
+    chunk (e.g. after a crash) is ignored.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    schema, offset = _read_schema(buf)
+    row_bytes = sum(dt.itemsize for _, dt in schema)
+    while offset + _CHUNK_HEADER.size <= len(buf):
+        magic, rows, ncols, t_min, t_max = _CHUNK_HEADER.unpack_from(buf, offset)
+        if magic != CHUNK_MAGIC or ncols != len(schema):
+            break
+        pos = offset + _CHUNK_HEADER.size
+        if pos + rows * row_bytes > len(buf):
+            break
+        columns = {}
+        for name, dt in schema:
+            columns[name] = np.frombuffer(buf, dtype=dt, count=rows, offset=pos)
+            pos += rows * dt.itemsize
+        yield t_min, t_max, columns
+        offset = pos
+
+
+def stream_name(path):
+    match = _FILE_NAME.match(os.path.basename(path))
+    return match.group('name') if match else None
+
+
+def log_files(directory, name):
+    """Files of one stream, oldest first."""
+    return sorted(p for p in glob.glob(os.path.join(directory, '*.swlog')) if stream_name(p) == name)
+
+
+def read_range(directory, name, t_start=None, t_end=None, columns=None):
+    """
+    Rows of stream `name` with t_start <= t <= t_end (either bound optional),
+    as a dict of column arrays. Chunks outside the range are skipped without
+    reading their data.
+    """
+    t_start = -np.inf if t_start is None else t_start
+    t_end = np.inf if t_end is None else t_end
+    parts = {}
+    for path in log_files(directory, name):
+        for t_min, t_max, cols in iter_chunks(path):
+            if t_max < t_start or t_min > t_end:
+                continue
+            t = cols['t']
+            mask = None if (t_min >= t_start and t_max <= t_end) else (t >= t_start) & (t <= t_end)
+            for key in (columns or cols.keys()):
+                parts.setdefault(key, []).append(cols[key] if mask is None else cols[key][mask])
+    return {key: np.concatenate(arrays) for key, arrays in parts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkyWatch session log tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_info = sub.add_parser('info', help="Summarize the logs in a directory")
+    p_info.add_argument('directory', nargs='?', default='logs')
+    args = parser.parse_args()
+
+    streams = {}
+    for path in sorted(glob.glob(os.path.join(args.directory, '*.swlog'))):
+        name = stream_name(path)
+        if name is None:
+            continue
+        stream = streams.setdefault(name, {'files': 0, 'bytes': 0, 'rows': 0, 't_min': np.inf, 't_max': -np.inf})
+        stream['files'] += 1
+        stream['bytes'] += os.path.getsize(path)
+        for t_min, t_max, cols in iter_chunks(path):
+            stream['rows'] += len(cols['t'])
+            stream['t_min'] = min(stream['t_min'], t_min)
+            stream['t_max'] = max(stream['t_max'], t_max)
+
+    for name, s in streams.items():
+        span = ''
+        if s['rows']:
+            span = (f"{datetime.fromtimestamp(s['t_min']):%Y-%m-%d %H:%M:%S} -> "
+                    f"{datetime.fromtimestamp(s['t_max']):%Y-%m-%d %H:%M:%S}")
+        print(f"{name:20s} {s['files']:4d} files {s['rows']:10d} rows {s['bytes'] / 1e6:9.1f} MB  {span}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,20 +7,19 @@ import os
 from datetime import datetime, timezone
 import traceback
 import config
+import tracing
 from video_capture import ThreadedVideoCapture
 from visca_control import CameraControl
 from kalman_filter import SkyWatchKalman
+from geodesy import GeoOrigin, dead_reckon
+from session_log import open_session_log, TELEMETRY_SCHEMA, STATUS_CODES
+from recorder import open_recorder, open_clip_buffer
+from metrics import StageMetrics, CORE_STAGES
+from stabilizer import Stabilizer
+import osd
 
 
 # --- OSD Drawing Helpers ---
-def draw_text(img, text, pos, font, scale, color, thickness=1):
-    cv2.putText(img, text, pos, font, scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.putText(img, text, pos, font, scale, color, thickness, cv2.LINE_AA)
-
-def draw_line(img, pt1, pt2, color, thickness=1):
-    cv2.line(img, pt1, pt2, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-    cv2.line(img, pt1, pt2, color, thickness, cv2.LINE_AA)
-
 def draw_rect(img, pt1, pt2, color, thickness=1):
     cv2.rectangle(img, pt1, pt2, (0, 0, 0), thickness + 2, cv2.LINE_AA)
     cv2.rectangle(img, pt1, pt2, color, thickness, cv2.LINE_AA)
@@ -33,15 +32,53 @@ def draw_circle(img, center, radius, color, thickness=1):
         cv2.circle(img, center, radius, (0, 0, 0), thickness + 2, cv2.LINE_AA)
         cv2.circle(img, center, radius, color, thickness, cv2.LINE_AA)
 
+
+class StaticOSDLayer(osd.AlphaLayer):
+    """
+    The parts of the burned-in OSD that do not change between frames (the
+    overlay image and, while not tracking, the centre reticle), rendered once
+    for one frame size and blended with real alpha from the tiles that
+    contain anything (see osd.AlphaLayer).
+    """
+    def __init__(self, width, height, overlay=None, reticle=False):
+        layer = np.zeros((height, width, 4), np.uint8)
+        if overlay is not None and overlay.ndim == 3 and overlay.shape[2] == 4:
+            oh, ow = overlay.shape[:2]
+            if oh <= height and ow <= width:
+                layer[:oh, :ow] = osd.premultiply(overlay)
+        if reticle:
+            cx, cy = width // 2, height // 2
+            osd.draw_line(layer, (cx - 20, cy), (cx + 20, cy), (255, 255, 255), 1)
+            osd.draw_line(layer, (cx, cy - 20), (cx, cy + 20), (255, 255, 255), 1)
+        super().__init__(layer)
+
+
 class SkyWatchCore:
-    def __init__(self):
+    def __init__(self, camera=None):
         self.running = False
         self.thread = None
         self.lock = threading.Lock()
+        self.render_lock = threading.Lock()  # _present() reuses the stabilizer buffers and OSD layer cache
+        self.telemetry_cond = threading.Condition(self.lock)  # Notified when telemetry changes
 
         # Camera & Control
-        self.ptz = CameraControl(config.CAMERA_IP, config.VISCA_PORT)
+        self.cam = camera or config.CAMERAS[0]
+        self.ptz = CameraControl(self.cam['ip'], self.cam['visca_port'])
         self.video = None
+        self.telemetry_log = None
+        self.recorder = None
+        self.clip_buffer = None
+        self.metrics = StageMetrics(CORE_STAGES)  # Per-stage latency of _update_loop
+
+        # Optional publish hook, called as on_update(frame, telemetry) once per
+        # processed frame (used by camera_worker to ship results to the web process).
+        # `telemetry` is None when nothing changed since the previous frame and
+        # `frame` is None while there are no subscribers; during the call,
+        # `self.frame_seq` is the sequence number of `frame`, `self.frame_time`
+        # its capture time and `self.frame_render` its render number: `frame`
+        # may be a reused Stabilizer buffer, so copy it under render_lock and
+        # only while display_intact(frame_render).
+        self.on_update = None
         
         # Overlay
         self.overlay = None
@@ -49,14 +86,24 @@ class SkyWatchCore:
             self.overlay = cv2.imread(config.OVERLAY_IMAGE_PATH, cv2.IMREAD_UNCHANGED)
         except Exception as e:
             print(f"Warning: Could not load overlay: {e}")
+        self.osd_layers = {}  # (width, height, reticle) -> StaticOSDLayer; clear to re-render
+        self.client_osd = config.OSD_MODE == "client"  # Publish OSD geometry instead of drawing it
+        self.frame_seq = 0  # Processed frames; tags the published frame and its OSD geometry
+        self.frame_time = 0.0  # time.time() when frame `frame_seq` arrived from the camera
 
         # State Variables
         self.tracking_active = False
         self.tracker = None
         self.kf = None
         self.digital_stabilization_active = config.DIGITAL_STABILIZATION_ENABLED
-        self.current_max_speed = config.MAX_PAN_SPEED
+        self.stabilizer = Stabilizer()
+        self.current_max_speed = self.cam['max_pan_speed']
         self.manual_mode_active = False
+        self.init_tracker_box = None
+
+        # ADS-B Cue (slew to a reported aircraft, then hand off to the tracker)
+        self.origin = GeoOrigin(config.CAMERA_LAT, config.CAMERA_LNG, config.CAMERA_HEIGHT_FT)
+        self.cue = None
         
         # PID State
         self.current_kp = config.PAN_KP
@@ -75,15 +122,25 @@ class SkyWatchCore:
 
         # Shared Data for Web (Thread-Safe Inteface)
         self.latest_frame = None # The final frame with OSD
+        self.latest_source = None # Inputs of _present() for the latest frame, rendered on demand while unwatched
+        self.latest_render = None # Stabilizer render number of latest_frame (None: not a reused buffer)
+        self.frame_render = None
+        self.subscribers = {} # Consumer name -> count; no presentation work while empty
         self.telemetry = {
+            'camera': self.cam['id'],
             'pan': 0, 'tilt': 0, 'zoom': 1.0, 
             'kp': self.current_kp, 'ki': self.current_ki, 'kd': self.current_kd,
             'speed_limit': self.current_max_speed,
             'status': "STANDBY",
             'fps': 0,
             'track_active': False,
-            'stab_active': self.digital_stabilization_active
+            'stab_active': self.digital_stabilization_active,
+            'cue_hex': None, 'cue_flight': None, 'cue_az': None, 'cue_el': None,
+            'recording': False,
+            'stage_ms': {}
         }
+        self.telemetry_version = 0
+        self.telemetry_published = None
         
         # Manual Control Request
         self.manual_cmd = {'pan': 0, 'tilt': 0, 'zoom': 0, 'timestamp': 0}
@@ -95,12 +152,14 @@ class SkyWatchCore:
         # Initialize Hardware
         self.ptz.stop()
         self.ptz.start_polling(interval=0.2)
-        self.video = ThreadedVideoCapture(config.RTSP_URL).start()
+        self.video = ThreadedVideoCapture(self.cam['rtsp_url'], name=f"Capture-{self.cam['id']}").start()
+        self.telemetry_log = open_session_log(f"telemetry-{self.cam['id']}", TELEMETRY_SCHEMA)
+        self.clip_buffer = open_clip_buffer(self.cam['id'])
         
         # Start Loop
-        self.thread = threading.Thread(target=self._safe_update_loop, daemon=True)
+        self.thread = threading.Thread(target=self._safe_update_loop, name=f"Core-{self.cam['id']}", daemon=True)
         self.thread.start()
-        print("SkyWatch Core Started.")
+        print(f"SkyWatch Core [{self.cam['id']}] Started.")
 
     def stop(self):
         self.running = False
@@ -111,7 +170,12 @@ class SkyWatchCore:
             self.ptz.stop_polling()
         if self.video:
             self.video.stop()
-        print("SkyWatch Core Stopped.")
+        if self.telemetry_log:
+            self.telemetry_log.stop()
+        self.stop_recording()
+        if self.clip_buffer:
+            self.clip_buffer.stop()
+        print(f"SkyWatch Core [{self.cam['id']}] Stopped.")
 
     def set_manual_command(self, pan, tilt, zoom):
         with self.lock:
@@ -126,17 +190,21 @@ class SkyWatchCore:
             # Usually, manual input should override tracking.
             if (pan != 0 or tilt != 0 or zoom != 0) and self.tracking_active:
                 self.stop_tracking()
+            if (pan != 0 or tilt != 0 or zoom != 0) and self.cue is not None:
+                self.cue = None
 
     def toggle_tracking(self):
         with self.lock:
+            self.cue = None
             if self.tracking_active:
                 self.stop_tracking()
             else:
                 self.start_tracking()
 
-    def start_tracking(self):
+    def start_tracking(self, box=None):
         self.tracking_active = True
         self.tracking_active = True
+        self.init_tracker_box = box
         # Reset PID Integegrals
         for k in self.pid_state:
             if k not in ['last_sent_pan', 'last_sent_tilt', 'last_visca_time']:
@@ -146,6 +214,8 @@ class SkyWatchCore:
         self.tracker = None 
         # Note: Actual tracker initialization happens in the loop when we have a valid frame
         self.init_tracker_requested = True
+        if config.CLIP_ON_TRACK_START:
+            self.save_clip()
 
     def stop_tracking(self):
         self.tracking_active = False
@@ -153,6 +223,63 @@ class SkyWatchCore:
         self.tracker = None
         self.kf = None
 
+    def cue_target(self, target):
+        """
+        Slews to an ADS-B target (a dict from ADSBClient.get_target_state) and
+        hands off to the visual tracker once the aircraft is found in frame.
+        """
+        with self.lock:
+            if self.tracking_active:
+                self.stop_tracking()
+            self.cue = {
+                'target': target,
+                'started': time.time(),
+                'last_aim': 0.0,
+                'pan': None, 'tilt': None,
+                'az': None, 'el': None,
+            }
+        print(f"[{self.cam['id']}] Cueing to {target['hex']} {target.get('flight', '')}")
+
+    def update_cue(self, target):
+        """Refreshes the cued aircraft's state with a newer ADS-B fix."""
+        with self.lock:
+            if self.cue is not None and self.cue['target']['hex'] == target['hex']:
+                self.cue['target'] = target
+
+    def cancel_cue(self):
+        with self.lock:
+            if self.cue is not None:
+                self.cue = None
+                self.ptz.stop()
+
+    # --- Server-Side Recording ---
+    def start_recording(self):
+        """Records clean frames plus a telemetry sidecar under `recording.directory`."""
+        with self.lock:
+            if self.recorder is not None:
+                return
+            self.recorder = open_recorder(f"rec-{self.cam['id']}")
+        print(f"[{self.cam['id']}] Recording started")
+
+    def stop_recording(self):
+        with self.lock:
+            recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
+    def save_clip(self, post_seconds=None):
+        """Saves the pre-event buffer plus the next `post_seconds` (clip.post_s) in the background."""
+        if self.clip_buffer is None:
+            print(f"[{self.cam['id']}] Clip buffer disabled (clip.enabled)")
+            return
+        self.clip_buffer.save(post_seconds)
+
+    def toggle_recording(self):
+        if self.recorder is None:
+            self.start_recording()
+        else:
+            self.stop_recording()
+
     def toggle_stabilization(self):
         self.digital_stabilization_active = not self.digital_stabilization_active
 
@@ -164,16 +291,206 @@ class SkyWatchCore:
     def set_max_speed(self, speed):
         self.current_max_speed = speed
 
+    def add_subscriber(self, name):
+        """
+        Registers a consumer of rendered frames ('mjpeg', 'h264', 'window', ...).
+        While none is registered the loop skips stabilization, overlay and OSD.
+        """
+        with self.lock:
+            self.subscribers[name] = self.subscribers.get(name, 0) + 1
+
+    def remove_subscriber(self, name):
+        with self.lock:
+            count = self.subscribers.get(name, 0) - 1
+            if count > 0:
+                self.subscribers[name] = count
+            else:
+                self.subscribers.pop(name, None)
+
     def get_frame(self):
         with self.lock:
-            if self.latest_frame is None:
-                return None
-            return self.latest_frame.copy()
+            frame, render, source = self.latest_frame, self.latest_render, self.latest_source
+        if source is None:
+            return None
+        with self.render_lock:
+            if frame is None or not self.display_intact(render):
+                # Nobody subscribed, so the loop didn't render it (or has rendered over it): do it now
+                frame, render, _ = self._present(*source, time.perf_counter(), record=False)
+                with self.lock:
+                    if self.latest_source is source:
+                        self.latest_frame, self.latest_render = frame, render
+            return frame.copy()
+
+    def display_intact(self, render):
+        """True if the display frame with render number `render` is still intact (render_lock held)."""
+        return render is None or self.stabilizer.intact(render)
 
     def get_telemetry_data(self):
         with self.lock:
             return self.telemetry.copy()
 
+    def metrics_snapshot(self):
+        """Cumulative per-stage latency histograms of the core loop, for /metrics."""
+        return self.metrics.snapshot()
+
+    def trace_events(self, seconds):
+        """Chrome Trace Events of this process' threads over the last `seconds`, for /api/trace."""
+        return tracing.events(seconds)
+
+    def wait_for_telemetry(self, after_version, timeout=None):
+        """Blocks until the telemetry differs from version `after_version`; returns (version, telemetry)."""
+        with self.telemetry_cond:
+            self.telemetry_cond.wait_for(lambda: self.telemetry_version != after_version, timeout)
+            return self.telemetry_version, self.telemetry.copy()
+
+    def _static_osd(self, width, height, reticle):
+        key = (width, height, reticle)
+        layer = self.osd_layers.get(key)
+        if layer is None:
+            layer = self.osd_layers[key] = StaticOSDLayer(width, height, self.overlay, reticle)
+        return layer
+
+    def _present(self, frame, crop, show_reticle, disp_box, disp_kf, t, record=True):
+        """
+        Renders the display frame: the stabilization crop scaled back to full
+        size, then the overlay, reticle and tracking shapes unless the browser
+        draws them. Returns (display_frame, render number or None if it is not
+        a reused Stabilizer buffer, perf_counter after the last stage).
+        Callers hold render_lock. With `record=False` (renders outside the
+        loop) no stage metrics or spans are recorded.
+        """
+        lap = self.metrics.lap if record else (lambda stage, since: since)
+        h, w = frame.shape[:2]
+        if crop is not None:
+            display_frame = self.stabilizer.render(frame, crop)  # Reused buffer, black outside the frame
+            render = self.stabilizer.renders
+            t = lap('stabilize', t)
+        elif self.client_osd:
+            return frame, None, t  # Nothing is drawn on it, so the capture frame itself is shared
+        else:
+            display_frame = frame.copy()  # The capture frame also goes to the recorder clean
+            render = None
+
+        if not self.client_osd:
+            # Static OSD: overlay image + manual reticle, alpha-blended from the cached layer
+            self._static_osd(w, h, show_reticle).blend(display_frame)
+            t = lap('overlay', t)
+
+            # Draw OSD (Tracking Shapes - Burned In)
+            if disp_box is not None:
+                bx, by, bw, bh = disp_box
+                draw_rect(display_frame, (bx, by), (bx + bw, by + bh), (255, 255, 255), 1)
+                draw_circle(display_frame, disp_kf, 2, (255, 255, 255), -1)
+            t = lap('osd', t)
+        return display_frame, render, t
+
+    def _manual_control(self):
+        """
+        Forwards the latest manual command to the PTZ while it is fresh, and
+        stops the camera once the control stream goes quiet. Returns True if a
+        command was sent.
+        """
+        # Manual commands are updated via API
+        # We enforce a timeout (watchdog) to stop movement if control stream is lost
+        if time.time() - self.manual_cmd['timestamp'] < 0.25: # 250ms Keep-Alive
+            self.manual_mode_active = True
+
+            m_pan = self.manual_cmd['pan']
+            m_tilt = self.manual_cmd['tilt']
+            m_zoom = self.manual_cmd['zoom']
+
+            if self.cam['invert_pan']: m_pan = -m_pan
+            if self.cam['invert_tilt']: m_tilt = -m_tilt
+
+            if m_zoom != 0:
+                self.ptz.zoom(m_zoom)
+            else:
+                self.ptz.zoom(0) # Stop zoom? Or just don't send?
+                # Note: ptz.zoom usually requires constant send? Unclear from snippet.
+                # Assuming we need to stop zoom if 0
+                # But pan_tilt handles its own stopping.
+
+            if m_pan != 0 or m_tilt != 0:
+                self.ptz.pan_tilt(m_pan, m_tilt)
+            return True
+        if self.manual_mode_active:
+            self.ptz.stop()
+            self.manual_mode_active = False
+        return False
+
+    def _control_without_video(self):
+        """
+        One loop iteration while the video has stalled: PTZ safety must not
+        wait for frames. The tracker can't steer, so its slew is stopped; cues
+        keep aiming (handoff needs a frame) and manual control keeps its
+        watchdog. Telemetry stays current.
+        """
+        now = time.time()
+        if self.tracking_active:
+            if self.pid_state['last_sent_pan'] != 0 or self.pid_state['last_sent_tilt'] != 0:
+                self.ptz.stop()
+                self.pid_state['last_sent_pan'] = self.pid_state['last_sent_tilt'] = 0
+                self.pid_state['pan_accumulator'] = self.pid_state['tilt_accumulator'] = 0.0
+                self.pid_state['last_visca_time'] = now
+        elif self.cue is not None:
+            self._update_cue(None, now)
+        else:
+            self._manual_control()
+        with self.lock:
+            telemetry, changed = self._refresh_telemetry(None)
+        if changed and self.on_update is not None:
+            self.on_update(None, telemetry)
+
+    def _refresh_telemetry(self, osd_geometry):
+        """
+        Updates the telemetry dict from the control state and the PTZ position
+        (lock held) and publishes it if it changed. Returns (copy, changed).
+        """
+        z_pos = self.ptz.get_zoom_pos()
+
+        # Update Telemetry Dict
+        self.telemetry['track_active'] = self.tracking_active
+        self.telemetry['stab_active'] = self.digital_stabilization_active
+        self.telemetry['kp'] = self.current_kp
+        self.telemetry['ki'] = self.current_ki
+        self.telemetry['kd'] = self.current_kd
+        self.telemetry['speed_limit'] = self.current_max_speed
+        if self.tracking_active:
+            self.telemetry['status'] = "TRACKING"
+        elif self.cue is not None:
+            self.telemetry['status'] = "CUE"
+        else:
+            self.telemetry['status'] = "MANUAL" if self.manual_mode_active else "STANDBY"
+
+        cue = self.cue
+        self.telemetry['cue_hex'] = cue['target']['hex'] if cue else None
+        self.telemetry['cue_flight'] = cue['target'].get('flight') if cue else None
+        self.telemetry['cue_az'] = cue['az'] if cue else None
+        self.telemetry['cue_el'] = cue['el'] if cue else None
+        self.telemetry['recording'] = self.recorder is not None
+
+        # Re-tagged only when the geometry moves, so a still OSD doesn't make telemetry change
+        if osd_geometry is not None:
+            osd_state = self.telemetry.get('osd')
+            if osd_state is None or any(osd_state[k] != v for k, v in osd_geometry.items()):
+                osd_geometry['frame_seq'] = self.frame_seq
+                self.telemetry['osd'] = osd_geometry
+
+        pan_tilt = self._get_pan_tilt_degrees()
+        if pan_tilt is not None:
+            self.telemetry['pan'], self.telemetry['tilt'] = pan_tilt
+
+        if z_pos is not None:
+            self.telemetry['zoom'] = 1.0 + (z_pos / self.cam['zoom_max_hex']) * (self.cam['zoom_max_x'] - 1.0)
+
+        telemetry = self.telemetry.copy()
+        telemetry_changed = telemetry != self.telemetry_published
+        if telemetry_changed:
+            self.telemetry_published = telemetry
+            self.telemetry_version += 1
+            self.telemetry_cond.notify_all()
+        return telemetry, telemetry_changed
+
     def _get_dynamic_max_speed(self, error_dist):
         """Calculates speed limit based on distance to error threshold."""
         prev_dist = 0
@@ -187,12 +504,114 @@ class SkyWatchCore:
         
         max_dist = 600
         if error_dist >= max_dist:
-             return config.MAX_PAN_SPEED
+             return self.cam['max_pan_speed']
         ratio = (error_dist - prev_dist) / (max_dist - prev_dist)
-        return prev_speed + ratio * (config.MAX_PAN_SPEED - prev_speed)
-
-
-
+        return prev_speed + ratio * (self.cam['max_pan_speed'] - prev_speed)
+
+
+
+
+    def _get_pan_tilt_degrees(self):
+        """Last polled pan/tilt in degrees, or None until the camera has answered."""
+        p_pos, t_pos = self.ptz.get_pan_tilt_pos()
+        if p_pos is None or t_pos is None:
+            return None
+        if p_pos > 0x7FFF: p_pos -= 0x10000
+        if t_pos > 0x7FFF: t_pos -= 0x10000
+        return p_pos / self.cam['pan_counts_per_degree'], t_pos / self.cam['tilt_counts_per_degree']
+
+    def _cue_aim_point(self, target, now, current):
+        """
+        Pan/tilt (deg) to intercept the cued aircraft. The position is dead
+        reckoned ahead by the command latency plus the time the slew itself
+        will take, iterated so the lead accounts for its own travel.
+        """
+        lead = config.CUE_LATENCY
+        for _ in range(3):
+            dt = min(max(now + lead - target['t_pos'], 0.0), config.ADSB_MAX_EXTRAPOLATION + lead)
+            lat, lon, alt = dead_reckon(target['lat'], target['lon'], target['alt'],
+                                        target['track'], target['gs'], target['vrate'], dt)
+            _, az, el = self.origin.look_angles(lat, lon, alt)
+            pan = (float(az) - self.cam['north_offset_deg'] + 180.0) % 360.0 - 180.0
+            pan = max(min(pan, config.PAN_MAX_DEG), config.PAN_MIN_DEG)
+            tilt = max(min(float(el), config.TILT_MAX_DEG), config.TILT_MIN_DEG)
+            if current is None:
+                break
+            travel = max(abs(pan - current[0]), abs(tilt - current[1]))
+            lead = config.CUE_LATENCY + travel / config.CUE_SLEW_RATE_DPS
+        return pan, tilt, float(az), float(el)
+
+    def _update_cue(self, frame, now):
+        cue = self.cue
+        if now - cue['started'] > config.CUE_TIMEOUT:
+            print(f"[{self.cam['id']}] Cue to {cue['target']['hex']} timed out")
+            self.cancel_cue()
+            return
+
+        current = self._get_pan_tilt_degrees()
+        if now - cue['last_aim'] >= config.CUE_REAIM_INTERVAL:
+            pan, tilt, cue['az'], cue['el'] = self._cue_aim_point(cue['target'], now, current)
+            cue['pan'], cue['tilt'] = pan, tilt
+            self.ptz.pan_tilt_absolute(pan * self.cam['pan_counts_per_degree'],
+                                       tilt * self.cam['tilt_counts_per_degree'],
+                                       config.CUE_PAN_SPEED, config.CUE_TILT_SPEED)
+            cue['last_aim'] = now
+
+        if current is None or cue['pan'] is None:
+            return
+        if max(abs(current[0] - cue['pan']), abs(current[1] - cue['tilt'])) > config.CUE_HANDOFF_DEG:
+            return
+
+        if frame is None:
+            return  # No video: keep aiming, hand off once frames arrive
+        box = self._detect_target_near_center(frame)
+        if box is not None:
+            print(f"[{self.cam['id']}] Cue handoff: {cue['target']['hex']} acquired at {box}")
+            with self.lock:
+                if self.cue is cue:
+                    self.cue = None
+                    self.start_tracking(box)
+
+    def _detect_target_near_center(self, frame):
+        """
+        Looks for a compact object standing out from the sky near the frame
+        centre. Returns a tracker box (x, y, w, h) around the blob closest to
+        the centre, or None.
+        """
+        h, w = frame.shape[:2]
+        r = config.CUE_SEARCH_RADIUS
+        x1, y1 = max(0, w // 2 - r), max(0, h // 2 - r)
+        x2, y2 = min(w, w // 2 + r), min(h, h // 2 + r)
+
+        gray = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        # A wide median removes small objects, leaving the sky gradient / clouds
+        background = cv2.medianBlur(gray, 31)
+        diff = cv2.absdiff(gray, background)
+        _, mask = cv2.threshold(diff, config.CUE_DETECT_THRESHOLD, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+
+        cx, cy = w // 2 - x1, h // 2 - y1
+        best = None
+        best_dist = None
+        for c in contours:
+            bx, by, bw, bh = cv2.boundingRect(c)
+            if bw * bh < 4:
+                continue
+            d = math.hypot(bx + bw / 2 - cx, by + bh / 2 - cy)
+            if best_dist is None or d < best_dist:
+                best, best_dist = (bx, by, bw, bh), d
+        if best is None:
+            return None
+
+        bx, by, bw, bh = best
+        size_w = max(bw + 16, config.RETICLE_SIZE)
+        size_h = max(bh + 16, config.RETICLE_SIZE)
+        box_x = int(min(max(x1 + bx + bw // 2 - size_w // 2, 0), w - size_w))
+        box_y = int(min(max(y1 + by + bh // 2 - size_h // 2, 0), h - size_h))
+        return (box_x, box_y, int(size_w), int(size_h))
 
     def _safe_update_loop(self):
         try:
@@ -206,19 +625,26 @@ class SkyWatchCore:
 
     def _update_loop(self):
         prev_time = time.time()
+        metrics = self.metrics
+        window_start = time.time()
+        window_frames = 0
+        last_grab = 0
         # Wait for camera
         time.sleep(1.0)
         
         while self.running:
-            loop_start = time.time()
+            loop_start = time.perf_counter()
             
-            # 1. Capture
-            frame = self.video.read()
+            # 1. Capture: wait for the next grab, so every iteration processes a new frame
+            grab, frame = self.video.read_numbered(after=last_grab, timeout=0.1)
             if frame is None:
-                time.sleep(0.01)
+                self._control_without_video()
                 continue
+            last_grab = grab
                 
-            display_frame = frame.copy()
+            self.frame_seq += 1
+            self.frame_time = time.time()
+            t = metrics.lap('capture', loop_start)
             h, w = frame.shape[:2]
             center_x = w // 2
             center_y = h // 2
@@ -234,16 +660,19 @@ class SkyWatchCore:
             
             # Tracker Init (Requested via Web/API)
             if getattr(self, 'init_tracker_requested', False):
-                half = config.RETICLE_SIZE // 2
-                rx1, ry1 = center_x - half, center_y - half
+                init_box = self.init_tracker_box
+                if init_box is None:
+                    half = config.RETICLE_SIZE // 2
+                    init_box = (center_x - half, center_y - half, config.RETICLE_SIZE, config.RETICLE_SIZE)
                 self.tracker = cv2.TrackerCSRT_create()
-                self.tracker.init(frame, (rx1, ry1, config.RETICLE_SIZE, config.RETICLE_SIZE))
+                self.tracker.init(frame, init_box)
                 self.tracking_active = True
                 self.init_tracker_requested = False
                 self.kf = None
 
             if self.tracking_active and self.tracker:
                 success, box = self.tracker.update(frame)
+                t = metrics.lap('tracker', t)
                 if not success:
                     # Tracker Lost
                     # self.tracking_active = False # Optional: Auto-disengage?
@@ -261,6 +690,7 @@ class SkyWatchCore:
                     
                     self.kf.predict(dt + config.SYSTEM_LATENCY)
                     kf_x, kf_y, kf_vx, kf_vy = self.kf.update(cur_obj_center_x, cur_obj_center_y)
+                    t = metrics.lap('kalman', t)
                     
                     # PID Calc
                     error_x = center_x - kf_x
@@ -299,8 +729,8 @@ class SkyWatchCore:
                     ff_pan = kf_vx * config.FEED_FORWARD_GAIN
                     ff_tilt = kf_vy * config.FEED_FORWARD_GAIN
                     
-                    if config.PAN_INVERT: pid_pan, ff_pan = -pid_pan, -ff_pan
-                    if config.TILT_INVERT: pid_tilt, ff_tilt = -pid_tilt, -ff_tilt
+                    if self.cam['invert_pan']: pid_pan, ff_pan = -pid_pan, -ff_pan
+                    if self.cam['invert_tilt']: pid_tilt, ff_tilt = -pid_tilt, -ff_tilt
                     
                     if abs(error_x) < config.DEADBAND: pid_pan = 0
                     if abs(error_y) < config.DEADBAND: pid_tilt = 0
@@ -330,10 +760,12 @@ class SkyWatchCore:
                     self.pid_state['tilt_accumulator'] -= tilt_speed
                     
                     # Min Check
-                    if pan_speed != 0 and abs(pan_speed) < config.MIN_PAN_SPEED:
-                        pan_speed = config.MIN_PAN_SPEED if pan_speed > 0 else -config.MIN_PAN_SPEED
-                    if tilt_speed != 0 and abs(tilt_speed) < config.MIN_TILT_SPEED:
-                        tilt_speed = config.MIN_TILT_SPEED if tilt_speed > 0 else -config.MIN_TILT_SPEED
+                    min_pan = self.cam['min_pan_speed']
+                    min_tilt = self.cam['min_tilt_speed']
+                    if pan_speed != 0 and abs(pan_speed) < min_pan:
+                        pan_speed = min_pan if pan_speed > 0 else -min_pan
+                    if tilt_speed != 0 and abs(tilt_speed) < min_tilt:
+                        tilt_speed = min_tilt if tilt_speed > 0 else -min_tilt
                         
                     # Send
                     current_time_visca = time.time()
@@ -344,6 +776,7 @@ class SkyWatchCore:
                          should_send = True
                     elif current_time_visca - self.pid_state['last_visca_time'] > 0.1:
                          should_send = True
+                    t = metrics.lap('pid', t)
                          
                     if should_send:
                         if abs(pan_speed) > 0 or abs(tilt_speed) > 0:
@@ -355,131 +788,103 @@ class SkyWatchCore:
                         self.pid_state['last_visca_time'] = current_time_visca
                         self.pid_state['last_sent_pan'] = pan_speed
                         self.pid_state['last_sent_tilt'] = tilt_speed
+                        t = metrics.lap('visca', t)
+
+            # ADS-B Cue
+            if self.cue is not None and not self.tracking_active:
+                self._update_cue(frame, current_time)
+                t = metrics.lap('cue', t)
 
             # Manual Control
-            if not self.tracking_active:
-                # Manual commands are updated via API
-                # We enforce a timeout (watchdog) to stop movement if control stream is lost
-                 if time.time() - self.manual_cmd['timestamp'] < 0.25: # 250ms Keep-Alive
-                     self.manual_mode_active = True
-                     
-                     m_pan = self.manual_cmd['pan']
-                     m_tilt = self.manual_cmd['tilt']
-                     m_zoom = self.manual_cmd['zoom']
-                     
-                     if config.PAN_INVERT: m_pan = -m_pan
-                     if config.TILT_INVERT: m_tilt = -m_tilt
-                     
-                     if m_zoom != 0:
-                         self.ptz.zoom(m_zoom)
-                     else:
-                         self.ptz.zoom(0) # Stop zoom? Or just don't send? 
-                         # Note: ptz.zoom usually requires constant send? Unclear from snippet.
-                         # Assuming we need to stop zoom if 0
-                         # But pan_tilt handles its own stopping.
-                     
-                     if m_pan != 0 or m_tilt != 0:
-                         self.ptz.pan_tilt(m_pan, m_tilt)
-                 else:
-                     if self.manual_mode_active:
-                         self.ptz.stop()
-                         self.manual_mode_active = False
+            if not self.tracking_active and self.cue is None:
+                if self._manual_control():
+                    t = metrics.lap('visca', t)
 
             # 3. Stabilization / Display Prep
             # Capture state locally to avoid race conditions during the frame
             is_stabilizing = self.digital_stabilization_active
+            crop = None
             
             if is_stabilizing:
-                crop_h = int(h * config.DIGITAL_CROP_FACTOR)
-                crop_w = int(w * config.DIGITAL_CROP_FACTOR)
-                
+                # The virtual camera follows the target (or the frame centre) along a smoothed path
                 if self.tracking_active and cur_obj_center_x is not None:
-                     target_x = cur_obj_center_x
-                     target_y = cur_obj_center_y
-                     crop_x1 = int(target_x - crop_w // 2)
-                     crop_y1 = int(target_y - crop_h // 2)
+                    self.stabilizer.update((cur_obj_center_x, cur_obj_center_y), (kf_vx, kf_vy), dt)
                 else:
-                     crop_x1 = (w - crop_w) // 2
-                     crop_y1 = (h - crop_h) // 2
-                     
-                crop_x2 = crop_x1 + crop_w
-                crop_y2 = crop_y1 + crop_h
-                
-                # Padding Logic
-                cropped_frame = np.zeros((crop_h, crop_w, 3), dtype=np.uint8)
-                src_x1 = max(0, crop_x1)
-                src_y1 = max(0, crop_y1)
-                src_x2 = min(w, crop_x2)
-                src_y2 = min(h, crop_y2)
-                
-                dst_x1 = src_x1 - crop_x1
-                dst_y1 = src_y1 - crop_y1
-                dst_x2 = dst_x1 + (src_x2 - src_x1)
-                dst_y2 = dst_y1 + (src_y2 - src_y1)
-                
-                if src_x2 > src_x1 and src_y2 > src_y1:
-                    cropped_frame[dst_y1:dst_y2, dst_x1:dst_x2] = frame[src_y1:src_y2, src_x1:src_x2]
-                
-                display_frame = cv2.resize(cropped_frame, (w, h), interpolation=cv2.INTER_LINEAR)
+                    self.stabilizer.update((center_x, center_y), (0.0, 0.0), dt)
+                crop = self.stabilizer.crop(w, h)
+            else:
+                self.stabilizer.reset()
             
-            # Overlay Blending
-            if self.overlay is not None:
-                oh, ow = self.overlay.shape[:2]
-                # Resize overlay if needed or just clip? Main.py checked if oh <= h
-                if oh <= h and ow <= w:
-                    if self.overlay.shape[2] == 4:
-                        alpha_channel = self.overlay[:, :, 3]
-                        overlay_bgr = self.overlay[:, :, :3]
-                        mask = alpha_channel > 0
-                        display_frame[0:oh, 0:ow][mask] = overlay_bgr[mask]
-
-            # Draw OSD (Shapes Only - Burned In)
-            if self.tracking_active and cur_obj_center_x is not None:
-                if is_stabilizing:
-                    scale_x = w / crop_w
-                    scale_y = h / crop_h
-                    disp_x = int((x - crop_x1) * scale_x)
-                    disp_y = int((y - crop_y1) * scale_y)
-                    disp_w = int(w_box * scale_x)
-                    disp_h = int(h_box * scale_y)
-                    draw_rect(display_frame, (disp_x, disp_y), (disp_x + disp_w, disp_y + disp_h), (255, 255, 255), 1)
-                    
-                    disp_kf_x = int((kf_x - crop_x1) * scale_x)
-                    disp_kf_y = int((kf_y - crop_y1) * scale_y)
-                    draw_circle(display_frame, (disp_kf_x, disp_kf_y), 2, (255, 255, 255), -1)
-                else:
-                    draw_rect(display_frame, (x, y), (x + w_box, y + h_box), (255, 255, 255), 1)
-                    draw_circle(display_frame, (int(kf_x), int(kf_y)), 2, (255, 255, 255), -1)
+            # Tracking shapes in display coordinates
+            show_reticle = not (self.tracking_active and cur_obj_center_x is not None)
+            if show_reticle:
+                disp_box = disp_kf = None
+            elif is_stabilizing:
+                box_x, box_y = Stabilizer.to_display(x, y, crop)
+                kf_dx, kf_dy = Stabilizer.to_display(kf_x, kf_y, crop)
+                disp_box = (int(box_x), int(box_y), int(w_box / crop[2]), int(h_box / crop[2]))
+                disp_kf = (int(kf_dx), int(kf_dy))
+            else:
+                disp_box = (x, y, w_box, h_box)
+                disp_kf = (int(kf_x), int(kf_y))
+
+            if self.client_osd:
+                # Clean frame: the browser draws the overlay and these shapes from telemetry
+                osd_geometry = {'size': [w, h], 'reticle': show_reticle,
+                                'box': list(disp_box) if disp_box else None,
+                                'kf': list(disp_kf) if disp_kf else None}
+            else:
+                osd_geometry = None
+
+            # 4. Presentation, only while someone consumes rendered frames
+            # (otherwise get_frame() renders the latest one on request)
+            source = (frame, crop, show_reticle, disp_box, disp_kf)
+            if self.subscribers:
+                with self.render_lock:
+                    display_frame, render, t = self._present(*source, t)
             else:
-                 # Manual Reticle
-                 half_size = config.RETICLE_SIZE // 2
-                 draw_line(display_frame, (center_x - 20, center_y), (center_x + 20, center_y), (255, 255, 255), 1)
-                 draw_line(display_frame, (center_x, center_y - 20), (center_x, center_y + 20), (255, 255, 255), 1)
+                display_frame = render = None
+
+            # FPS and stage latency summary, once a second
+            window_frames += 1
+            window_elapsed = current_time - window_start
+            if window_elapsed >= 1.0:
+                fps = round(window_frames / window_elapsed, 1)
+                stage_ms = metrics.summary()
+                window_start = current_time
+                window_frames = 0
+            else:
+                fps = stage_ms = None
 
             # Update Telemetry (Thread Safe)
             with self.lock:
                 self.latest_frame = display_frame
+                self.latest_render = render
+                self.latest_source = source
+                if fps is not None:
+                    self.telemetry['fps'] = fps
+                    self.telemetry['stage_ms'] = stage_ms
 
-                z_pos, p_pos, t_pos = self.ptz.get_cached_pos()
-                
-                # Update Telemetry Dict
-                self.telemetry['track_active'] = self.tracking_active
-                self.telemetry['stab_active'] = self.digital_stabilization_active
-                self.telemetry['kp'] = self.current_kp
-                self.telemetry['ki'] = self.current_ki
-                self.telemetry['kd'] = self.current_kd
-                self.telemetry['speed_limit'] = self.current_max_speed
-                self.telemetry['status'] = "TRACKING" if self.tracking_active else ("MANUAL" if self.manual_mode_active else "STANDBY")
-                
-                if p_pos is not None:
-                     p_signed = p_pos
-                     if p_signed > 0x7FFF: p_signed -= 0x10000
-                     self.telemetry['pan'] = p_signed / config.PAN_COUNTS_PER_DEGREE
-                
-                if t_pos is not None:
-                     t_signed = t_pos
-                     if t_signed > 0x7FFF: t_signed -= 0x10000
-                     self.telemetry['tilt'] = t_signed / config.TILT_COUNTS_PER_DEGREE
+                telemetry, telemetry_changed = self._refresh_telemetry(osd_geometry)
 
-                if z_pos is not None:
-                     self.telemetry['zoom'] = 1.0 + (z_pos / config.ZOOM_MAX_HEX) * (config.ZOOM_MAX_X - 1.0)
+            recorder = self.recorder
+            if self.telemetry_log is not None or recorder is not None or self.clip_buffer is not None:
+                if self.tracking_active and cur_obj_center_x is not None:
+                    track_row = (x, y, w_box, h_box, kf_x, kf_y, kf_vx, kf_vy)
+                else:
+                    track_row = (np.nan,) * 8
+                row = (current_time, telemetry['pan'], telemetry['tilt'], telemetry['zoom'],
+                       STATUS_CODES.get(telemetry['status'], 255),
+                       telemetry['track_active'], telemetry['stab_active']) + track_row
+                if self.telemetry_log is not None:
+                    self.telemetry_log.append(row)
+                if recorder is not None:
+                    recorder.submit(frame, row)  # Clean capture frame, once per grab; never blocks
+                if self.clip_buffer is not None:
+                    self.clip_buffer.submit(frame, row)
+
+            if self.on_update is not None:
+                self.frame_render = render
+                self.on_update(display_frame, telemetry if telemetry_changed else None)
+            t = metrics.lap('publish', t)
+            metrics.record('frame', loop_start, t)
@@ -0,0 +1,116 @@
+"""
+Digital stabilization: a virtual camera that shows `crop_factor` of the
+frame around a smoothed centre, scaled back up to full size.
+
+The centre eases towards the target (the tracker's position, or the frame
+centre when nothing is tracked) with time constant
+`stabilization.smoothing_s`. The target is led by the Kalman velocity over
+the same time constant, so a target moving at constant speed stays centred
+instead of trailing behind. The crop therefore doesn't shake with every raw
+tracker measurement and doesn't snap when tracking starts or stops.
+
+Views are rendered in a single pass into one of a few output buffers that
+are allocated once per frame size, so stabilizing a frame allocates no image
+memory. The default path snaps the crop to whole source pixels and resizes
+the part inside the frame straight into the buffer, filling the rest black.
+With `stabilization.subpixel`, a cv2.warpAffine (inverse map, bilinear,
+black border) renders the exact sub-pixel crop instead. That gives smoother
+slow pans but costs several times as much (`python bench_stabilize.py`).
+"""
+import math
+import cv2
+import numpy as np
+import config
+
+
+class Stabilizer:
+    BUFFERS = 3  # Output frames in rotation: a result stays intact while the next two are rendered
+
+    def __init__(self, crop_factor=None, smoothing_s=None, subpixel=None):
+        self.crop_factor = config.DIGITAL_CROP_FACTOR if crop_factor is None else crop_factor
+        self.smoothing_s = config.DIGITAL_STAB_SMOOTHING if smoothing_s is None else smoothing_s
+        self.subpixel = config.DIGITAL_STAB_SUBPIXEL if subpixel is None else subpixel
+        self.center = None                          # Smoothed crop centre, frame pixels
+        self.matrix = np.zeros((2, 3), np.float64)  # Output pixel -> frame pixel (subpixel path)
+        self.buffers = []
+        self.index = 0
+        self.renders = 0  # Results rendered so far; numbers them for intact()
+
+    def reset(self):
+        """Forgets the trajectory; the next update() starts on its target."""
+        self.center = None
+
+    def update(self, target, velocity, dt):
+        """Advances the crop centre by `dt` seconds towards `target` (x, y), led by `velocity` (px/s)."""
+        tau = self.smoothing_s
+        goal_x = target[0] + velocity[0] * tau
+        goal_y = target[1] + velocity[1] * tau
+        if self.center is None or tau <= 0:
+            self.center = [goal_x, goal_y]
+        else:
+            a = 1.0 - math.exp(-dt / tau)
+            self.center[0] += a * (goal_x - self.center[0])
+            self.center[1] += a * (goal_y - self.center[1])
+
+    def crop(self, width, height):
+        """
+        The current crop of a width x height frame as (x0, y0, scale):
+        display pixel (u, v) shows frame point (x0 + u * scale, y0 + v * scale).
+        """
+        s = self.crop_factor
+        x0 = self.center[0] - width * s / 2
+        y0 = self.center[1] - height * s / 2
+        if not self.subpixel:
+            x0, y0 = round(x0), round(y0)
+        return x0, y0, s
+
+    @staticmethod
+    def to_display(x, y, crop):
+        """Frame point (x, y) in display pixels of `crop`."""
+        x0, y0, s = crop
+        return (x - x0) / s, (y - y0) / s
+
+    def intact(self, render):
+        """True while result number `render` (`renders` just after it) has not been rendered over."""
+        return self.renders - render < self.BUFFERS
+
+    def render(self, frame, crop):
+        """
+        The view of `frame` through `crop`, written into the next output
+        buffer. The result is overwritten BUFFERS renders later; readers on
+        other threads check intact() and must not overlap the next renders.
+        """
+        h, w = frame.shape[:2]
+        if not self.buffers or self.buffers[0].shape != frame.shape:
+            self.buffers = [np.empty_like(frame) for _ in range(self.BUFFERS)]
+        self.index = (self.index + 1) % self.BUFFERS
+        self.renders += 1
+        out = self.buffers[self.index]
+        x0, y0, s = crop
+
+        if self.subpixel:
+            # Same pixel-centre convention as cv2.resize: src = x0 + (u + 0.5) * s - 0.5
+            m = self.matrix
+            m[0, 0] = m[1, 1] = s
+            m[0, 2] = x0 + 0.5 * s - 0.5
+            m[1, 2] = y0 + 0.5 * s - 0.5
+            cv2.warpAffine(frame, m, (w, h), dst=out, flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                           borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+            return out
+
+        # Part of the crop inside the frame, and where it lands in the output
+        src_x1, src_y1 = max(0, x0), max(0, y0)
+        src_x2, src_y2 = min(w, x0 + round(w * s)), min(h, y0 + round(h * s))
+        if src_x2 <= src_x1 or src_y2 <= src_y1:
+            out[:] = 0
+            return out
+        u1, v1 = round((src_x1 - x0) / s), round((src_y1 - y0) / s)
+        u2, v2 = round((src_x2 - x0) / s), round((src_y2 - y0) / s)
+        cv2.resize(frame[src_y1:src_y2, src_x1:src_x2], (u2 - u1, v2 - v1),
+                   dst=out[v1:v2, u1:u2], interpolation=cv2.INTER_LINEAR)
+        # Black bars where the crop leaves the frame
+        out[:v1] = 0
+        out[v2:] = 0
+        out[v1:v2, :u1] = 0
+        out[v1:v2, u2:] = 0
+        return out
@@ -11,12 +11,80 @@ document.addEventListener('DOMContentLoaded', () => {
         inD: document.getElementById('input-d'),
         btnUpdatePid: document.getElementById('btn-update-pid'),
         btnRec: document.getElementById('btn-rec'),
+        btnSrvRec: document.getElementById('btn-srv-rec'),
         video: document.getElementById('video-stream'),
         canvas: document.getElementById('osd-canvas')
     };
 
     const ctx = els.canvas.getContext('2d');
 
+    // Camera this page controls (multi-camera installs select it via ?cam=)
+    const cameraId = document.body.dataset.camera;
+
+    // Client-side OSD (stream.osd: client): frames arrive clean and the overlay,
+    // reticle, track box and Kalman dot are drawn here from telemetry `osd`
+    const clientOSD = document.body.dataset.osd === 'client';
+    const overlayImg = new Image();
+    if (clientOSD) overlayImg.src = '/api/osd/overlay';
+
+    // --- H.264 Player (Media Source Extensions, ?video=h264) ---
+    // The server sends one fMP4 fragment per frame; append them as they arrive
+    // and keep playback pinned to the live edge.
+    if (els.video.tagName === 'VIDEO') startH264Player(els.video);
+
+    async function startH264Player(video) {
+        const res = await fetch(video.dataset.src);
+        const codec = res.headers.get('X-Codec');
+        const mime = `video/mp4; codecs="${codec}"`;
+        if (!res.ok || !window.MediaSource || !MediaSource.isTypeSupported(mime)) {
+            console.error("H.264 playback unavailable:", res.status, mime);
+            return;
+        }
+
+        const mediaSource = new MediaSource();
+        video.src = URL.createObjectURL(mediaSource);
+        await new Promise(resolve => mediaSource.addEventListener('sourceopen', resolve, { once: true }));
+        const sourceBuffer = mediaSource.addSourceBuffer(mime);
+        sourceBuffer.mode = 'segments';
+
+        const queue = [];
+        const pump = () => {
+            if (sourceBuffer.updating || queue.length === 0) return;
+            const buffered = sourceBuffer.buffered;
+            if (buffered.length && buffered.end(buffered.length - 1) - buffered.start(0) > 30) {
+                // Trim old media so the buffer doesn't grow without bound
+                sourceBuffer.remove(buffered.start(0), video.currentTime - 5);
+                return;
+            }
+            // Coalesce queued fragments into one append
+            const size = queue.reduce((n, chunk) => n + chunk.length, 0);
+            const data = new Uint8Array(size);
+            let offset = 0;
+            for (const chunk of queue.splice(0)) {
+                data.set(chunk, offset);
+                offset += chunk.length;
+            }
+            sourceBuffer.appendBuffer(data);
+        };
+        sourceBuffer.addEventListener('updateend', () => {
+            const buffered = sourceBuffer.buffered;
+            if (buffered.length) {
+                const liveEdge = buffered.end(buffered.length - 1);
+                if (liveEdge - video.currentTime > 0.5) video.currentTime = liveEdge - 0.05;
+                if (video.paused) video.play().catch(() => {});
+            }
+            pump();
+        });
+
+        const reader = res.body.getReader();
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            queue.push(value);
+            pump();
+        }
+    }
+
     // --- Recorder State ---
     let mediaRecorder = null;
     let recordedChunks = [];
@@ -28,22 +96,63 @@ document.addEventListener('DOMContentLoaded', () => {
     let manualInterval = null;
 
     // --- API Calls ---
+    // In async server mode (body data-transport="ws") commands and telemetry
+    // share one WebSocket; otherwise commands are POSTed and telemetry is SSE.
+    // Telemetry arrives as a full state, then only the fields that changed.
+    let controlSocket = null;
+    let telemetry = null;
+
+    function connectControlSocket() {
+        const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${proto}://${location.host}/ws/${cameraId}?encoding=struct`);
+        socket.binaryType = 'arraybuffer';
+        socket.onopen = () => { controlSocket = socket; };
+        socket.onmessage = (e) => {
+            if (e.data instanceof ArrayBuffer) {
+                // Pan/tilt/zoom-only update: <u8 type, u32 seq, f32 pan, f32 tilt, f32 zoom>
+                const view = new DataView(e.data);
+                if (telemetry && view.getUint8(0) === 1) {
+                    telemetry.pan = view.getFloat32(5, true);
+                    telemetry.tilt = view.getFloat32(9, true);
+                    telemetry.zoom = view.getFloat32(13, true);
+                    onTelemetry(telemetry);
+                }
+                return;
+            }
+            const msg = JSON.parse(e.data);
+            if (msg.type === 'telemetry') {
+                telemetry = msg.data;
+                onTelemetry(telemetry);
+            } else if (msg.type === 'telemetry_delta' && telemetry) {
+                onTelemetry(Object.assign(telemetry, msg.data));
+            } else if (msg.type === 'ack' && msg.status !== 'ok') {
+                console.error(msg.message);
+            }
+        };
+        socket.onclose = () => {
+            controlSocket = null;
+            setTimeout(connectControlSocket, 1000);
+        };
+    }
+
     async function api(data) {
+        if (controlSocket && controlSocket.readyState === WebSocket.OPEN) {
+            controlSocket.send(JSON.stringify(data));
+            return;
+        }
         try {
             await fetch('/api/control', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(data)
+                body: JSON.stringify({ ...data, camera: cameraId })
             });
         } catch (e) {
             console.error(e);
         }
     }
 
-    // --- Telemetry Loop (SSE) ---
-    const evtSource = new EventSource("/api/telemetry");
-    evtSource.onmessage = (e) => {
-        const data = JSON.parse(e.data);
+    // --- Telemetry Loop (WebSocket or SSE) ---
+    function onTelemetry(data) {
         updateUI(data);
 
         // If recording, renderLoop handles drawing.
@@ -51,7 +160,25 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!isRecording) {
             drawOSD(data);
         }
-    };
+    }
+
+    if (document.body.dataset.transport === 'ws') {
+        connectControlSocket();
+    } else {
+        const evtSource = new EventSource(`/api/telemetry/${cameraId}`);
+        evtSource.onmessage = (e) => {
+            telemetry = JSON.parse(e.data);
+            onTelemetry(telemetry);
+        };
+        evtSource.addEventListener('delta', (e) => {
+            if (telemetry) onTelemetry(Object.assign(telemetry, JSON.parse(e.data)));
+        });
+    }
+
+    // Telemetry only arrives when something changes; keep the OSD clock running while idle
+    setInterval(() => {
+        if (telemetry && !isRecording) drawOSD(telemetry);
+    }, 1000);
 
     // Helper for OSD Text with Outline
     function drawOutlinedText(str, x, y) {
@@ -66,6 +193,8 @@ document.addEventListener('DOMContentLoaded', () => {
             ctx.clearRect(0, 0, els.canvas.width, els.canvas.height);
         }
 
+        if (clientOSD && data.osd) drawTrackingOSD(data.osd);
+
         // Setup Font & Outline Style
         ctx.font = '20px monospace';
         ctx.lineWidth = 3;
@@ -106,8 +235,9 @@ document.addEventListener('DOMContentLoaded', () => {
         ctx.textBaseline = 'middle';
 
         // Track Status
-        const trkText = data.status === "TRACKING" ? "TRK ACT" : "TRK STBY";
-        ctx.fillStyle = data.track_active ? '#ff3333' : '#ffffff';
+        let trkText = data.status === "TRACKING" ? "TRK ACT" : "TRK STBY";
+        if (data.status === "CUE") trkText = `TRK CUE ${data.cue_flight || data.cue_hex}`;
+        ctx.fillStyle = (data.track_active || data.status === "CUE") ? '#ff3333' : '#ffffff';
         // Note: strokeStyle is black by default from above, but if we want red text, black outline works.
         // If we wanted red outline, we'd change strokeStyle. Keeping black outline for contrast.
         drawOutlinedText(trkText, 30, y);
@@ -128,6 +258,51 @@ document.addEventListener('DOMContentLoaded', () => {
         drawGauges(data);
     }
 
+    // Overlay image, reticle, track box and Kalman dot, in the frame's pixel
+    // coordinates (`osd.size`) scaled to the canvas
+    function drawTrackingOSD(osd) {
+        const sx = els.canvas.width / osd.size[0];
+        const sy = els.canvas.height / osd.size[1];
+
+        if (overlayImg.complete && overlayImg.naturalWidth) {
+            ctx.drawImage(overlayImg, 0, 0, overlayImg.naturalWidth * sx, overlayImg.naturalHeight * sy);
+        }
+
+        ctx.save();
+        ctx.scale(sx, sy);
+        const shape = [];
+        if (osd.reticle) {
+            const cx = Math.floor(osd.size[0] / 2);
+            const cy = Math.floor(osd.size[1] / 2);
+            shape.push(() => {
+                ctx.moveTo(cx - 20, cy); ctx.lineTo(cx + 20, cy);
+                ctx.moveTo(cx, cy - 20); ctx.lineTo(cx, cy + 20);
+            });
+        }
+        if (osd.box) {
+            const [x, y, w, h] = osd.box;
+            shape.push(() => ctx.rect(x, y, w, h));
+        }
+        // Black outline under a white line, like the burned-in OSD
+        for (const [style, width] of [['#000', 3], ['#fff', 1]]) {
+            ctx.strokeStyle = style;
+            ctx.lineWidth = width;
+            ctx.beginPath();
+            shape.forEach(path => path());
+            ctx.stroke();
+        }
+        if (osd.kf) {
+            ctx.fillStyle = '#fff';
+            ctx.strokeStyle = '#000';
+            ctx.lineWidth = 1;
+            ctx.beginPath();
+            ctx.arc(osd.kf[0], osd.kf[1], 2, 0, 2 * Math.PI);
+            ctx.fill();
+            ctx.stroke();
+        }
+        ctx.restore();
+    }
+
     function drawHeadingTape(data) {
         const panRaw = data.pan || 0;
         let camHeading = (panRaw + northOffset) % 360;
@@ -526,6 +701,9 @@ document.addEventListener('DOMContentLoaded', () => {
         els.btnStab.classList.toggle('active', data.stab_active);
         els.btnStab.innerText = data.stab_active ? "DIGITAL STAB DISABLE (Z)" : "DIGITAL STAB ENABLE (Z)";
 
+        els.btnSrvRec.classList.toggle('active', !!data.recording);
+        els.btnSrvRec.innerText = data.recording ? "SERVER REC DISABLE" : "SERVER REC ENABLE";
+
         // Inputs
         if (document.activeElement !== els.inP) els.inP.value = data.kp;
         if (document.activeElement !== els.inI) els.inI.value = data.ki;
@@ -606,6 +784,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // UI Listeners
     els.btnTrack.onclick = () => api({ action: 'toggle_track' });
     els.btnStab.onclick = () => api({ action: 'toggle_stab' });
+    els.btnSrvRec.onclick = () => api({ action: 'toggle_record' });
     els.btnRec.onclick = () => {
         if (isRecording) stopRecording();
         else startRecording();
@@ -661,25 +840,89 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     let aircraftData = [];
-    let northOffset = parseInt(localStorage.getItem('skywatch_north_offset') || '0');
+    // Server-side FOV query result (shared by all clients): hexes in view + best match
+    let inViewHexes = new Set();
+    let viewTarget = null;
+    // Starts at the camera's configured north_offset_deg (what cueing and the
+    // in-view query use) unless changed on this page for this camera
+    const offsetKey = `skywatch_north_offset_${cameraId}`;
+    let northOffset = parseFloat(localStorage.getItem(offsetKey) ?? document.body.dataset.northOffset) || 0;
     inputOffset.value = northOffset;
 
     inputOffset.addEventListener('change', (e) => {
-        northOffset = parseInt(e.target.value);
-        localStorage.setItem('skywatch_north_offset', northOffset);
+        northOffset = parseFloat(e.target.value) || 0;
+        localStorage.setItem(offsetKey, northOffset);
     });
 
-    // Poll Aircraft Data
+    // Click a blip to cue the camera to it (slew, then hand off to the tracker)
+    function radarBlipPos(ac) {
+        const w = radarCanvas.width;
+        const pxPerNm = (w / 2) / (CONFIG.MAX_RANGE_NM * 1.1);
+        const r = ac.dist_nm * pxPerNm;
+        const angleRad = (ac.bearing - 90) * (Math.PI / 180);
+        return { x: w / 2 + r * Math.cos(angleRad), y: radarCanvas.height / 2 + r * Math.sin(angleRad), r: r };
+    }
+
+    radarCanvas.addEventListener('click', (e) => {
+        const rect = radarCanvas.getBoundingClientRect();
+        const mx = (e.clientX - rect.left) * (radarCanvas.width / rect.width);
+        const my = (e.clientY - rect.top) * (radarCanvas.height / rect.height);
+
+        let picked = null;
+        let minDist = 20; // px
+        aircraftData.forEach(ac => {
+            const p = radarBlipPos(ac);
+            if (p.r > radarCanvas.width / 2) return;
+            const d = Math.hypot(p.x - mx, p.y - my);
+            if (d < minDist) {
+                minDist = d;
+                picked = ac;
+            }
+        });
+
+        if (picked) {
+            api({ action: 'cue', hex: picked.hex });
+        } else if (latestOSDData && latestOSDData.cue_hex) {
+            api({ action: 'cancel_cue' });
+        }
+    });
+
+    // Aircraft Data (pushed): snapshot on connect, then added/changed/removed deltas
+    const aircraftByHex = new Map();
+    const aircraftSource = new EventSource('/api/aircraft/stream');
+
+    aircraftSource.addEventListener('snapshot', (e) => {
+        const msg = JSON.parse(e.data);
+        aircraftByHex.clear();
+        msg.aircraft.forEach(ac => aircraftByHex.set(ac.hex, ac));
+        aircraftData = Array.from(aircraftByHex.values());
+        updateInfoBox();
+    });
+
+    aircraftSource.addEventListener('delta', (e) => {
+        const msg = JSON.parse(e.data);
+        msg.added.forEach(ac => aircraftByHex.set(ac.hex, ac));
+        Object.entries(msg.changed).forEach(([hex, fields]) => {
+            const ac = aircraftByHex.get(hex);
+            if (ac) Object.assign(ac, fields);
+        });
+        msg.removed.forEach(hex => aircraftByHex.delete(hex));
+        aircraftData = Array.from(aircraftByHex.values());
+        updateInfoBox();
+    });
+
+    // Poll In-View Target (depends on camera pointing, so not part of the push feed)
     setInterval(async () => {
         try {
-            const res = await fetch('/api/aircraft');
+            const res = await fetch(`/api/aircraft/in_view?cam=${cameraId}&offset=${northOffset}`);
             if (res.ok) {
-                aircraftData = await res.json();
-                drawRadar();
+                const view = await res.json();
+                inViewHexes = new Set(view.aircraft.map(ac => ac.hex));
+                viewTarget = view.target;
                 updateInfoBox();
             }
         } catch (e) {
-            console.warn("Aircraft Poll Error", e);
+            console.warn("In-View Poll Error", e);
         }
     }, 1000);
 
@@ -768,16 +1011,20 @@ document.addEventListener('DOMContentLoaded', () => {
             // Bearing 0 -> Up (canvas -90)
             // Angle = Bearing - 90
 
-            const r = ac.dist_nm * pxPerNm;
+            const { x, y, r } = radarBlipPos(ac);
             if (r > w / 2) return; // Out of bounds
 
-            const angleRad = (ac.bearing - 90) * (Math.PI / 180);
-            const x = cx + r * Math.cos(angleRad);
-            const y = cy + r * Math.sin(angleRad);
-
             // Draw Blip
             // Check if "In View" (Target)
             const isTarget = checkInView(ac);
+            const isCued = latestOSDData && latestOSDData.cue_hex === ac.hex;
+
+            if (isCued) {
+                radarCtx.strokeStyle = '#ff3333';
+                radarCtx.beginPath();
+                radarCtx.arc(x, y, 14, 0, 2 * Math.PI);
+                radarCtx.stroke();
+            }
 
             radarCtx.fillStyle = isTarget ? '#ffff00' : '#00ffff';
 
@@ -805,52 +1052,19 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function checkInView(ac) {
-        if (!latestOSDData) return false;
-
-        const panRaw = latestOSDData.pan || 0;
-        let camHeading = (panRaw + northOffset) % 360;
-        if (camHeading < 0) camHeading += 360;
-
-        // Simplified: Only use Pan/Heading. Ignored Zoom/Tilt.
-        const SELECTION_FOV = 20; // 20 degrees fixed selection window
-
-        // Angle diff
-        let diff = Math.abs(ac.bearing - camHeading);
-        if (diff > 180) diff = 360 - diff;
-
-        return diff < (SELECTION_FOV / 2);
+        // Decided server-side from pan/tilt and the zoom-derived FOV
+        return inViewHexes.has(ac.hex);
     }
 
     function updateInfoBox() {
-        // Find best target (closest to center of view, valid range)
-        // For now, just pick the first one that returns true for checkInView
-        // Or closest to center line.
-
-        let bestTarget = null;
-        let minDiff = 999;
-
-        if (latestOSDData) {
-            const panRaw = latestOSDData.pan || 0;
-            let camHeading = (panRaw + northOffset) % 360;
-            if (camHeading < 0) camHeading += 360;
-
-            aircraftData.forEach(ac => {
-                if (checkInView(ac)) {
-                    let diff = Math.abs(ac.bearing - camHeading);
-                    if (diff > 180) diff = 360 - diff;
-
-                    if (diff < minDiff) {
-                        minDiff = diff;
-                        bestTarget = ac;
-                    }
-                }
-            });
-        }
+        // Best target = in view and closest to the boresight (server ranked)
+        const bestTarget = viewTarget;
 
         // Default Values
         let flight = '---';
         let reg = '---';
         let type = '---'; // Add ICAO Type
+        let operator = '---';
         let dist = '---';
         let alt = '---';
         let speed = '---';
@@ -860,6 +1074,7 @@ document.addEventListener('DOMContentLoaded', () => {
             flight = bestTarget.flight || 'N/A';
             reg = bestTarget.reg || '---';
             type = bestTarget.type || '---';
+            operator = bestTarget.operator || '---';
             dist = bestTarget.dist_nm.toFixed(1);
             alt = bestTarget.alt;
             speed = bestTarget.speed.toFixed(0);
@@ -880,6 +1095,10 @@ document.addEventListener('DOMContentLoaded', () => {
                  <div class="dash-item">
                     <span class="dash-label">ICAO</span>
                     <span class="dash-value">${type}</span>
+                </div>
+                 <div class="dash-item">
+                    <span class="dash-label">OPERATOR</span>
+                    <span class="dash-value">${operator}</span>
                 </div>
                 <div class="dash-item">
                     <span class="dash-label">RANGE</span>
@@ -0,0 +1,136 @@
+import json
+import struct
+import threading
+import time
+import config
+import tracing
+
+ENCODINGS = ('json', 'struct')
+
+# 'struct' encoding: the fields that change with every camera move go out as a
+# fixed little-endian record (type, seq, pan, tilt, zoom) instead of JSON
+MSG_STATE = 1
+STATE_STRUCT = struct.Struct('<BIfff')
+STATE_FIELDS = ('pan', 'tilt', 'zoom')
+
+_MISSING = object()
+
+
+class TelemetryFeed:
+    """
+    Change-driven telemetry of one camera. A single thread wakes when the
+    core reports new telemetry, diffs it against the last published state
+    and serializes the result once: the changed fields as a JSON delta, the
+    full state as JSON (lazily, for clients that join or skip ahead) and the
+    pan/tilt/zoom record of the 'struct' encoding. Clients only pick the
+    pre-built messages they need, at their own maximum rate; a client that
+    skipped updates gets the full state instead of a chain of deltas.
+    `listeners` are called with the new seq after every publish.
+    """
+    def __init__(self, core):
+        self.core = core
+        self.running = False
+        self.thread = None
+        self.listeners = []
+
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.cold_seq = 0           # Last seq that changed anything besides STATE_FIELDS
+        self.state = {}
+        self.delta = None           # JSON of the fields changed in `seq`
+        self.state_record = None    # STATE_STRUCT of `seq`
+        self.full_cache = None      # (seq, JSON of the full state)
+
+    def start(self):
+        if self.running: return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name=f"Telemetry-{self.core.cam['id']}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def _loop(self):
+        version = 0
+        while self.running:
+            new_version, telemetry = self.core.wait_for_telemetry(version, timeout=1.0)
+            if new_version == version:
+                continue
+            version = new_version
+            try:
+                with tracing.span('telemetry.publish', 'web'):
+                    self.publish(telemetry)
+            except Exception as e:
+                print(f"Error publishing telemetry: {e}")
+
+    def publish(self, telemetry):
+        changed = {k: v for k, v in telemetry.items() if self.state.get(k, _MISSING) != v}
+        if not changed:
+            return
+        telemetry['timestamp'] = time.time()
+        changed['timestamp'] = telemetry['timestamp']
+
+        with self.cond:
+            self.seq += 1
+            changed['seq'] = self.seq
+            if any(k not in STATE_FIELDS for k in changed if k not in ('timestamp', 'seq')):
+                self.cold_seq = self.seq
+            self.state = telemetry
+            self.delta = json.dumps(changed)
+            self.state_record = STATE_STRUCT.pack(MSG_STATE, self.seq, telemetry.get('pan') or 0.0,
+                                                  telemetry.get('tilt') or 0.0, telemetry.get('zoom') or 1.0)
+            seq = self.seq
+            self.cond.notify_all()
+        for listener in self.listeners:
+            listener(seq)
+
+    def _full(self):
+        # Lock held
+        if self.full_cache is None or self.full_cache[0] != self.seq:
+            self.full_cache = (self.seq, json.dumps(dict(self.state, seq=self.seq)))
+        return self.full_cache[1]
+
+    def updates_since(self, seq, cold_seq, encoding='json', deltas=True):
+        """
+        Messages that bring a client from (seq, cold_seq) to the current state:
+        returns (seq, cold_seq, [(kind, payload)]) with kind 'full' / 'delta'
+        (JSON text) or 'state' (STATE_STRUCT bytes).
+        """
+        with self.cond:
+            if self.seq == seq:
+                return seq, cold_seq, []
+            contiguous = deltas and seq and seq == self.seq - 1
+            if encoding == 'struct' and seq and self.cold_seq <= cold_seq:
+                messages = [('state', self.state_record)]
+            elif contiguous:
+                messages = [('delta', self.delta)]
+            else:
+                messages = [('full', self._full())]
+            return self.seq, self.cold_seq, messages
+
+    def wait_next(self, after_seq, timeout):
+        """True once there is an update newer than `after_seq`."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.seq != after_seq, timeout)
+
+    def stream(self, max_hz=None, deltas=True, keepalive=15.0):
+        """
+        SSE generator for one client: the full state as a default `message`
+        event, then `delta` events with only the changed fields (or full
+        states with deltas=False), at most `max_hz` times a second.
+        """
+        min_interval = 1.0 / (max_hz or config.TELEMETRY_MAX_HZ)
+        seq = cold_seq = 0
+        while True:
+            if not self.wait_next(seq, keepalive):
+                yield ": keepalive\n\n"
+                continue
+            seq, cold_seq, messages = self.updates_since(seq, cold_seq, 'json', deltas)
+            sent = time.perf_counter()
+            yield ''.join((f"event: delta\ndata: {payload}\n\n" if kind == 'delta' else f"data: {payload}\n\n")
+                          for kind, payload in messages)
+            wait = min_interval - (time.perf_counter() - sent)
+            if wait > 0:
+                time.sleep(wait)
@@ -0,0 +1,107 @@
+"""
+Conditional fetches of ADSBClient against a local stand-in feeder
+(adsb_replay's HTTP handler, which honours ETag / If-Modified-Since).
+
+    python -m pytest test_adsb_client.py
+    python test_adsb_client.py
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer
+import config
+from adsb_client import ADSBClient
+from adsb_replay import make_http_handler
+
+PATH = '/data/aircraft.json'
+
+
+class Feed:
+    """Rotator stand-in whose snapshot the test sets explicitly."""
+    def __init__(self):
+        self.snapshot = None
+        self.changed_at = time.time()
+
+    def set(self, body, etag=None):
+        self.snapshot = {'body': body, 'gzip': gzip.compress(body),
+                         'etag': etag or '"' + hashlib.md5(body).hexdigest() + '"'}
+        self.changed_at = time.time()
+
+    def current(self):
+        return self.snapshot, self.changed_at
+
+
+def aircraft_json(*hexes):
+    return json.dumps({'now': time.time(), 'aircraft': [
+        {'hex': h, 'lat': config.CAMERA_LAT + 0.1, 'lon': config.CAMERA_LNG, 'alt_baro': 10000, 'seen': 0.1}
+        for h in hexes]}).encode()
+
+
+def serve(feed):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_http_handler(feed, PATH))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config.ADSB_URL = f"http://127.0.0.1:{server.server_address[1]}{PATH}"
+    return server
+
+
+def test_conditional_fetch():
+    """200 ingests and keeps the validators, an unchanged feed is a 304, a new snapshot is fetched again."""
+    feed = Feed()
+    server = serve(feed)
+    client = ADSBClient()
+    try:
+        feed.set(aircraft_json('abc123'))
+        client._fetch_data()
+        assert 'abc123' in client.store.index
+        assert client.etag == feed.snapshot['etag']
+        assert client.last_modified is not None
+        version = client.version
+
+        client._fetch_data()
+        assert client.metrics['not_modified'] == 1
+        assert client.version == version  # Nothing re-ingested
+        assert client.etag == feed.snapshot['etag']
+
+        feed.set(aircraft_json('abc123', 'def456'))
+        client._fetch_data()
+        assert 'def456' in client.store.index
+        assert client.etag == feed.snapshot['etag']
+        assert client.metrics['fetches'] == 3
+        assert client.metrics['not_modified'] == 1
+        assert client.metrics['errors'] == 0
+    finally:
+        server.shutdown()
+
+
+def test_failed_ingest_keeps_old_validators():
+    """A body that doesn't decode leaves the validators alone, so the next poll fetches it again."""
+    feed = Feed()
+    server = serve(feed)
+    client = ADSBClient()
+    try:
+        feed.set(aircraft_json('abc123'))
+        client._fetch_data()
+        good_etag = client.etag
+
+        feed.set(aircraft_json('def456')[:20], etag='"truncated"')
+        client._fetch_data()
+        assert client.metrics['errors'] == 1
+        assert client.etag == good_etag
+        assert 'def456' not in client.store.index
+
+        # Same ETag, now with the full body: not a 304, since the client never accepted it
+        feed.set(aircraft_json('def456'), etag='"truncated"')
+        client._fetch_data()
+        assert client.metrics['not_modified'] == 0
+        assert 'def456' in client.store.index
+        assert client.etag == '"truncated"'
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_conditional_fetch()
+    test_failed_ingest_keeps_old_validators()
+    print("ok")
@@ -0,0 +1,116 @@
+"""
+Opt-in pipeline tracing (`trace.enabled`) for finding individual stalls
+that latency histograms average away: a GC pause, a tracker spike, a
+blocked VISCA socket.
+
+Every thread records complete (begin + duration) spans into its own ring
+buffer of `trace.buffer_events` slots. A ring only ever has one writer, so
+recording takes no lock; readers copy it and may miss the span being
+written at that moment. `events(seconds)` collects the recent spans of all
+threads of this process as Chrome Trace Event dicts; `/api/trace` merges
+them with the camera worker processes' into a file for Perfetto
+(ui.perfetto.dev) or chrome://tracing. Timestamps are time.perf_counter(),
+which is the system-wide monotonic clock on Linux and macOS, so the
+processes line up on one timeline.
+
+With tracing off, `span()` returns a shared no-op context manager and
+`complete()` returns immediately.
+"""
+import contextlib
+import gc
+import multiprocessing
+import os
+import threading
+import time
+import config
+
+ENABLED = config.TRACE_ENABLED
+MAX_RINGS = 256  # Rings of finished threads are dropped beyond this many
+
+
+class _Ring:
+    __slots__ = ('events', 'index', 'thread')
+
+    def __init__(self, size):
+        self.events = [None] * size   # (name, category, start, duration)
+        self.index = 0
+        self.thread = threading.current_thread()
+
+
+_local = threading.local()
+_rings = []
+_rings_lock = threading.Lock()   # Only taken when a thread records its first span
+_null_span = contextlib.nullcontext()
+
+
+def _ring():
+    ring = getattr(_local, 'ring', None)
+    if ring is None:
+        ring = _local.ring = _Ring(config.TRACE_BUFFER_EVENTS)
+        with _rings_lock:
+            if len(_rings) >= MAX_RINGS:
+                _rings[:] = [r for r in _rings if r.thread.is_alive()]
+            _rings.append(ring)
+    return ring
+
+
+def complete(name, start, end, category='pipeline'):
+    """Records a span of the calling thread from perf_counter `start` to `end`."""
+    if not ENABLED:
+        return
+    ring = _ring()
+    events = ring.events
+    events[ring.index % len(events)] = (name, category, start, end - start)
+    ring.index += 1
+
+
+@contextlib.contextmanager
+def _span(name, category):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        complete(name, start, time.perf_counter(), category)
+
+
+def span(name, category='pipeline'):
+    """Context manager recording the enclosed block as a span."""
+    return _span(name, category) if ENABLED else _null_span
+
+
+def events(seconds, process_name=None):
+    """Chrome Trace Event dicts of every span of this process that ended in the last `seconds`."""
+    cutoff = time.perf_counter() - seconds
+    pid = os.getpid()
+    with _rings_lock:
+        rings = list(_rings)
+    result = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+               'args': {'name': process_name or multiprocessing.current_process().name}}]
+    for ring in rings:
+        tid = ring.thread.native_id or ring.thread.ident
+        result.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                       'args': {'name': ring.thread.name}})
+        for event in list(ring.events):
+            if event is None or event[2] + event[3] < cutoff:
+                continue
+            name, category, start, duration = event
+            result.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': round(start * 1e6, 1), 'dur': round(duration * 1e6, 1)})
+    return result
+
+
+# Garbage collections show up as spans on the thread that triggered them
+_gc_start = {}
+
+
+def _on_gc(phase, info):
+    if phase == 'start':
+        _gc_start[threading.get_ident()] = time.perf_counter()
+    else:
+        start = _gc_start.pop(threading.get_ident(), None)
+        if start is not None:
+            complete(f"gc gen{info['generation']}", start, time.perf_counter(), 'gc')
+
+
+if ENABLED:
+    gc.callbacks.append(_on_gc)
@@ -1,6 +1,7 @@
 import cv2
 import threading
 import time
+import tracing
 
 
 class ThreadedVideoCapture:
@@ -10,8 +11,10 @@ class ThreadedVideoCapture:
         # Optimize buffer size for low latency
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         self.grabbed, self.frame = self.cap.read()
+        self.grabs = 1 if self.grabbed else 0  # Frames grabbed so far; numbers self.frame
         self.started = False
         self.read_lock = threading.Lock()
+        self.new_frame = threading.Condition(self.read_lock)  # Notified on every grab
         self.name = name
 
     def start(self):
@@ -19,17 +22,21 @@ class ThreadedVideoCapture:
             print(f"[{self.name}] Already started.")
             return self
         self.started = True
-        self.thread = threading.Thread(target=self.update, args=(), daemon=True)
+        self.thread = threading.Thread(target=self.update, args=(), name=self.name, daemon=True)
         self.thread.start()
         print(f"[{self.name}] Thread started.")
         return self
 
     def update(self):
         while self.started:
-            grabbed, frame = self.cap.read()
+            with tracing.span('capture.read', 'capture'):
+                grabbed, frame = self.cap.read()
             with self.read_lock:
                 self.grabbed = grabbed
                 self.frame = frame
+                if grabbed:
+                    self.grabs += 1
+                    self.new_frame.notify_all()
             
             # Prevents CPU spin on read failure
             if not grabbed:
@@ -41,6 +48,19 @@ class ThreadedVideoCapture:
                 return None
             return self.frame.copy()
 
+    def read_numbered(self, after=None, timeout=None):
+        """
+        (grab number, copy of the latest frame); the number only advances with
+        a new grab. With `after`, first waits up to `timeout` for a grab newer
+        than that number; the frame is None if none arrives.
+        """
+        with self.new_frame:
+            if after is not None and not self.new_frame.wait_for(lambda: self.grabs != after, timeout):
+                return self.grabs, None
+            if not self.grabbed:
+                return self.grabs, None
+            return self.grabs, self.frame.copy()
+
     def stop(self):
         self.started = False
         if self.thread.is_alive():
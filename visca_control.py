@@ -2,6 +2,7 @@ import socket
 import binascii
 import threading
 import time
+import tracing
 
 class CameraControl:
     def __init__(self, ip, port):
@@ -24,7 +25,7 @@ class CameraControl:
         print(f"Initialized VISCA UDP Controller at {self.ip}:{self.port}")
 
     def _send_packet(self, payload):
-        with self.lock:
+        with tracing.span('visca.send', 'visca'), self.lock:
             try:
                 self.sock.sendto(payload, self.address)
                 self.sequence_number += 1
@@ -49,7 +50,7 @@ class CameraControl:
         self.polling_active = True
         # Set a short timeout for the listener loop to ensure we can check for exit/sending queries
         self.sock.settimeout(0.01) 
-        self.poll_thread = threading.Thread(target=self._listen_loop, args=(interval,), daemon=True)
+        self.poll_thread = threading.Thread(target=self._listen_loop, args=(interval,), name=f"VISCA-{self.ip}:{self.port}", daemon=True)
         self.poll_thread.start()
         print("Started VISCA Listener/Poller Thread.")
 
@@ -72,7 +73,9 @@ class CameraControl:
             try:
                 data, addr = self.sock.recvfrom(1024)
                 if data:
+                    t = time.perf_counter()
                     self._process_packet(data)
+                    tracing.complete('visca.reply', t, time.perf_counter(), 'visca')
             except socket.timeout:
                 pass # Normal, just loop back
             except Exception as e:
@@ -157,6 +160,22 @@ class CameraControl:
         cmd = bytearray([0x81, 0x01, 0x06, 0x01, p_speed, t_speed, pan_dir, tilt_dir, 0xFF])
         self._send_packet(cmd)
 
+    def pan_tilt_absolute(self, pan_pos, tilt_pos, pan_speed=0x18, tilt_speed=0x14):
+        """
+        Absolute move to pan/tilt position counts (signed 16-bit).
+        pan_speed: 1 to 24
+        tilt_speed: 1 to 20
+        """
+        p = int(pan_pos) & 0xFFFF
+        t = int(tilt_pos) & 0xFFFF
+
+        # 81 01 06 02 VV WW 0Y 0Y 0Y 0Y 0Z 0Z 0Z 0Z FF
+        cmd = bytearray([0x81, 0x01, 0x06, 0x02, int(pan_speed), int(tilt_speed),
+                         (p >> 12) & 0x0F, (p >> 8) & 0x0F, (p >> 4) & 0x0F, p & 0x0F,
+                         (t >> 12) & 0x0F, (t >> 8) & 0x0F, (t >> 4) & 0x0F, t & 0x0F,
+                         0xFF])
+        self._send_packet(cmd)
+
     def stop(self):
         # Stop command: 81 01 06 01 00 00 03 03 FF (Pan/Tilt Stop)
         cmd_pt = bytearray([0x81, 0x01, 0x06, 0x01, 0x00, 0x00, 0x03, 0x03, 0xFF])